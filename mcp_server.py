@@ -1,33 +1,184 @@
-import urllib.request
+import contextlib
+import http.client
 import json
+import os
+import pathlib
+import queue
 import subprocess
+import sys
+import threading
+import urllib.parse
 from mcp.server.fastmcp import FastMCP
 
 # Initialize FastMCP server
 mcp = FastMCP("Homie Dashboard API Wrapper")
 
-DASHBOARD_URL = "http://127.0.0.1:8899"
+DASHBOARD_URL = os.getenv("HOMIE_DASHBOARD_URL", "http://127.0.0.1:8899")
+# http: talk to the dashboard at DASHBOARD_URL. inprocess: import server.py from this
+# directory for agent reads; everything else still goes to the dashboard over HTTP.
+MCP_BACKEND = os.getenv("HOMIE_MCP_BACKEND", "http")
+HTTP_POOL_SIZE = 4
+ACTION_TIMEOUT = 600
 
-def call_dashboard_action(action_id: str) -> str:
-    """Helper to call the dashboard's internal API via POST"""
+
+class DashboardError(Exception):
+    pass
+
+
+class InProcessBackend:
+    """Reads /api/agents through the server.py data layer directly, with no HTTP or re-encoding.
+
+    Everything else goes to the running dashboard over HTTP: writes, so that
+    action cooldowns and running jobs stay in one process, and /api/status
+    and /api/todos, which the dashboard serves from its metrics sampler and
+    task file watcher (running second copies here would double the /proc
+    polling and inotify watches). The imported module keeps its own session
+    cache. stdout carries the MCP stdio protocol, so server.log() writes to
+    stderr.
+    """
+    name = "inprocess"
+
+    def __init__(self, server, url=DASHBOARD_URL):
+        self.server = server
+        server.LOG_STREAM = sys.stderr
+        self.http = HTTPBackend(url)
+        self.routes = {
+            "/api/agents": server.get_active_agents,
+        }
+
+    def get(self, path):
+        route = self.routes.get(path)
+        return route() if route else self.http.get(path)
+
+    def get_text(self, path):
+        route = self.routes.get(path)
+        return json.dumps(route()) if route else self.http.get_text(path)
+
+    def toggle_todo(self, path, line_no, done):
+        return self.http.toggle_todo(path, line_no, done)
+
+    def run_action(self, action_id, timeout):
+        return self.http.run_action(action_id, timeout)
+
+
+class HTTPBackend:
+    """Dashboard API over a small pool of kept-alive HTTP/1.1 connections."""
+    name = "http"
+
+    def __init__(self, url, size=HTTP_POOL_SIZE, timeout=30):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname or "127.0.0.1", parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.connects = 0
+
+    def _connection(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            self.connects += 1
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn, response):
+        if response.will_close:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, body=None):
+        """(status, raw body); a pooled connection the server has closed is retried once on a new one."""
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        while True:
+            conn, reused = self._connection()
+            try:
+                conn.request(method, self.prefix + path, body=data, headers=headers)
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            self._release(conn, response)
+            return response.status, raw
+
+    def get(self, path):
+        return json.loads(self.get_text(path))
+
+    def get_text(self, path):
+        status, raw = self.request("GET", path)
+        if status != 200:
+            raise DashboardError(f"{path} answered HTTP {status}")
+        return raw.decode("utf-8")
+
+    def toggle_todo(self, path, line_no, done):
+        _, raw = self.request("POST", "/api/todos/toggle", {"path": path, "line_no": line_no, "done": done})
+        return json.loads(raw.decode("utf-8"))
+
+    def run_action(self, action_id, timeout):
+        status, raw = self.request("POST", "/api/actions/run", {"action": action_id, "async": True})
+        result = json.loads(raw.decode("utf-8"))
+        if status != 202:
+            raise DashboardError(result.get("error", "Unknown error."))
+        job = result["job"]
+        # Server-sent events: "output" chunks as the command writes them, then one "done".
+        # The dashboard closes stream connections, so this one is not pooled.
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            conn.request("GET", f"{self.prefix}/api/actions/stream?job={job['id']}")
+            response = conn.getresponse()
+            if response.status != 200:
+                raise DashboardError(f"job stream answered HTTP {response.status}")
+            output, event = [], None
+            for raw_line in response:
+                line = raw_line.decode("utf-8").rstrip("\n")
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "output":
+                    output.append(json.loads(line[6:])["text"])
+                elif line.startswith("data: ") and event == "done":
+                    job = json.loads(line[6:])
+                    break
+        finally:
+            conn.close()
+        return job, "".join(output)
+
+
+def make_backend(mode=MCP_BACKEND, url=DASHBOARD_URL):
+    if mode == "inprocess":
+        sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+        with contextlib.redirect_stdout(sys.stderr):  # covers logs emitted while server.py imports
+            import server
+        return InProcessBackend(server, url)
+    return HTTPBackend(url)
+
+
+backend = make_backend()
+
+
+def call_dashboard_action(action_id: str, timeout: int = ACTION_TIMEOUT) -> str:
+    """Run a dashboard action as a job and return its output once it finishes"""
     try:
-        url = f"{DASHBOARD_URL}/api/actions/run"
-        data = json.dumps({'action': action_id}).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'}, method='POST')
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            
-            # The dashboard returns {"success": True, "output": "..."}
-            if result.get("success"):
-                return f"Success:\n{result.get('output', 'Action completed.')}"
-            else:
-                return f"Failed:\n{result.get('error', 'Unknown error.')}\nOutput:\n{result.get('output', '')}"
-                
-    except urllib.error.URLError as e:
+        job, output = backend.run_action(action_id, timeout)
+    except DashboardError as e:
+        return f"Failed:\n{e}"
+    except OSError as e:
         return f"Failed to connect to dashboard API: {str(e)}"
     except Exception as e:
         return f"Exception occurred: {str(e)}"
+    text = output.strip()
+    if job.get("status") == "succeeded":
+        return f"Success:\n{text or 'Action completed.'}"
+    reason = job.get("error") or f"status {job.get('status')}, exit code {job.get('exit_code')}"
+    return f"Failed:\n{reason}\nOutput:\n{text}"
 
 @mcp.tool()
 def restart_gateway() -> str:
@@ -68,10 +219,7 @@ def openclaw_sessions() -> str:
 def get_system_status() -> str:
     """Fetches the current system metrics (CPU, Memory, Disk) from the Dashboard API."""
     try:
-        url = f"{DASHBOARD_URL}/api/status"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return json.dumps(result, indent=2)
+        return backend.get_text("/api/status")
     except Exception as e:
         return f"Failed to fetch system status: {str(e)}"
 
@@ -103,10 +251,7 @@ def get_service_logs(service: str, lines: int = 50) -> str:
 def get_todos() -> str:
     """Fetches the current project progress and todo lists from the Dashboard API."""
     try:
-        url = f"{DASHBOARD_URL}/api/todos"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return json.dumps(result, indent=2)
+        return backend.get_text("/api/todos")
     except Exception as e:
         return f"Failed to fetch todos: {str(e)}"
 
@@ -119,17 +264,12 @@ def toggle_todo(path: str, line_no: int, done: bool) -> str:
         done: Boolean True (complete) or False (incomplete).
     """
     try:
-        url = f"{DASHBOARD_URL}/api/todos/toggle"
-        data = json.dumps({'path': path, 'line_no': line_no, 'done': done}).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'}, method='POST')
-        
-        with urllib.request.urlopen(req, timeout=10) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            if result.get("ok"):
-                return f"Success: {result.get('message', 'Todo toggled.')}"
-            else:
-                return f"Failed: {result.get('error', 'Unknown error.')}"
-    except urllib.error.URLError as e:
+        result = backend.toggle_todo(path, line_no, done)
+        if result.get("ok"):
+            return f"Success: {result.get('message', 'Todo toggled.')}"
+        else:
+            return f"Failed: {result.get('error', 'Unknown error.')}"
+    except OSError as e:
         return f"Failed to connect to dashboard API: {str(e)}"
     except Exception as e:
         return f"Exception occurred: {str(e)}"
@@ -140,36 +280,34 @@ def get_fleet_status() -> str:
     Returns a summarized list of working agents, their models, token usage, and status.
     """
     try:
-        url = f"{DASHBOARD_URL}/api/agents"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            if not data.get("ok"):
-                return f"API returned an error: {data.get('error', 'Unknown')}"
-            
-            sessions = data.get("sessions", [])
-            working_agents = []
-            for s in sessions:
-                key = s.get("key", "")
-                if "cron:" in key:
-                    continue
-                if s.get("ageMs", 999999) < 120000 or s.get("abortedLastRun"):
-                    working_agents.append(s)
-            
-            if not working_agents:
-                return "Agent Fleet Status: No agents are currently actively working."
-            
-            lines = ["Agent Fleet Status (Actively Working):"]
-            for s in working_agents:
-                agent_id = s.get("agentId", "unknown")
-                model = s.get("model", "unknown")
-                tokens = s.get("totalTokens", 0)
-                aborted = s.get("abortedLastRun", False)
-                age_s = s.get("ageMs", 0) // 1000
-                status = "Aborted/Error" if aborted else f"Working ({age_s}s ago)"
-                lines.append(f"- Agent [{agent_id}] | Model: {model} | Tokens: {tokens} | Status: {status}")
-                
-            return "\n".join(lines)
-            
+        data = backend.get("/api/agents")
+        if not data.get("ok"):
+            return f"API returned an error: {data.get('error', 'Unknown')}"
+
+        sessions = data.get("sessions", [])
+        working_agents = []
+        for s in sessions:
+            key = s.get("key", "")
+            if "cron:" in key:
+                continue
+            if s.get("ageMs", 999999) < 120000 or s.get("abortedLastRun"):
+                working_agents.append(s)
+
+        if not working_agents:
+            return "Agent Fleet Status: No agents are currently actively working."
+
+        lines = ["Agent Fleet Status (Actively Working):"]
+        for s in working_agents:
+            agent_id = s.get("agentId", "unknown")
+            model = s.get("model", "unknown")
+            tokens = s.get("totalTokens", 0)
+            aborted = s.get("abortedLastRun", False)
+            age_s = s.get("ageMs", 0) // 1000
+            status = "Aborted/Error" if aborted else f"Working ({age_s}s ago)"
+            lines.append(f"- Agent [{agent_id}] | Model: {model} | Tokens: {tokens} | Status: {status}")
+
+        return "\n".join(lines)
+
     except Exception as e:
         return f"Exception occurred: {str(e)}"
 
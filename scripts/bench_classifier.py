@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: keyword classifier vs. the old per-line keyword cascade.
+
+Generates a synthetic multi-megabyte memory file, checks that both
+classifiers agree on every line and reports throughput.
+
+    python3 scripts/bench_classifier.py --mb 8
+"""
+import argparse
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+
+def legacy_classify(line):
+    typ, icon, color = 'note', '•', 'cyan'
+    lo = line.lower()
+    if any(k in lo for k in ['complete','done','finish','success']): typ, icon, color = 'complete', '✓', 'green'
+    elif any(k in lo for k in ['error','fail','crash','broken']): typ, icon, color = 'error', '!', 'red'
+    elif any(k in lo for k in ['warning','alert','timeout','429']): typ, icon, color = 'warning', '⚠', 'amber'
+    elif any(k in lo for k in ['create','add','new','build']): typ, icon = 'create', '+'
+    elif any(k in lo for k in ['update','change','modify','edit']): typ, icon = 'update', '⟳'
+    elif any(k in lo for k in ['delete','remove','clean','prune']): typ, icon = 'delete', '−'
+    elif any(k in lo for k in ['install','setup','configure']): typ, icon = 'setup', '⚙'
+    elif any(k in lo for k in ['run','execute','start','launch']): typ, icon = 'run', '▶'
+    elif line.startswith('#'): typ, icon, color = 'section', '◆', 'purple'
+    return typ, icon, color
+
+
+WORDS = ("agent session gateway model token memory queue worker cron provider "
+         "checked synced dispatched reviewed the a of for with on to by at").split()
+KEYWORDS = ["completed", "error", "timeout", "added", "updated", "removed",
+            "installed", "started", "429", "buildone", "rerun"]
+
+
+def make_lines(target_bytes, seed=7):
+    rnd = random.Random(seed)
+    lines, size = [], 0
+    while size < target_bytes:
+        words = [rnd.choice(WORDS) for _ in range(rnd.randint(6, 18))]
+        if rnd.random() < 0.6:
+            words.insert(rnd.randrange(len(words)), rnd.choice(KEYWORDS))
+        line = " ".join(words)
+        if rnd.random() < 0.05:
+            line = "## " + line.title()
+        lines.append(line)
+        size += len(line) + 1
+    return lines
+
+
+def per_line(fn):
+    def run(lines):
+        for line in lines:
+            fn(line)
+    return run
+
+
+def bulk(lines):
+    server.activity_classifier.classify_lines(lines)
+
+
+def bench(fn, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(lines)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=4.0, help="size of the synthetic memory file")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = make_lines(int(args.mb * 1024 * 1024))
+    mb = sum(len(l) + 1 for l in lines) / (1024 * 1024)
+    rules = server.activity_classifier.classify_lines(lines)
+    mismatches = sum(1 for l, r in zip(lines, rules)
+                     if legacy_classify(l) != (r["type"], r.get("icon", "•"), r.get("color", "cyan")))
+    mismatches += sum(1 for l in lines if legacy_classify(l) != server.classify_activity(l))
+    print(f"{len(lines)} lines, {mb:.1f} MB, mismatches: {mismatches}")
+
+    cases = (
+        ("legacy cascade", per_line(legacy_classify)),
+        ("match()", per_line(server.classify_activity)),
+        ("classify_lines", bulk),
+    )
+    for name, fn in cases:
+        secs = bench(fn, lines, args.repeat)
+        print(f"{name:>15}: {secs:.3f}s  {mb / secs:7.1f} MB/s  {len(lines) / secs / 1e6:.2f} M lines/s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Benchmark: streaming openclaw JSON extraction vs. the old brace-by-brace raw_decode.
+
+Builds a multi-megabyte `sessions --all-agents --json`-style output wrapped in
+plugin log noise (lines full of braces and ANSI colour codes), checks that
+every extractor returns the same sessions and reports time and peak memory.
+"stream sessions" is the dashboard's CLI consumer, which keeps only the
+summary fields of each session as it streams; the legacy parser kept them all.
+Short outputs with inline JSON ("Result: {...}") are checked first.
+
+    python3 scripts/bench_json_stream.py --sessions 20000 --noise 5000
+"""
+import argparse
+import json
+import pathlib
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+_legacy_ansi = re.compile(r'\x1b\[[0-9;]*m')
+
+
+def legacy_parse(text):
+    clean = _legacy_ansi.sub('', text or '')
+    for i, ch in enumerate(clean):
+        if ch in '{[':
+            try:
+                obj, _ = json.JSONDecoder().raw_decode(clean, i)
+                return obj
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+# Brace-heavy, but never a complete JSON value on its own, so the legacy parser
+# still reaches the real document (it returns the first value that decodes).
+NOISE = [
+    "\x1b[36m[plugins]\x1b[0m loaded {name} from [{path}]",
+    "[gateway] config {{ retries: {n}, backoff: [1s, 2s, 4s] }}",
+    "\x1b[33mwarn\x1b[0m: deprecated option {{legacy}} in [{path}]",
+    "[#{n}] {{ partial json: [\"a\", ",
+]
+
+
+# JSON that does not start a line; the stream extractor finds it on close().
+INLINE = [
+    'Result: {"jobs": []}',
+    'prefix text {"a": 1} suffix',
+    'noise [1,2]',
+    '\x1b[32mok\x1b[0m {"jobs": [{"id": "x"}]}\n[plugins] done\n',
+    'warn: {unterminated\nvalue: [true, null]\n',
+]
+
+
+def check_inline():
+    failures = 0
+    for text in INLINE:
+        expected = legacy_parse(text)
+        got = [server._parse_json_output(text)]
+        extractor = server.JSONStreamExtractor()
+        for chunk in chunked(text, 3):
+            extractor.feed(chunk)
+        extractor.close()
+        got.append(extractor.document)
+        ok = all(g == expected for g in got)
+        failures += not ok
+        print(f"{'inline':>18}: {text[:40]!r:44} {'ok' if ok else f'MISMATCH {got!r}'}")
+    return failures
+
+
+def make_output(n_sessions, n_noise, pretty, seed=11):
+    rnd = random.Random(seed)
+    sessions = [{
+        "sessionId": f"{rnd.getrandbits(64):016x}",
+        "agentId": rnd.choice(["main", "ceo", "coder", "scout"]),
+        "model": rnd.choice(["anthropic/claude-sonnet", "openai/gpt-5", "ollama/qwen"]),
+        "totalTokens": rnd.randint(0, 200000),
+        "totalCost": round(rnd.random() * 3, 4),
+        "ageMs": rnd.randint(0, 10 ** 9),
+        "label": rnd.choice(["daily {digest}", "cron [nightly]", "chat", "fix \"quotes\""]),
+        "meta": {"channels": ["slack", "web"], "flags": {"pinned": rnd.random() < 0.1}},
+    } for _ in range(n_sessions)]
+    noise = [rnd.choice(NOISE).format(name=f"plugin-{i}", path=f"/opt/p/{i}", n=i) for i in range(n_noise)]
+    head, tail = noise[: n_noise * 4 // 5], noise[n_noise * 4 // 5:]
+    body = json.dumps({"count": n_sessions, "sessions": sessions}, indent=2 if pretty else None)
+    return "\n".join(head + [body] + tail) + "\n", sessions
+
+
+def chunked(text, size=server.OPENCLAW_READ_CHUNK):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def run_legacy(text):
+    return (legacy_parse(text) or {}).get("sessions", [])
+
+
+def run_whole(text):
+    extractor = server.JSONStreamExtractor()
+    for chunk in chunked(text):
+        extractor.feed(chunk)
+    extractor.close()
+    return (extractor.document or {}).get("sessions", [])
+
+
+def stream_items(text):
+    extractor = server.JSONStreamExtractor("sessions")
+    for chunk in chunked(text):
+        yield from extractor.feed(chunk)
+    yield from extractor.close()
+
+
+def run_sessions(text):
+    """What OpenClawBackend._cli_sessions keeps: each session summarised as it is decoded."""
+    return [server._session_summary(s) for s in stream_items(text)]
+
+
+def measure(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--noise", type=int, default=5000, help="log lines around the JSON document")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pretty", action="store_true", help="indented JSON like `--json` on a TTY")
+    args = parser.parse_args()
+
+    text, expected = make_output(args.sessions, args.noise, args.pretty)
+    mb = len(text.encode()) / (1024 * 1024)
+    print(f"{args.sessions} sessions, {args.noise} noise lines, {mb:.1f} MB output")
+    failures = check_inline()
+    summaries = [server._session_summary(s) for s in expected]
+    for name, fn, want in (("legacy raw_decode", run_legacy, expected), ("stream document", run_whole, expected),
+                           ("stream sessions", run_sessions, summaries)):
+        result, secs, peak = measure(fn, text, args.repeat)
+        ok = result == want
+        failures += not ok
+        print(f"{name:>18}: {secs:6.3f}s  {mb / secs:6.1f} MB/s  peak {peak / 2 ** 20:6.1f} MiB"
+              f"  (excl. input)  {'ok' if ok else 'MISMATCH'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Benchmark: MCP tool latency with pooled HTTP (the default) vs. in-process reads vs. the old urllib calls.
+
+Without --url a dashboard (server.py, pool mode) is started on a free port with
+its SQLite files in a temp dir. Each read-only tool is then called --calls
+times per mode and p50/p95 latency is reported. Requires the `mcp` package.
+
+    python3 scripts/bench_mcp_backend.py --calls 300
+    python3 scripts/bench_mcp_backend.py --url http://127.0.0.1:8899
+"""
+import argparse
+import json
+import os
+import pathlib
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+try:
+    import mcp_server  # noqa: E402
+except ImportError as e:
+    sys.exit(f"mcp_server could not be imported ({e}); install the `mcp` package")
+import server  # noqa: E402
+
+TOOLS = {
+    "get_system_status": "/api/status",
+    "get_todos": "/api/todos",
+    "get_fleet_status": "/api/agents",
+}
+
+
+def legacy_tool(url, path):
+    """The old tools: a fresh connection per call, decode, then re-encode with indent=2."""
+    def call():
+        with urllib.request.urlopen(f"{url}{path}", timeout=10) as response:
+            result = json.loads(response.read().decode("utf-8"))
+            return json.dumps(result, indent=2)
+    return call
+
+
+def start_dashboard(tmp):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, HOMIE_COST_LEDGER=str(tmp / "cost-ledger.db"),
+               HOMIE_MEMORY_FTS_DB=str(tmp / "memory-fts.db"))
+    proc = subprocess.Popen([sys.executable, str(ROOT / "server.py"), "--host", "127.0.0.1", "--port", str(port),
+                             "--no-collectors"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{url}/api/status", timeout=1).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    sys.exit("dashboard did not start")
+
+
+def measure(fn, calls):
+    fn()  # warm caches and connections
+    timings = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark the HTTP modes against a running dashboard")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if not url:
+        proc, url = start_dashboard(pathlib.Path(tempfile.mkdtemp()))
+    try:
+        inprocess = mcp_server.InProcessBackend(server, url)
+        pooled = mcp_server.HTTPBackend(url)
+        print(f"dashboard {url}, {args.calls} calls per tool and mode")
+        for tool, path in TOOLS.items():
+            fn = getattr(mcp_server, tool)
+            for mode, backend in (("legacy urllib", None), ("pooled http", pooled), ("in-process", inprocess)):
+                mcp_server.backend = backend
+                p50, p95 = measure(fn if backend else legacy_tool(url, path), args.calls)
+                print(f"{tool:>18} {mode:>14}: p50 {p50:7.3f} ms  p95 {p95:7.3f} ms")
+        print(f"pooled http opened {pooled.connects} connection(s)")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark: recall@k and latency of the IVF memory index vs. exact search.
+
+Without --db a synthetic memories table with clustered float32 embeddings is
+generated in a temp dir. The IVF index is built next to it, reopened from disk
+(no re-read of the embeddings), grown by --inserts rows incrementally, and
+then compared with the exact resident index for each nprobe value.
+
+    python3 scripts/bench_memory_ann.py --rows 200000 --dim 384
+    python3 scripts/bench_memory_ann.py --db ~/.openclaw/workspace1/memory_system/openclaw_memory.db
+"""
+import argparse
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+if server.np is None:
+    sys.exit("numpy is required for the memory search indexes")
+np = server.np
+
+
+def make_vectors(rows, dim, rng, clusters=256):
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    picks = rng.integers(0, clusters, rows)
+    return centres[picks] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+
+
+def build_db(path, rows, dim, seed=5):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE memories (id INTEGER PRIMARY KEY, agent TEXT, type TEXT, "
+                 "importance INTEGER, content TEXT, created_at TEXT, embedding BLOB)")
+    insert_rows(conn, rows, dim, rng)
+    conn.close()
+    return rng
+
+
+def insert_rows(conn, rows, dim, rng):
+    vectors = make_vectors(rows, dim, rng)
+    conn.executemany(
+        "INSERT INTO memories (agent, type, importance, content, created_at, embedding) VALUES (?, ?, ?, ?, ?, ?)",
+        (("agent", "note", int(rng.integers(1, 4)), f"memory {i}", "2026-01-01T00:00:00", v.tobytes())
+         for i, v in enumerate(vectors)))
+    conn.commit()
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="existing database to benchmark instead of a synthetic one")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--inserts", type=int, default=5000, help="rows appended after the first build")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    if args.db:
+        db_path, rng = args.db, np.random.default_rng(5)
+    else:
+        db_path = str(tmp / "memories.db")
+        print(f"building {args.rows} x {args.dim} in {db_path}")
+        rng = build_db(db_path, args.rows, args.dim)
+    db = server.MemoryDB(db_path)
+    ann_dir = tmp / "memories.db.ann"
+
+    ivf = server.IVFIndex(db, ann_dir)
+    _, ms = timed(ivf.refresh)
+    print(f"ivf build: {ms / 1000:.1f}s  {ivf.stats()}")
+    _, ms = timed(lambda: server.IVFIndex(db, ann_dir).refresh())
+    print(f"ivf reopen from disk: {ms:.1f} ms")
+
+    if not args.db and args.inserts:
+        conn = sqlite3.connect(db_path)
+        insert_rows(conn, args.inserts, args.dim, rng)
+        conn.close()
+        _, ms = timed(ivf.refresh)
+        print(f"incremental insert of {args.inserts}: {ms:.1f} ms  unsorted={ivf.stats()['unsorted']}")
+
+    exact = server.EmbeddingIndex(db)
+    _, ms = timed(exact.refresh)
+    print(f"exact load: {ms / 1000:.1f}s, {exact.stats()['rows']} rows")
+
+    sample = exact._matrix[rng.choice(exact._n, args.queries, replace=False)]
+    queries = sample + 0.3 * rng.standard_normal(sample.shape).astype(np.float32)
+    truth, exact_ms = [], []
+    for q in queries:
+        hits, ms = timed(lambda: exact.search(q, args.k))
+        truth.append({r for r, _ in hits})
+        exact_ms.append(ms)
+    print(f"{'exact':>10}: recall@{args.k} 1.000  p50 {np.percentile(exact_ms, 50):7.2f} ms"
+          f"  p95 {np.percentile(exact_ms, 95):7.2f} ms")
+
+    for nprobe in (int(n) for n in args.nprobe.split(",")):
+        recall, lat = [], []
+        for q, want in zip(queries, truth):
+            hits, ms = timed(lambda: ivf.search(q, args.k, nprobe=nprobe))
+            recall.append(len(want & {r for r, _ in hits}) / max(1, len(want)))
+            lat.append(ms)
+        print(f"{'nprobe=' + str(nprobe):>10}: recall@{args.k} {np.mean(recall):.3f}"
+              f"  p50 {np.percentile(lat, 50):7.2f} ms  p95 {np.percentile(lat, 95):7.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
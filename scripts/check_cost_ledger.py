@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Verify that the cost ledger counts each day's spend exactly once.
+
+Writes a legacy cost-history.json whose days were summed from the same
+sessions the ledger then observes (as the old dashboard did), plus one older
+day no session covers, and checks the per-day and all-time totals against
+the session costs. Repeated polls with unchanged or grown totals must not
+change what was already counted.
+
+    python3 scripts/check_cost_ledger.py --sessions 500 --days 20
+"""
+import argparse
+import json
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+
+def make_sessions(n, days, now, seed=5):
+    rnd = random.Random(seed)
+    sessions = []
+    for i in range(n):
+        created = now - rnd.uniform(0, days * 86400)
+        tokens = rnd.randint(0, 100000)
+        sessions.append({
+            "sessionId": f"s-{i:05d}", "agentId": "main", "model": rnd.choice(["a/x", "b/y"]),
+            "createdAt": datetime.fromtimestamp(created).isoformat(),
+            "totalTokens": tokens, "totalCost": round(tokens * 2e-6, 6),
+        })
+    return sessions
+
+
+def per_day(sessions):
+    days = {}
+    for s in sessions:
+        day = s["createdAt"][:10]
+        d = days.setdefault(day, {"date": day, "cost": 0.0, "tokens": 0})
+        d["cost"] += s["totalCost"]
+        d["tokens"] += s["totalTokens"]
+    return days
+
+
+def check(label, got, expected):
+    ok = abs(got - expected) < 1e-3
+    print(f"{label:>34}: {got:12.6f}  expected {expected:12.6f}  {'ok' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--days", type=int, default=14)
+    args = parser.parse_args()
+
+    now = time.time()
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="cost-ledger-"))
+    sessions = make_sessions(args.sessions, args.days, now)
+    expected = per_day(sessions)
+    old_day = server._local_day(now - (args.days + 5) * 86400)
+    legacy = list(expected.values()) + [{"date": old_day, "cost": 1.25, "tokens": 1000}]
+    (tmp / "cost-history.json").write_text(json.dumps({"days": legacy}))
+    ledger = server.CostLedger(tmp / "cost-ledger.db", tmp / "cost-history.json")
+
+    def totals():
+        hist = ledger.history(now - (args.days + 10) * 86400, now + 86400)
+        return {d["date"]: d["cost"] for d in hist["days"]}, hist["days"][-1]["alltime_cost"]
+
+    ok = True
+    ledger.observe(sessions, now=now)
+    ledger.observe(sessions, now=now)  # unchanged totals: no writes
+    days, alltime = totals()
+    ok &= check("legacy-only day", days.get(old_day, 0), 1.25)
+    for day in sorted(expected)[:3]:
+        ok &= check(f"day {day}", days.get(day, 0), round(expected[day]["cost"], 4))
+    session_total = sum(s["totalCost"] for s in sessions)
+    ok &= check("all-time", alltime, round(session_total + 1.25, 4))
+
+    for s in sessions[:10]:
+        s["totalCost"] += 0.5
+    ledger.observe(sessions, now=now)
+    _, alltime = totals()
+    ok &= check("all-time after growth", alltime, round(session_total + 5 + 1.25, 4))
+
+    reopened = server.CostLedger(tmp / "cost-ledger.db", tmp / "cost-history.json")
+    hist = reopened.history(now - (args.days + 10) * 86400, now + 86400)
+    ok &= check("all-time after reopen", hist["days"][-1]["alltime_cost"], alltime)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Verify that every /api/memory-db page query walks an index.
+
+Without --db a synthetic memories table is generated in a temp dir, the
+composite indexes are created and page latency is measured at increasing
+depths with keyset (before=) cursors. With --db the given database is only
+inspected (add --create-indexes to add missing indexes first).
+
+    python3 scripts/check_memory_db_plans.py --rows 200000
+    python3 scripts/check_memory_db_plans.py --db ~/.openclaw/workspace1/memory_system/openclaw_memory.db
+"""
+import argparse
+import pathlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+
+def build_db(path, rows, seed=3):
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE memories (id INTEGER PRIMARY KEY, agent TEXT, type TEXT, "
+                 "importance INTEGER, content TEXT, created_at TEXT, embedding BLOB)")
+    agents = [f"agent-{i}" for i in range(8)]
+    types = ["fact", "task", "decision", "error", "note"]
+    base = time.time() - rows * 30
+    conn.executemany(
+        "INSERT INTO memories (agent, type, importance, content, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((rnd.choice(agents), rnd.choice(types), rnd.randint(1, 10), f"memory {i}",
+          time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(base + i * 30 + rnd.randint(0, 5))))
+         for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def page_latency(db, pages, limit=100, **filters):
+    """Milliseconds per page while walking `pages` pages with keyset cursors."""
+    timings, before = [], None
+    for _ in range(pages):
+        t0 = time.perf_counter()
+        rows, cursor = db.recent(limit, before=before, **filters)
+        timings.append((time.perf_counter() - t0) * 1000)
+        if cursor is None:
+            break
+        before = server.parse_memory_cursor(cursor)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="existing database to inspect instead of a synthetic one")
+    parser.add_argument("--create-indexes", action="store_true", help="with --db: create missing indexes")
+    parser.add_argument("--rows", type=int, default=100000, help="rows in the synthetic database")
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.db:
+        db = server.MemoryDB(args.db)
+        if args.create_indexes:
+            print("created:", db.ensure_indexes() or "none")
+    else:
+        path = str(pathlib.Path(tempfile.mkdtemp()) / "memories.db")
+        print(f"building {args.rows} rows in {path}")
+        build_db(path, args.rows)
+        db = server.MemoryDB(path)
+        print("created:", ", ".join(db.ensure_indexes()))
+
+    failures = 0
+    for name, info in db.query_plans().items():
+        status = "ok " if info["ok"] else "BAD"
+        failures += not info["ok"]
+        print(f"[{status}] {name:<18} {' | '.join(info['plan'])}")
+
+    if not args.db:
+        for filters in ({}, {"agent": "agent-3"}, {"agent": "agent-3", "type_": "task"}):
+            t = page_latency(db, args.pages, **filters)
+            print(f"pages {filters or 'all'}: {len(t)} pages, first {t[0]:.2f} ms, "
+                  f"last {t[-1]:.2f} ms, max {max(t):.2f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Fake openclaw gateway for testing the native backend offline.
+
+Writes a state directory (agents/*/sessions/sessions.json, cron/jobs.json)
+and serves the gateway endpoints the dashboard uses (HEAD /, POST
+/tools/invoke) over keep-alive HTTP/1.1. Point a dashboard at it with
+
+    python3 scripts/fake_gateway.py --port 18790 --state-dir /tmp/fake-openclaw
+    OPENCLAW_STATE_DIR=/tmp/fake-openclaw HOMIE_GATEWAY_URL=http://127.0.0.1:18790 python3 server.py
+
+or run --selftest to exercise the backend in-process: every source must be
+served natively over a single connection, and the CLI must never be forked.
+"""
+import argparse
+import http.server
+import json
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+AGENTS = ["main", "coder", "scout"]
+MODELS = ["anthropic/claude-sonnet", "openai/gpt-5", "ollama/qwen"]
+
+
+def write_state(state_dir, n_sessions, seed=13):
+    rnd = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    for agent in AGENTS:
+        store = {}
+        for i in range(n_sessions // len(AGENTS)):
+            tokens = rnd.randint(0, 200000)
+            store[f"agent:{agent}:session-{i}"] = {
+                "sessionId": f"{agent}-{i:05d}",
+                "updatedAt": now_ms - rnd.randint(0, 7 * 86400 * 1000),
+                "createdAt": now_ms - rnd.randint(7 * 86400 * 1000, 30 * 86400 * 1000),
+                "model": rnd.choice(MODELS),
+                "totalTokens": tokens,
+                "totalCost": round(tokens * 3e-6, 4),
+            }
+        path = state_dir / "agents" / agent / "sessions" / "sessions.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(store))
+    jobs = [{
+        "id": f"job-{i}", "name": f"nightly-{i}", "agentId": rnd.choice(AGENTS), "enabled": True,
+        "schedule": {"kind": "cron", "expr": f"{i} 3 * * *"},
+        "payload": {"kind": "agentTurn", "model": rnd.choice(MODELS)},
+        "state": {"lastRunAtMs": now_ms - 3600000, "lastStatus": "ok", "nextRunAtMs": now_ms + 3600000},
+    } for i in range(5)]
+    (state_dir / "cron").mkdir(parents=True, exist_ok=True)
+    (state_dir / "cron" / "jobs.json").write_text(json.dumps({"version": 1, "jobs": jobs}))
+
+
+CHANNELS = {"channels": [
+    {"name": "telegram", "usage": {"used": 12, "limit": 30, "window": "1m"}},
+    {"name": "slack", "usage": {"used": 40, "limit": 50, "window": "1m"}},
+]}
+
+
+class FakeGateway(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    token = ""
+    connections = 0
+    requests = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, body=True):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def _authorized(self):
+        type(self).requests += 1
+        return not self.token or self.headers.get("Authorization") == f"Bearer {self.token}"
+
+    def do_HEAD(self):
+        self._send(200 if self._authorized() else 401, {}, body=False)
+
+    def do_GET(self):
+        self._send(200 if self._authorized() else 401, {"ok": True, "service": "fake-openclaw-gateway"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self._authorized():
+            return self._send(401, {"ok": False, "error": "unauthorized"})
+        if self.path != "/tools/invoke":
+            return self._send(404, {"ok": False, "error": "not found"})
+        tool = json.loads(body or b"{}").get("tool")
+        if tool == "channels_list":
+            return self._send(200, {"ok": True, "result": {"details": CHANNELS}})
+        self._send(404, {"ok": False, "error": f"tool {tool} not available"})
+
+
+def serve(port, token):
+    FakeGateway.token = token
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), FakeGateway)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def selftest(state_dir, httpd, token, rounds):
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    server.OPENCLAW_BIN = "/nonexistent/openclaw"  # any CLI fallback fails loudly
+    backend = server.OpenClawBackend(state_dir, server.GatewayClient(url, token=token))
+    server.openclaw_backend = backend
+    checks = {
+        "sessions": lambda: server._load_sessions(),
+        "crons": lambda: server._load_configured_crons(),
+        "rate_limits": lambda: server._load_channel_limits(),
+        "health": lambda: backend.health_check(15),
+    }
+    failures = 0
+    for name, fn in checks.items():
+        first = fn()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        ms = (time.perf_counter() - t0) * 1000 / rounds
+        ok = bool(first) and (name != "health" or first.get("ok"))
+        failures += not ok
+        print(f"{name:>12}: {ms:7.3f} ms/call  {'ok' if ok else 'FAILED'}  {json.dumps(first)[:90]}")
+    stats = backend.stats()
+    cli_calls = sum(s["cli"] for s in stats["sources"].values())
+    print(f"gateway connections: {FakeGateway.connections} for {FakeGateway.requests} requests, CLI calls: {cli_calls}")
+    for source, s in stats["sources"].items():
+        if s["error"]:
+            print(f"  {source}: {s['error']}")
+    failures += cli_calls > 0 or FakeGateway.connections != 1
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--state-dir", help="where to write the fake state files (default: a temp dir)")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--token", default="fake-token")
+    parser.add_argument("--selftest", action="store_true")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    state_dir = pathlib.Path(args.state_dir or tempfile.mkdtemp(prefix="fake-openclaw-"))
+    write_state(state_dir, args.sessions)
+    httpd = serve(args.port, args.token)
+    if args.selftest:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        return selftest(state_dir, httpd, args.token, args.rounds)
+    print(f"fake gateway on http://127.0.0.1:{httpd.server_address[1]} (token {args.token!r}), state in {state_dir}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
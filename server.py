@@ -1,15 +1,55 @@
 #!/usr/bin/env python3
+import http.client
 import http.server
 import json
 import os
 import pathlib
 import subprocess
+import sys
 import re
+import bisect
+import codecs
+import itertools
 import time
+import random
 import argparse
+import array
+import urllib.parse
+import threading
+import contextlib
+import email.utils
+import gzip
+import html
+import hashlib
+import ctypes
+import ctypes.util
+import select
+import socket
+import sqlite3
+import queue
+import struct
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import brotli  # optional: enables Content-Encoding: br for static assets
+except ImportError:
+    brotli = None
+
+try:
+    import numpy as np  # optional: resident embedding index for /api/memory-search
+except ImportError:
+    np = None
+
 BASE_DIR = pathlib.Path(__file__).resolve().parent
+LOG_STREAM = sys.stdout  # mcp_server.py points this at stderr; its stdout carries the MCP protocol
+
+
+def log(message):
+    print(message, file=LOG_STREAM, flush=True)
+
 WORKSPACE = "/home/rosebud0585/.openclaw/workspace1"
 MEMORY_DIR = f"{WORKSPACE}/memory"
 SKILLS_DIR = f"{WORKSPACE}/skills"
@@ -19,29 +59,300 @@ WORKSPACE_PATH = pathlib.Path(WORKSPACE)
 TASKBOARD_FILE = WORKSPACE_PATH / "taskboard-projects.json"
 COST_HISTORY_FILE = BASE_DIR / "cost-history.json"
 
-# Simple TTL cache for expensive functions
-_cache = {}
-def cached(ttl_seconds=30):
-    """Decorator to cache function results with TTL."""
+# Bounded TTL cache for expensive functions. Every @cached function gets its own
+# namespace (its __name__) inside one process-wide LRU store.
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _approx_size(obj):
+    """Rough deep size in bytes of a JSON-like value."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_approx_size(v) for v in obj)
+    return size
+
+
+class CacheStore:
+    """Size-bounded LRU of (namespace, key) entries with per-entry max age.
+
+    Each namespace carries a generation number, so invalidating a namespace is
+    O(1): entries from an older generation count as misses and are dropped
+    when next touched or evicted by the LRU.
+    """
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (ns, key) -> (value, ts, max_age, gen, size)
+        self._generations = {}
+        self._stats = {}
+        self._bytes = 0
+
+    def _ns_stats(self, ns):
+        stats = self._stats.get(ns)
+        if stats is None:
+            stats = self._stats[ns] = {
+                "hits": 0, "stale_hits": 0, "misses": 0,
+                "evictions": 0, "expirations": 0, "invalidations": 0,
+            }
+        return stats
+
+    def _drop(self, full_key):
+        entry = self._entries.pop(full_key)
+        self._bytes -= entry[4]
+
+    def get(self, ns, key, ttl):
+        """Return ("fresh" | "stale" | "miss", value); stale means older than ttl but within max age."""
+        full_key = (ns, key)
+        now = time.time()
+        with self._lock:
+            stats = self._ns_stats(ns)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[3] != self._generations.get(ns, 0):
+                self._drop(full_key)
+                entry = None
+            elif entry is not None and now - entry[1] >= entry[2]:
+                self._drop(full_key)
+                stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                stats["misses"] += 1
+                return "miss", None
+            self._entries.move_to_end(full_key)
+            if now - entry[1] < ttl:
+                stats["hits"] += 1
+                return "fresh", entry[0]
+            stats["stale_hits"] += 1
+            return "stale", entry[0]
+
+    def put(self, ns, key, value, max_age):
+        full_key = (ns, key)
+        size = _approx_size(value)
+        with self._lock:
+            if full_key in self._entries:
+                self._drop(full_key)
+            self._entries[full_key] = (value, time.time(), max_age, self._generations.get(ns, 0), size)
+            self._bytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                old_key, _ = next(iter(self._entries.items()))
+                self._drop(old_key)
+                self._ns_stats(old_key[0])["evictions"] += 1
+
+    def invalidate(self, ns):
+        with self._lock:
+            self._generations[ns] = self._generations.get(ns, 0) + 1
+            self._ns_stats(ns)["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            namespaces = {ns: dict(st, entries=0, bytes=0) for ns, st in self._stats.items()}
+            for (ns, _), entry in self._entries.items():
+                ns_stats = namespaces.setdefault(ns, dict(self._ns_stats(ns), entries=0, bytes=0))
+                ns_stats["entries"] += 1
+                ns_stats["bytes"] += entry[4]
+            for ns_stats in namespaces.values():
+                lookups = ns_stats["hits"] + ns_stats["stale_hits"] + ns_stats["misses"]
+                ns_stats["hit_ratio"] = round((ns_stats["hits"] + ns_stats["stale_hits"]) / lookups, 3) if lookups else 0.0
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "namespaces": namespaces,
+            }
+
+
+_cache_store = CacheStore()
+# Computations currently running per (namespace, key), so concurrent misses share one.
+_inflight = {}
+_inflight_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="homie-refresh")
+
+
+class _Flight:
+    """One in-progress computation of a cached value."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def cached(ttl_seconds=30, stale_seconds=0):
+    """Decorator to cache function results with TTL.
+
+    Concurrent misses for the same key are coalesced into one call. With
+    stale_seconds, an expired value keeps being served for up to that long
+    while a single background refresh recomputes it; once a value is older
+    than ttl_seconds + stale_seconds callers wait for a fresh one.
+    """
+    max_age = ttl_seconds + stale_seconds
     def decorator(func):
+        ns = func.__name__
+
+        def compute(key, args, kwargs, flight):
+            try:
+                flight.result = func(*args, **kwargs)
+                _cache_store.put(ns, key, flight.result, max_age)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with _inflight_lock:
+                    _inflight.pop((ns, key), None)
+                flight.done.set()
+
         def wrapper(*args, **kwargs):
-            key = (func.__name__, tuple(args), tuple(sorted(kwargs.items())))
-            now = time.time()
-            if key in _cache:
-                val, ts = _cache[key]
-                if now - ts < ttl_seconds:
-                    return val
-            result = func(*args, **kwargs)
-            _cache[key] = (result, now)
-            return result
+            key = (tuple(args), tuple(sorted(kwargs.items())))
+            with _inflight_lock:
+                state, value = _cache_store.get(ns, key, ttl_seconds)
+                if state == "fresh":
+                    return value
+                flight = _inflight.get((ns, key))
+                owner = flight is None
+                if owner:
+                    flight = _inflight[(ns, key)] = _Flight()
+            if state == "stale":
+                if owner:
+                    _refresh_pool.submit(compute, key, args, kwargs, flight)
+                return value
+            if owner:
+                compute(key, args, kwargs, flight)
+            else:
+                flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
         return wrapper
     return decorator
 
-# Periodic cache cleanup to prevent memory bloat
-def _cleanup_cache():
-    global _cache
-    now = time.time()
-    _cache = {k: (v, ts) for k, (v, ts) in _cache.items() if now - ts < 300}
+# Background collectors: each subprocess-backed source is refreshed on its own
+# schedule so request handlers only read the latest in-memory snapshot.
+COLLECTOR_INTERVALS = {
+    "sessions": 15,
+    "crons": 60,
+    "rate_limits": 60,
+    "gateway_health": 15,
+    "ollama": 30,
+}
+COLLECTOR_JITTER = 0.1
+COLLECTOR_MAX_BACKOFF = 300
+_collectors = {}
+_collectors_stop = threading.Event()
+_collector_listeners = []  # callables(name) run after each successful collection
+
+
+class Collector:
+    """Refreshes one data source in a daemon thread and keeps its latest snapshot.
+
+    Failures keep the last good value and back off exponentially, capped at
+    COLLECTOR_MAX_BACKOFF seconds.
+    """
+    def __init__(self, name, fn, interval):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._value = None
+        self._has_value = False
+        self.last_success = None
+        self.last_attempt = None
+        self.last_error = None
+        self.last_duration_ms = None
+        self.failures = 0
+
+    def snapshot(self):
+        with self._lock:
+            return self._has_value, self._value
+
+    def run_once(self):
+        started = time.time()
+        try:
+            value = self.fn()
+        except Exception as e:
+            with self._lock:
+                self.last_attempt = started
+                self.failures += 1
+                self.last_error = str(e) or type(e).__name__
+            return False
+        with self._lock:
+            self._value = value
+            self._has_value = True
+            self.last_attempt = started
+            self.last_success = time.time()
+            self.last_duration_ms = int((self.last_success - started) * 1000)
+            self.failures = 0
+            self.last_error = None
+        for listener in list(_collector_listeners):
+            try:
+                listener(self.name)
+            except Exception:
+                pass
+        return True
+
+    def next_delay(self):
+        with self._lock:
+            failures = self.failures
+        delay = self.interval
+        if failures:
+            delay = max(self.interval, min(self.interval * 2 ** failures, COLLECTOR_MAX_BACKOFF))
+        return delay * random.uniform(1 - COLLECTOR_JITTER, 1 + COLLECTOR_JITTER)
+
+    def start(self, stop_event):
+        def loop():
+            self.run_once()
+            while not stop_event.wait(self.next_delay()):
+                self.run_once()
+        threading.Thread(target=loop, name=f"collector-{self.name}", daemon=True).start()
+
+    def status(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "interval": self.interval,
+                "has_value": self._has_value,
+                "last_success": self.last_success,
+                "last_attempt": self.last_attempt,
+                "last_duration_ms": self.last_duration_ms,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+def collected(name, fallback):
+    """Return the latest snapshot of collector name, or fallback() if it has none yet."""
+    collector = _collectors.get(name)
+    if collector is not None:
+        ok, value = collector.snapshot()
+        if ok:
+            return value
+    return fallback()
+
+
+def start_collectors(intervals):
+    """Start one Collector per source in COLLECTOR_SOURCES; interval <= 0 disables it."""
+    for name, fn in COLLECTOR_SOURCES.items():
+        interval = intervals.get(name, COLLECTOR_INTERVALS.get(name, 0))
+        if interval <= 0:
+            continue
+        collector = Collector(name, fn, interval)
+        _collectors[name] = collector
+        collector.start(_collectors_stop)
+
+
+def parse_collector_intervals(spec):
+    """Parse "sessions=15,crons=60" into {"sessions": 15.0, "crons": 60.0}."""
+    intervals = dict(COLLECTOR_INTERVALS)
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        name, val = part.split("=", 1)
+        name = name.strip()
+        if name not in COLLECTOR_INTERVALS:
+            raise ValueError(f"Unknown collector: {name}")
+        intervals[name] = float(val)
+    return intervals
 
 def discover_skills():
     """Auto-discover skills from the skills directory."""
@@ -65,6 +376,8 @@ OPENCLAW_BIN = "/home/rosebud0585/.npm-global/bin/openclaw"
 
 ACTION_COOLDOWN_SEC = 10
 _action_last_run = {}
+_action_running = set()
+_action_lock = threading.Lock()
 ACTION_MAP = {
     "restart_homie_dashboard": {
         "label": "Restart homie-dashboard.service",
@@ -79,6 +392,7 @@ ACTION_MAP = {
     "check_gateway_health": {
         "label": "Check OpenClaw Gateway health",
         "cmd": ["/home/rosebud0585/.npm-global/bin/openclaw", "health"],
+        "backend": "health_check",  # OpenClawBackend method; falls back to cmd
         "timeout": 15,
     },
 }
@@ -86,8 +400,13 @@ ACTION_MAP = {
 _cpu_last_idle = 0
 _cpu_last_total = 0
 _cpu_last_time = 0
+_cpu_lock = threading.Lock()
 
 def get_cpu():
+    with _cpu_lock:
+        return _get_cpu_locked()
+
+def _get_cpu_locked():
     global _cpu_last_idle, _cpu_last_total, _cpu_last_time
     try:
         with open('/proc/stat') as f:
@@ -145,43 +464,626 @@ def get_uptime():
     except:
         return "unknown"
 
-@cached(ttl_seconds=30)
-def parse_activities(limit=50):
-    acts = []
+METRICS_INTERVAL_SEC = float(os.getenv("HOMIE_METRICS_INTERVAL", "5"))
+METRICS_HISTORY_SEC = int(os.getenv("HOMIE_METRICS_HISTORY", "86400"))
+METRIC_FIELDS = ("t", "cpu_percent", "ram_gb", "disk_gb", "load1", "load5", "load15")
+
+
+class MetricRing:
+    """Fixed-capacity ring of aligned float columns backed by array('d')."""
+    def __init__(self, fields, capacity, cores=0):
+        self.fields = fields
+        self.capacity = capacity
+        self.cores = cores
+        self._cols = {f: array.array("d", bytes(8 * capacity)) for f in fields}
+        self._core_cols = [array.array("d", bytes(8 * capacity)) for _ in range(cores)]
+        self._head = 0   # next slot to write
+        self._count = 0
+
+    def append(self, row, core_row=()):
+        i = self._head
+        for f, v in zip(self.fields, row):
+            self._cols[f][i] = v
+        for col, v in zip(self._core_cols, core_row):
+            col[i] = v
+        self._head = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def __len__(self):
+        return self._count
+
+    def indices(self, since=None):
+        """Slot indices oldest first, optionally only samples with t >= since."""
+        start = (self._head - self._count) % self.capacity
+        idx = [(start + n) % self.capacity for n in range(self._count)]
+        if since is not None and idx:
+            t = self._cols["t"]
+            lo, hi = 0, len(idx)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if t[idx[mid]] < since:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            idx = idx[lo:]
+        return idx
+
+    def column(self, field):
+        return self._cols[field]
+
+    def core_column(self, n):
+        return self._core_cols[n]
+
+
+def _read_proc_stat():
+    """{"cpu": (idle, total), "cpu0": ...} from /proc/stat."""
+    out = {}
+    with open("/proc/stat") as f:
+        for line in f:
+            if not line.startswith("cpu"):
+                break
+            parts = line.split()
+            fields = list(map(int, parts[1:]))
+            out[parts[0]] = (fields[3] + (fields[4] if len(fields) > 4 else 0), sum(fields))
+    return out
+
+
+def _busy_percent(prev, cur):
+    idle, total = cur[0] - prev[0], cur[1] - prev[1]
+    return round(100 * (1 - idle / total), 1) if total > 0 else 0.0
+
+
+class MetricsSampler:
+    """Samples CPU (total and per core), memory, disk and load every interval seconds.
+
+    Samples go into a MetricRing covering METRICS_HISTORY_SEC; the latest
+    /api/status payload is prebuilt on each sample so reads are O(1).
+    """
+    def __init__(self, interval=METRICS_INTERVAL_SEC, history_sec=METRICS_HISTORY_SEC):
+        self.history_sec = history_sec
+        self._lock = threading.Lock()
+        self._prev = None
+        self._latest = None
+        self._thread = None
+        self._configure(interval)
+
+    def _configure(self, interval):
+        try:
+            cores = sum(1 for k in _read_proc_stat() if k != "cpu")
+        except OSError:
+            cores = 0
+        self.interval = interval
+        self.ring = MetricRing(METRIC_FIELDS, max(2, int(self.history_sec / interval)), cores)
+
+    def sample(self):
+        now = time.time()
+        try:
+            stat = _read_proc_stat()
+        except OSError:
+            stat = {}
+        prev, self._prev = self._prev, stat
+        cpu = _busy_percent(prev["cpu"], stat["cpu"]) if prev and "cpu" in stat else None
+        cores = [_busy_percent(prev[f"cpu{n}"], stat[f"cpu{n}"]) if prev and f"cpu{n}" in stat else 0.0
+                 for n in range(self.ring.cores)]
+        try:
+            load = os.getloadavg()
+        except OSError:
+            load = (0.0, 0.0, 0.0)
+        ram, ramt = get_mem()
+        dsk, dskt = get_disk()
+        status = {"cpu_percent": cpu if cpu is not None else 0.0, "ram_gb": ram, "ram_total_gb": ramt,
+                  "disk_gb": dsk, "disk_total_gb": dskt, "uptime": get_uptime(),
+                  "load_avg": [round(v, 2) for v in load], "cpu_cores": cores, "sampled_at": now}
+        if cpu is None:  # the first sample only primes the /proc/stat deltas
+            return None
+        with self._lock:
+            self.ring.append((now, cpu, ram, dsk, *load), cores)
+            self._latest = status
+        return status
+
+    def latest(self):
+        with self._lock:
+            return self._latest
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception as e:
+                log(f"Metrics sampler: {e}")
+            time.sleep(max(0.1, self.interval - (time.monotonic() - started)))
+
+    def start(self, interval=None):
+        with self._lock:
+            if self._thread is not None:
+                return
+            if interval and interval != self.interval:
+                self._configure(interval)
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._prev = None
+        self.sample()
+        time.sleep(min(1.0, self.interval))
+        self.sample()
+        self._thread.start()
+
+    def history(self, window=3600, step=None, cores=False):
+        """Bucket means over the last window seconds, one bucket per step seconds."""
+        step = max(self.interval, step or self.interval)
+        now = time.time()
+        start = now - window
+        with self._lock:
+            idx = self.ring.indices(since=start)
+            cols = {f: self.ring.column(f) for f in METRIC_FIELDS}
+            core_cols = [self.ring.core_column(n) for n in range(self.ring.cores)] if cores else []
+            buckets = {}
+            for i in idx:
+                b = int((cols["t"][i] - start) // step)
+                acc = buckets.get(b)
+                if acc is None:
+                    acc = buckets[b] = [0, [0.0] * (len(METRIC_FIELDS) - 1), [0.0] * len(core_cols), 0.0]
+                acc[0] += 1
+                sums = acc[1]
+                for n, f in enumerate(METRIC_FIELDS[1:]):
+                    sums[n] += cols[f][i]
+                for n, col in enumerate(core_cols):
+                    acc[2][n] += col[i]
+                acc[3] = max(acc[3], cols["cpu_percent"][i])
+        series = {f: [] for f in METRIC_FIELDS}
+        series["cpu_max"] = []
+        if cores:
+            series["cpu_cores"] = [[] for _ in core_cols]
+        for b in sorted(buckets):
+            count, sums, core_sums, cpu_max = buckets[b]
+            series["t"].append(round(start + (b + 1) * step, 3))
+            for n, f in enumerate(METRIC_FIELDS[1:]):
+                series[f].append(round(sums[n] / count, 2))
+            series["cpu_max"].append(cpu_max)
+            for n, s in enumerate(core_sums):
+                series["cpu_cores"][n].append(round(s / count, 1))
+        return {"ok": True, "interval": self.interval, "window": window, "step": step,
+                "samples": len(idx), "points": len(series["t"]), "series": series}
+
+
+metrics_sampler = MetricsSampler()
+
+
+MEMORY_FILE_RE = re.compile(r"\d{4}-\d{2}-\d{2}\.md")
+ACTIVITY_RULES_FILE = pathlib.Path(os.getenv("HOMIE_ACTIVITY_RULES", BASE_DIR / "activity-rules.json"))
+
+# Ordered rules: the first rule (in this order) with a keyword anywhere in the
+# lowercased line wins; "prefix" rules match on the stripped line's start.
+DEFAULT_ACTIVITY_RULES = [
+    {"type": "complete", "icon": "✓", "color": "green", "keywords": ["complete", "done", "finish", "success"]},
+    {"type": "error", "icon": "!", "color": "red", "keywords": ["error", "fail", "crash", "broken"]},
+    {"type": "warning", "icon": "⚠", "color": "amber", "keywords": ["warning", "alert", "timeout", "429"]},
+    {"type": "create", "icon": "+", "keywords": ["create", "add", "new", "build"]},
+    {"type": "update", "icon": "⟳", "keywords": ["update", "change", "modify", "edit"]},
+    {"type": "delete", "icon": "−", "keywords": ["delete", "remove", "clean", "prune"]},
+    {"type": "setup", "icon": "⚙", "keywords": ["install", "setup", "configure"]},
+    {"type": "run", "icon": "▶", "keywords": ["run", "execute", "start", "launch"]},
+    {"type": "section", "icon": "◆", "color": "purple", "prefix": "#"},
+]
+DEFAULT_ISSUE_RULES = [
+    {"type": "error", "keywords": ["error", "fail", "429", "blocked"]},
+    {"type": "warning", "keywords": ["warning", "missing", "rate limit", "timeout"]},
+]
+
+
+class KeywordClassifier:
+    """First-matching-rule keyword classifier.
+
+    match() classifies one line by checking rules in priority order.
+    classify_lines() classifies a whole chunk in bulk: every keyword is located
+    with one C-level str.find sweep over the joined, lowercased chunk and each
+    hit lowers the best rule index of the line it falls in, so the per-line
+    Python work is independent of the number of rules.
+    """
+    def __init__(self, rules, default=None):
+        self.rules = [dict(r) for r in rules]
+        self.default = default
+        self._ordered = [(idx, tuple(k.lower() for k in r.get("keywords", []) if k))
+                         for idx, r in enumerate(self.rules)]
+        self._prefix_rules = [(idx, r["prefix"]) for idx, r in enumerate(self.rules) if r.get("prefix")]
+        self._keywords = []
+        seen = set()
+        for idx, kws in self._ordered:
+            for kw in kws:
+                if kw not in seen:
+                    seen.add(kw)
+                    self._keywords.append((kw, idx))
+
+    def _rule(self, idx, line):
+        for pidx, prefix in self._prefix_rules:
+            if pidx >= idx:
+                break
+            if line.startswith(prefix):
+                idx = pidx
+                break
+        return self.rules[idx] if idx < len(self.rules) else self.default
+
+    def match(self, line):
+        """Return the winning rule dict for line, or self.default."""
+        lo = line.lower()
+        for idx, kws in self._ordered:
+            if kws and any(k in lo for k in kws):
+                return self._rule(idx, line)
+        return self._rule(len(self.rules), line)
+
+    def classify_lines(self, lines):
+        """Return the winning rule (or default) for every line in lines."""
+        if not lines:
+            return []
+        text = "\n".join(lines)
+        lo = text.lower()
+        if len(lo) != len(text):
+            return [self.match(line) for line in lines]
+        starts = [0]
+        starts.extend(itertools.accumulate(len(line) + 1 for line in lines[:-1]))
+        none = len(self.rules)
+        best = [none] * len(lines)
+        find = lo.find
+        for kw, idx in self._keywords:
+            pos = find(kw)
+            while pos != -1:
+                li = bisect.bisect_right(starts, pos) - 1
+                if idx < best[li]:
+                    best[li] = idx
+                pos = find(kw, pos + 1)
+        return [self._rule(idx, line) for idx, line in zip(best, lines)]
+
+
+def load_classifier_rules(path=None):
+    """Activity and issue rules from ACTIVITY_RULES_FILE, falling back to the defaults.
+
+    The file is JSON: {"activity": [rule, ...], "issues": [rule, ...]}; either
+    key may be omitted.
+    """
+    activity, issues = DEFAULT_ACTIVITY_RULES, DEFAULT_ISSUE_RULES
+    path = pathlib.Path(path or ACTIVITY_RULES_FILE)
     try:
-        dir_entries = os.listdir(MEMORY_DIR)
-    except OSError:
-        return acts
-    files = sorted([f for f in dir_entries if re.match(r"\d{4}-\d{2}-\d{2}\.md", f)], reverse=True)
-    for fname in files[:7]:
-        date = fname.replace('.md', '')
+        if path.exists():
+            cfg = json.loads(path.read_text())
+            activity = cfg.get("activity") or activity
+            issues = cfg.get("issues") or issues
+    except Exception as e:
+        log(f"Ignoring invalid classifier rules in {path}: {e}")
+    return activity, issues
+
+
+_activity_rules, _issue_rules = load_classifier_rules()
+activity_classifier = KeywordClassifier(_activity_rules, default={"type": "note", "icon": "•", "color": "cyan"})
+issue_classifier = KeywordClassifier(_issue_rules)
+
+
+def classify_activity(line):
+    """Return (type, icon, color) for a stripped memory line."""
+    rule = activity_classifier.match(line)
+    return rule["type"], rule.get("icon", "•"), rule.get("color", "cyan")
+
+
+def _is_activity_line(line):
+    if not line or len(line) < 10:
+        return False
+    return not (line.startswith('# MEMORY') or line.startswith('---') or line.startswith('Last updated'))
+
+
+def _activity_entry(date, line, rule):
+    return {'date': date, 'message': line[:100], 'type': rule["type"],
+            'icon': rule.get("icon", "•"), 'color': rule.get("color", "cyan")}
+
+
+def _activity_from_line(date, raw):
+    line = raw.strip()
+    if not _is_activity_line(line):
+        return None
+    return _activity_entry(date, line, activity_classifier.match(line))
+
+
+def _activities_from_lines(date, raws):
+    lines = [line for line in (raw.strip() for raw in raws) if _is_activity_line(line)]
+    return [_activity_entry(date, line, rule)
+            for line, rule in zip(lines, activity_classifier.classify_lines(lines))]
+
+
+def _issue_from_line(raw):
+    rule = issue_classifier.match(raw)
+    if rule is None:
+        return None
+    return {"message": raw.strip()[:120], "level": rule["type"]}
+
+
+MEMORY_TAIL_CHECK_BYTES = 64 * 1024
+
+
+def _tail_digest(f, size):
+    start = max(0, size - MEMORY_TAIL_CHECK_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(size - start)).digest()
+
+
+class _MemoryFile:
+    """Parsed state of one YYYY-MM-DD.md file, extended in place as the file grows."""
+    def __init__(self, date):
+        self.date = date
+        self.mtime = None
+        self.size = 0
+        self.complete_upto = 0   # byte offset just past the last parsed newline
+        self.inode = None
+        self.tail_digest = None  # sha1 of the MEMORY_TAIL_CHECK_BYTES before size, used to detect rewrites
+        self.chunks = []         # decoded complete-line text
+        self.partial = ""        # trailing text without a newline yet
+        self.activities = []
+        self.issues = []
+        self._content = None
+
+    def reset(self):
+        self.__init__(self.date)
+
+    def ingest(self, data, base_offset):
+        """Parse bytes read from base_offset (== complete_upto) onwards."""
+        cut = data.rfind(b"\n") + 1
+        if cut:
+            text = data[:cut].decode("utf-8", errors="replace")
+            self.chunks.append(text)
+            raws = text.split("\n")[:-1]
+            self.activities.extend(_activities_from_lines(self.date, raws))
+            for raw, rule in zip(raws, issue_classifier.classify_lines(raws)):
+                if rule is not None:
+                    self.issues.append({"message": raw.strip()[:120], "level": rule["type"]})
+            self.complete_upto = base_offset + cut
+        self.partial = data[cut:].decode("utf-8", errors="replace")
+        self._content = None
+
+    def content(self):
+        if self._content is None:
+            self._content = "".join(self.chunks) + self.partial
+        return self._content
+
+    def all_activities(self):
+        tail = _activity_from_line(self.date, self.partial) if self.partial else None
+        return self.activities + [tail] if tail else self.activities
+
+    def all_issues(self):
+        tail = _issue_from_line(self.partial) if self.partial else None
+        return self.issues + [tail] if tail else self.issues
+
+
+class MemoryCorpus:
+    """Shared index of MEMORY_DIR daily files with incremental per-file parsing.
+
+    Parse results are keyed by (mtime, size). When a file changed, it counts
+    as appended to if it has the same inode, did not shrink, and the last
+    MEMORY_TAIL_CHECK_BYTES of the old content are unchanged; then only the
+    new bytes are parsed, otherwise the file is parsed from scratch. The
+    check reads a bounded window, so steady-state cost scales with new bytes
+    rather than file size. A same-length in-place edit entirely before that
+    window goes unnoticed until the file is next rewritten or replaced.
+    """
+    RESCAN_SEC = 60
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._scanned_at = 0
+        self._dates = []
+        self._files = {}
+
+    def dates(self):
+        """Known dates, newest first; re-lists the directory only when it changed."""
+        with self._lock:
+            self._rescan()
+            return list(self._dates)
+
+    def _rescan(self):
         try:
-            with open(f"{MEMORY_DIR}/{fname}", "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or len(line) < 10:
-                        continue
-                    if line.startswith('# MEMORY') or line.startswith('---') or line.startswith('Last updated'):
+            dir_mtime = os.stat(self.directory).st_mtime
+        except OSError:
+            self._dates, self._files, self._dir_mtime = [], {}, None
+            return
+        if dir_mtime == self._dir_mtime and time.time() - self._scanned_at < self.RESCAN_SEC:
+            return
+        names = [f for f in os.listdir(self.directory) if MEMORY_FILE_RE.fullmatch(f)]
+        self._dates = sorted((f[:-3] for f in names), reverse=True)
+        known = set(self._dates)
+        for date in [d for d in self._files if d not in known]:
+            del self._files[date]
+        self._dir_mtime = dir_mtime
+        self._scanned_at = time.time()
+
+    def file(self, date):
+        """Up-to-date _MemoryFile for date, or None if it does not exist."""
+        with self._lock:
+            path = os.path.join(self.directory, f"{date}.md")
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._files.pop(date, None)
+                return None
+            entry = self._files.get(date)
+            if entry is None:
+                entry = self._files[date] = _MemoryFile(date)
+            if (st.st_mtime, st.st_size) == (entry.mtime, entry.size):
+                return entry
+            self._update(entry, path, st)
+            return entry
+
+    def _update(self, entry, path, st):
+        with open(path, "rb") as f:
+            appended = (entry.mtime is not None and st.st_ino == entry.inode and st.st_size >= entry.size
+                        and _tail_digest(f, entry.size) == entry.tail_digest)
+            if not appended:
+                entry.reset()
+            f.seek(entry.complete_upto)
+            data = f.read(st.st_size - entry.complete_upto)
+            entry.ingest(data, entry.complete_upto)
+            entry.tail_digest = _tail_digest(f, st.st_size)
+        entry.inode = st.st_ino
+        entry.mtime = st.st_mtime
+        entry.size = st.st_size
+
+    def content(self, date):
+        entry = self.file(date)
+        return entry.content() if entry else None
+
+    def activities(self, limit=50, days=7):
+        acts = []
+        for date in self.dates()[:days]:
+            entry = self.file(date)
+            if entry is None:
+                continue
+            acts.extend(entry.all_activities()[:limit - len(acts)])
+            if len(acts) >= limit:
+                break
+        return acts
+
+    def issues(self):
+        """Issue-like lines from the newest memory file."""
+        dates = self.dates()
+        entry = self.file(dates[0]) if dates else None
+        return list(entry.all_issues()) if entry else []
+
+
+memory_corpus = MemoryCorpus(MEMORY_DIR)
+
+
+def parse_activities(limit=50):
+    return memory_corpus.activities(limit=limit)
+
+
+MEMORY_FTS_DB = os.getenv("HOMIE_MEMORY_FTS_DB", str(BASE_DIR / "memory-fts.db"))
+MEMORY_FTS_RESCAN_SEC = 2
+MEMORY_FTS_CHUNK_LINES = 40
+_FTS_MARK = ("\x01", "\x02")
+
+
+def _memory_chunks(text):
+    """(first line no, heading, text) sections: split at markdown headings and every CHUNK_LINES lines."""
+    chunks, lines, start, heading = [], [], 1, ""
+    for no, line in enumerate(text.split("\n"), 1):
+        if lines and (line.startswith("#") or len(lines) >= MEMORY_FTS_CHUNK_LINES):
+            chunks.append((start, heading, "\n".join(lines)))
+            lines, start = [], no
+        if line.startswith("#"):
+            heading = line.lstrip("#").strip()
+        lines.append(line)
+    if any(l.strip() for l in lines):
+        chunks.append((start, heading, "\n".join(lines)))
+    return [c for c in chunks if c[2].strip()]
+
+
+def _fts_fallback_query(q):
+    """Quote every token so arbitrary user input is a valid FTS5 AND query."""
+    tokens = re.findall(r"\w+", q)
+    return " ".join(f'"{t}"' for t in tokens)
+
+
+class MemoryFTS:
+    """SQLite FTS5 index over the MEMORY_DIR daily files.
+
+    Each file is split into heading/line-bounded sections; a file is
+    re-indexed only when its (mtime, size) changed and dropped when it
+    disappears. The directory is re-checked at most every RESCAN_SEC.
+    """
+    def __init__(self, directory, path=MEMORY_FTS_DB):
+        self.directory = directory
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._checked_at = 0
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS files (date TEXT PRIMARY KEY, mtime REAL, size INTEGER)")
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+                         "content, heading, date UNINDEXED, line UNINDEXED, tokenize='porter unicode61')")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def refresh(self, force=False):
+        """Re-index changed files; returns the number of files (re)indexed or removed."""
+        with self._lock:
+            if not force and time.time() - self._checked_at < MEMORY_FTS_RESCAN_SEC:
+                return 0
+            conn = self._connection()
+            indexed = {d: (m, s) for d, m, s in conn.execute("SELECT date, mtime, size FROM files")}
+            current = {}
+            try:
+                for entry in os.scandir(self.directory):
+                    if MEMORY_FILE_RE.fullmatch(entry.name):
+                        st = entry.stat()
+                        current[entry.name[:-3]] = (st.st_mtime, st.st_size)
+            except OSError:
+                pass
+            changed = [d for d, sig in current.items() if indexed.get(d) != sig]
+            removed = [d for d in indexed if d not in current]
+            with conn:
+                for date in removed + changed:
+                    conn.execute("DELETE FROM chunks WHERE date = ?", (date,))
+                    conn.execute("DELETE FROM files WHERE date = ?", (date,))
+                for date in changed:
+                    try:
+                        with open(os.path.join(self.directory, f"{date}.md"), encoding="utf-8", errors="replace") as f:
+                            text = f.read()
+                    except OSError:
                         continue
-                    typ, icon, color = 'note', '•', 'cyan'
-                    lo = line.lower()
-                    if any(k in lo for k in ['complete','done','finish','success']): typ, icon, color = 'complete', '✓', 'green'
-                    elif any(k in lo for k in ['error','fail','crash','broken']): typ, icon, color = 'error', '!', 'red'
-                    elif any(k in lo for k in ['warning','alert','timeout','429']): typ, icon, color = 'warning', '⚠', 'amber'
-                    elif any(k in lo for k in ['create','add','new','build']): typ, icon = 'create', '+'
-                    elif any(k in lo for k in ['update','change','modify','edit']): typ, icon = 'update', '⟳'
-                    elif any(k in lo for k in ['delete','remove','clean','prune']): typ, icon = 'delete', '−'
-                    elif any(k in lo for k in ['install','setup','configure']): typ, icon = 'setup', '⚙'
-                    elif any(k in lo for k in ['run','execute','start','launch']): typ, icon = 'run', '▶'
-                    elif line.startswith('#'): typ, icon, color = 'section', '◆', 'purple'
-                    acts.append({'date': date, 'message': line[:100], 'type': typ, 'icon': icon, 'color': color})
-                    if len(acts) >= limit:
-                        break
-        except Exception as e:
-            pass
-        if len(acts) >= limit:
-            break
-    return acts
+                    conn.executemany("INSERT INTO chunks (content, heading, date, line) VALUES (?, ?, ?, ?)",
+                                     ((body, heading, date, line) for line, heading, body in _memory_chunks(text)))
+                    conn.execute("INSERT INTO files (date, mtime, size) VALUES (?, ?, ?)", (date, *current[date]))
+            self._checked_at = time.time()
+            return len(changed) + len(removed)
+
+    def search(self, q, date_from="", date_to="", limit=20, offset=0):
+        """Ranked sections matching q, with HTML-escaped snippets (<mark> around hits)."""
+        self.refresh()
+        where, params = ["chunks MATCH ?"], []
+        if date_from:
+            where.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("date <= ?")
+            params.append(date_to)
+        sql_where = " AND ".join(where)
+        rows_sql = ("SELECT date, line, heading, snippet(chunks, 0, ?, ?, '…', 16) AS snippet, bm25(chunks) AS score "
+                    f"FROM chunks WHERE {sql_where} ORDER BY rank LIMIT ? OFFSET ?")
+        # Raw FTS5 syntax (phrases, OR, NEAR, prefix*) first; plain tokens if it does not parse.
+        queries = [q] + [fq for fq in (_fts_fallback_query(q),) if fq and fq != q]
+        with self._lock:
+            conn = self._connection()
+            for i, query in enumerate(queries):
+                try:
+                    total = conn.execute(f"SELECT COUNT(*) FROM chunks WHERE {sql_where}", [query] + params).fetchone()[0]
+                    rows = conn.execute(rows_sql, [*_FTS_MARK, query] + params + [limit, offset]).fetchall()
+                    break
+                except sqlite3.OperationalError:
+                    if i == len(queries) - 1:
+                        return {"ok": False, "error": f"cannot parse query {q!r}", "results": [], "total": 0}
+        results = [{
+            "date": date, "line": line, "heading": heading, "score": round(-score, 4),
+            "snippet": html.escape(snippet).replace(_FTS_MARK[0], "<mark>").replace(_FTS_MARK[1], "</mark>"),
+        } for date, line, heading, snippet, score in rows]
+        return {
+            "ok": True,
+            "results": results,
+            "total": total,
+            "next_offset": offset + len(results) if offset + len(results) < total else None,
+        }
+
+
+memory_fts = MemoryFTS(MEMORY_DIR)
+
+
+def warm_memory_fts():
+    try:
+        n = memory_fts.refresh(force=True)
+        if n:
+            log(f"Memory FTS: indexed {n} files")
+    except Exception as e:
+        log(f"Memory FTS: index unavailable ({e})")
 
 
 def parse_todo_file(path):
@@ -217,7 +1119,6 @@ def parse_todo_file(path):
 
 
 def toggle_todo_item(path_str, line_no, new_done):
-    global _cache
     try:
         p = pathlib.Path(path_str).resolve()
         ws = WORKSPACE_PATH.resolve()
@@ -243,7 +1144,8 @@ def toggle_todo_item(path_str, line_no, new_done):
             lines[line_no] = repl_checkbox(m)
             p.write_text("\n".join(lines) + "\n")
             # Invalidate todo cache
-            _cache = {k: v for k, v in _cache.items() if not k[0].startswith('parse_todos')}
+            task_index.refresh_file(p)
+            _cache_store.invalidate('parse_todos')
             return True, "updated"
 
         m2 = re.match(r"^\s*[-*]\s*(✅|☑️|✔️|✔|🟩|🟢|⬜|🔲|❌|⭕)\s+(.+)$", raw)
@@ -252,7 +1154,8 @@ def toggle_todo_item(path_str, line_no, new_done):
             lines[line_no] = f"- {mark} {m2.group(2)}"
             p.write_text("\n".join(lines) + "\n")
             # Invalidate todo cache
-            _cache = {k: v for k, v in _cache.items() if not k[0].startswith('parse_todos')}
+            task_index.refresh_file(p)
+            _cache_store.invalidate('parse_todos')
             return True, "updated"
 
         return False, "Line is not a task item"
@@ -260,42 +1163,446 @@ def toggle_todo_item(path_str, line_no, new_done):
         return False, str(e)
 
 
-def run_allowed_action(action_id):
-    now = time.time()
-    if action_id not in ACTION_MAP:
-        return {"ok": False, "error": "Action not allowed"}, 400
+ACTION_JOB_WORKERS = 2
+ACTION_JOB_KEEP = 50             # finished jobs kept for /api/actions/jobs
+ACTION_OUTPUT_MAX = 256 * 1024   # characters of output kept per job
+ACTION_READ_CHUNK = 4096
 
-    last = _action_last_run.get(action_id, 0)
-    wait_left = ACTION_COOLDOWN_SEC - int(now - last)
-    if wait_left > 0:
-        return {"ok": False, "error": f"Cooldown active ({wait_left}s left)"}, 429
 
-    action = ACTION_MAP[action_id]
-    try:
-        proc = subprocess.run(
-            action["cmd"],
-            capture_output=True,
-            text=True,
-            timeout=action.get("timeout", 15),
-        )
-        _action_last_run[action_id] = now
-        out = (proc.stdout or "").strip()
-        err = (proc.stderr or "").strip()
+class ActionJob:
+    """One submitted action: its state and output as numbered (seq, stream, text) chunks.
+
+    Past ACTION_OUTPUT_MAX characters the oldest chunks are dropped; readers
+    resume after the seq of the last chunk they saw.
+    """
+    def __init__(self, action_id, action):
+        self.id = os.urandom(6).hex()
+        self.action_id = action_id
+        self.label = action.get("label", action_id)
+        self.status = "queued"
+        self.exit_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.dropped = 0
+        self._cond = threading.Condition()
+        self._chunks = deque()
+        self._seq = 0
+        self._size = 0
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def append(self, stream, text):
+        if not text:
+            return
+        with self._cond:
+            self._seq += 1
+            self._chunks.append((self._seq, stream, text))
+            self._size += len(text)
+            while self._size > ACTION_OUTPUT_MAX and len(self._chunks) > 1:
+                self._size -= len(self._chunks.popleft()[2])
+                self.dropped += 1
+            self._cond.notify_all()
+
+    def start(self):
+        with self._cond:
+            self.status, self.started_at = "running", time.time()
+            self._cond.notify_all()
+
+    def finish(self, status, exit_code=None, error=None):
+        with self._cond:
+            self.status, self.exit_code, self.error = status, exit_code, error
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def output(self, after=0):
+        with self._cond:
+            return [chunk for chunk in self._chunks if chunk[0] > after]
+
+    def wait(self, after, timeout):
+        """Block until there is output after seq `after` or the job is done; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq > after or self.done, timeout)
+
+    def wait_done(self, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout)
+
+    def to_dict(self, after=None):
+        with self._cond:
+            data = {
+                "id": self.id, "action": self.action_id, "label": self.label, "status": self.status,
+                "exit_code": self.exit_code, "error": self.error, "created_at": self.created_at,
+                "started_at": self.started_at, "finished_at": self.finished_at,
+                "seq": self._seq, "dropped": self.dropped,
+            }
+        if after is not None:
+            data["output"] = [{"seq": s, "stream": stream, "text": text} for s, stream, text in self.output(after)]
+        return data
+
+    def result(self):
+        """(response, status) in the shape of the old synchronous /api/actions/run."""
+        if self.status == "timeout":
+            return {"ok": False, "error": "Action timed out", "action": self.action_id, "job": self.id}, 504
+        if self.status == "error":
+            return {"ok": False, "error": self.error, "job": self.id}, 500
+        text = {"stdout": [], "stderr": []}
+        for _, stream, chunk in self.output():
+            text[stream].append(chunk)
+        ok = self.exit_code == 0
         return {
-            "ok": proc.returncode == 0,
-            "action": action_id,
-            "label": action.get("label", action_id),
-            "exit_code": proc.returncode,
-            "stdout": out[-2000:],
-            "stderr": err[-1200:],
-            "ran_at": int(now),
-        }, 200 if proc.returncode == 0 else 500
-    except subprocess.TimeoutExpired:
-        return {"ok": False, "error": "Action timed out", "action": action_id}, 504
-    except FileNotFoundError as e:
-        return {"ok": False, "error": f"Executable not found: {e}"}, 500
-    except Exception as e:
-        return {"ok": False, "error": str(e)}, 500
+            "ok": ok,
+            "action": self.action_id,
+            "label": self.label,
+            "exit_code": self.exit_code,
+            "stdout": "".join(text["stdout"]).strip()[-2000:],
+            "stderr": "".join(text["stderr"]).strip()[-1200:],
+            "ran_at": int(self.created_at),
+            "job": self.id,
+        }, 200 if ok else 500
+
+
+def _stream_action(cmd, job, timeout):
+    """Run cmd, appending stdout/stderr to job as it arrives; returns the exit code."""
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            bufsize=0)
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        proc.kill()
+
+    def pump(pipe, stream):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = pipe.read(ACTION_READ_CHUNK)
+            job.append(stream, decoder.decode(data, final=not data))
+            if not data:
+                return
+
+    timer = threading.Timer(timeout, kill)
+    stderr_reader = threading.Thread(target=pump, args=(proc.stderr, "stderr"), daemon=True)
+    timer.start()
+    stderr_reader.start()
+    try:
+        pump(proc.stdout, "stdout")
+        stderr_reader.join()
+        returncode = proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return returncode
+
+
+class ActionJobs:
+    """Runs allowed actions as jobs on a bounded executor.
+
+    The last ACTION_JOB_KEEP finished jobs stay available; queued and running
+    jobs are never evicted.
+    """
+    def __init__(self, workers=ACTION_JOB_WORKERS, keep=ACTION_JOB_KEEP):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="action")
+        self._keep = keep
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, action_id):
+        """(job, None), or (None, (response, status)) if the action is unknown, running or cooling down."""
+        now = time.time()
+        if action_id not in ACTION_MAP:
+            return None, ({"ok": False, "error": "Action not allowed"}, 400)
+        # Cooldown check and the running marker are one atomic step so two
+        # concurrent requests cannot both start the same action.
+        with _action_lock:
+            if action_id in _action_running:
+                return None, ({"ok": False, "error": "Action already running"}, 409)
+            last = _action_last_run.get(action_id, 0)
+            wait_left = ACTION_COOLDOWN_SEC - int(now - last)
+            if wait_left > 0:
+                return None, ({"ok": False, "error": f"Cooldown active ({wait_left}s left)"}, 429)
+            _action_running.add(action_id)
+        job = ActionJob(action_id, ACTION_MAP[action_id])
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job, None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def _run(self, job):
+        action = ACTION_MAP[job.action_id]
+        timeout = action.get("timeout", 15)
+        job.start()
+        try:
+            if action.get("backend"):
+                result = getattr(openclaw_backend, action["backend"])(timeout)
+                job.append("stdout", result["stdout"])
+                job.append("stderr", result["stderr"])
+                returncode = result["exit_code"]
+            else:
+                returncode = _stream_action(action["cmd"], job, timeout)
+            with _action_lock:
+                _action_last_run[job.action_id] = job.created_at
+            job.finish("succeeded" if returncode == 0 else "failed", returncode)
+        except subprocess.TimeoutExpired:
+            job.finish("timeout")
+        except FileNotFoundError as e:
+            job.finish("error", error=f"Executable not found: {e}")
+        except Exception as e:
+            job.finish("error", error=str(e))
+        finally:
+            with _action_lock:
+                _action_running.discard(job.action_id)
+            with self._lock:
+                finished = [job_id for job_id, j in self._jobs.items() if j.done]
+                for job_id in finished[:max(0, len(finished) - self._keep)]:
+                    del self._jobs[job_id]
+
+
+action_jobs = ActionJobs()
+
+
+def run_allowed_action(action_id):
+    """Run an action to completion and return the old synchronous (response, status)."""
+    job, error = action_jobs.submit(action_id)
+    if error:
+        return error
+    job.wait_done(None)
+    return job.result()
+
+
+TASK_FILENAMES = {"TODO.md", "TASKS.md", "CHECKLIST.md", "EXECUTION_QUEUE.md"}
+TASK_SKIP_DIRS = {".git", "node_modules", ".venv", ".venv-img", "__pycache__", "memory", ".openclaw"}
+TASK_RESCAN_SEC = 900           # safety rescan while inotify is active
+TASK_RESCAN_FALLBACK_SEC = 60   # rescan interval when inotify is unavailable
+
+
+class _Inotify:
+    """Minimal ctypes binding for Linux inotify; raises OSError where unsupported."""
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_ISDIR = 0x40000000
+    DIR_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify requires Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.DIR_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed: {os.strerror(err)}", path)
+        return wd
+
+    def read_events(self, timeout):
+        """Yield (wd, mask, name) tuples, waiting up to timeout seconds for the first."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        buf = os.read(self.fd, 64 * 1024)
+        off = 0
+        while off + 16 <= len(buf):
+            wd, mask, _cookie, length = struct.unpack_from("iIII", buf, off)
+            name = buf[off + 16:off + 16 + length].rstrip(b"\0")
+            off += 16 + length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TaskFileIndex:
+    """Persistent index of task files under a workspace root.
+
+    Directories are watched with inotify so only created, rewritten or removed
+    task files are re-parsed, and each change invalidates the parse_todos
+    cache. start() runs once at startup (main() or the MCP in-process
+    backend), never from the request path. A periodic rescan (stat-only for unchanged files) covers
+    missed events and is the sole update path where inotify is unavailable.
+    """
+    def __init__(self, root, filenames=TASK_FILENAMES, skip_dirs=TASK_SKIP_DIRS):
+        self.root = str(root)
+        self.filenames = set(filenames)
+        self.skip_dirs = set(skip_dirs)
+        self._lock = threading.Lock()
+        self._files = {}   # path -> (mtime, size, parsed)
+        self._wds = {}     # wd -> directory
+        self._watched = set()
+        self._inotify = None
+        self._started = False
+        self._ready = threading.Event()
+        self.last_scan = None
+
+    def _skip(self, dirname):
+        return dirname in self.skip_dirs or dirname.startswith('.')
+
+    def _set_file(self, path, entry):
+        if entry is None:
+            self._files.pop(path, None)
+        else:
+            self._files[path] = entry
+        _cache_store.invalidate('parse_todos')
+
+    def _indexable(self, path):
+        """True for a task file name under root that no skipped directory contains."""
+        rel = os.path.relpath(path, self.root)
+        parts = rel.split(os.sep)
+        return (os.path.basename(path) in self.filenames and not rel.startswith(os.pardir)
+                and not any(self._skip(d) for d in parts[:-1]))
+
+    def refresh_file(self, path):
+        """Re-parse path if its (mtime, size) changed; drop it if it disappeared.
+
+        Paths the scan would not index (other names, skipped directories) are ignored.
+        """
+        path = str(path)
+        with self._lock:
+            known = path in self._files
+        if not known and not self._indexable(path):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._set_file(path, None)
+            return
+        with self._lock:
+            old = self._files.get(path)
+        if old is not None and (old[0], old[1]) == (st.st_mtime, st.st_size):
+            return
+        parsed = parse_todo_file(pathlib.Path(path))
+        with self._lock:
+            self._set_file(path, (st.st_mtime, st.st_size, parsed))
+
+    def _watch(self, directory):
+        if self._inotify is None:
+            return
+        try:
+            self._wds[self._inotify.add_watch(directory)] = directory
+            self._watched.add(directory)
+        except OSError as e:
+            log(f"Task index: inotify unavailable for {directory} ({e}), falling back to rescans")
+            self._inotify.close()
+            self._inotify = None
+            self._wds.clear()
+            self._watched.clear()
+
+    def scan(self, top=None):
+        """Walk top (default: root), refreshing task files and (re)adding watches."""
+        top = str(top or self.root)
+        seen = set()
+        try:
+            for root, dirs, files in os.walk(top):
+                dirs[:] = [d for d in dirs if not self._skip(d)]
+                if root not in self._watched:
+                    self._watch(root)
+                for fn in files:
+                    if fn in self.filenames:
+                        path = os.path.join(root, fn)
+                        seen.add(path)
+                        self.refresh_file(path)
+        except OSError:
+            pass
+        with self._lock:
+            prefix = top.rstrip(os.sep) + os.sep
+            for path in [p for p in self._files if p.startswith(prefix) and p not in seen]:
+                self._set_file(path, None)
+        if top == self.root:
+            self.last_scan = time.time()
+
+    def _forget_dir(self, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self._lock:
+            for path in [p for p in self._files if p.startswith(prefix)]:
+                self._set_file(path, None)
+
+    def _handle(self, wd, mask, name):
+        ino = _Inotify
+        if mask & ino.IN_Q_OVERFLOW:
+            self.scan()
+            return
+        directory = self._wds.get(wd)
+        if mask & ino.IN_IGNORED:
+            self._watched.discard(self._wds.pop(wd, None))
+            return
+        if directory is None or not name:
+            return
+        path = os.path.join(directory, name)
+        if mask & ino.IN_ISDIR:
+            if self._skip(name):
+                return
+            if mask & (ino.IN_CREATE | ino.IN_MOVED_TO):
+                self.scan(path)
+            elif mask & (ino.IN_DELETE | ino.IN_MOVED_FROM):
+                self._forget_dir(path)
+        elif name in self.filenames:
+            self.refresh_file(path)
+
+    def _run(self):
+        next_scan = time.time() + (TASK_RESCAN_SEC if self._inotify else TASK_RESCAN_FALLBACK_SEC)
+        while True:
+            if self._inotify is not None:
+                try:
+                    for wd, mask, name in self._inotify.read_events(timeout=5):
+                        self._handle(wd, mask, name)
+                except OSError:
+                    self._inotify = None
+            else:
+                time.sleep(5)
+            if time.time() >= next_scan:
+                self.scan()
+                next_scan = time.time() + (TASK_RESCAN_SEC if self._inotify else TASK_RESCAN_FALLBACK_SEC)
+
+    def start(self):
+        """Initial scan plus background watcher thread; later calls wait for the initial scan."""
+        with self._lock:
+            started, self._started = self._started, True
+        if started:
+            self._ready.wait()
+            return
+        try:
+            self._inotify = _Inotify()
+        except (OSError, AttributeError) as e:
+            log(f"Task index: inotify unavailable ({e}), rescanning every {TASK_RESCAN_FALLBACK_SEC}s")
+        self.scan()
+        self._ready.set()
+        threading.Thread(target=self._run, name="task-index", daemon=True).start()
+
+    def files(self):
+        """Sorted [(path, parsed)] for every indexed task file."""
+        with self._lock:
+            return [(p, self._files[p][2]) for p in sorted(self._files)]
+
+
+task_index = TaskFileIndex(WORKSPACE)
 
 
 @cached(ttl_seconds=30)
@@ -340,30 +1647,16 @@ def parse_todos():
             pass
 
     # Fallback mode: auto-discover if no explicit map projects loaded.
+    # Workspace task files come from the inotify-maintained task_index,
+    # which is started at startup and fills in (invalidating this cache) as it scans.
     if not projects:
-        todo_files = []
-        if TODO_FILE.exists():
-            todo_files.append(TODO_FILE)
-
-        task_filenames = {"TODO.md", "TASKS.md", "CHECKLIST.md", "EXECUTION_QUEUE.md"}
-        skip_dirs = {".git", "node_modules", ".venv", ".venv-img", "__pycache__", "memory", ".openclaw"}
-
-        try:
-            for root, dirs, files in os.walk(WORKSPACE):
-                dirs[:] = [d for d in dirs if d not in skip_dirs and not d.startswith('.')]
-                for fn in files:
-                    if fn not in task_filenames:
-                        continue
-                    f = pathlib.Path(root) / fn
-                    if not str(f).startswith(str(WORKSPACE_PATH)):
-                        continue
-                    todo_files.append(f)
-        except:
-            pass
+        parsed_files = dict(task_index.files())
+        if TODO_FILE.exists() and str(TODO_FILE) not in parsed_files:
+            parsed_files[str(TODO_FILE)] = parse_todo_file(TODO_FILE)
 
-        todo_files = [pathlib.Path(p) for p in sorted({str(p) for p in todo_files})]
-        for f in todo_files:
-            parsed = parse_todo_file(f)
+        for path_str in sorted(parsed_files):
+            f = pathlib.Path(path_str)
+            parsed = parsed_files[path_str]
             if parsed["total"] == 0:
                 continue
 
@@ -388,66 +1681,669 @@ def parse_todos():
     grand_pct = round((grand_done / grand_total) * 100) if grand_total else 0
     return {"projects": projects, "total": grand_total, "done": grand_done, "percent": grand_pct}
 
-_ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
+_ansi_escape = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+_ANSI_PARTIAL_RE = re.compile(r'\x1b(?:\[[0-9;]*)?$')
+# A line may open the JSON document only if its first JSON_PROBE_CHARS are all JSON tokens.
+_JSON_LINE_RE = re.compile(r'[ \t\r]*([\[{])(?:[ \t\r]+|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+                           r'|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null|[\[\]{}:,])*')
+_JSON_WS_RE = re.compile(r'[ \t\r\n]*')
+_JSON_OPEN_RE = re.compile(r'[\[{]')
+_json_decoder = json.JSONDecoder()
+JSON_PROBE_CHARS = 4096
+JSON_FALLBACK_CHARS = 256 * 1024
+OPENCLAW_READ_CHUNK = 65536
 
-def _parse_json_output(text):
-    """Extract JSON from subprocess output that may contain plugin log lines before or after."""
-    clean = _ansi_escape.sub('', text or '')
-    for i, ch in enumerate(clean):
-        if ch in '{[':
-            try:
-                obj, _ = json.JSONDecoder().raw_decode(clean, i)
-                return obj
-            except json.JSONDecodeError:
-                continue
-    return None
 
+class JSONStreamExtractor:
+    """Single-pass extraction of the first JSON document from noisy CLI output.
 
-@cached(ttl_seconds=10)
-def _fetch_all_sessions():
-    """Unified session fetcher - called once, used by costs and crons."""
+    Text is fed in chunks (ANSI escapes are stripped on the way). Lines are
+    skipped until one whose first JSON_PROBE_CHARS consist of JSON tokens, so
+    a log line containing braces costs one bounded probe instead of a decode
+    attempt per bracket; the document itself is decoded by the C scanner.
+
+    With items_key, each element of the top-level object's items_key array is
+    decoded and returned as soon as it is complete, and only the unfinished
+    element is buffered; documents without the key are treated as noise.
+    Otherwise the text from the candidate start is kept and decoded into
+    .document on close(), falling back to the next candidate line if invalid.
+
+    JSON that does not start a line ("Result: {...}") is found on close() by
+    trying each bracket of the first JSON_FALLBACK_CHARS of skipped text, as
+    the old extractor did, but only if no line-start document was found.
+    """
+    def __init__(self, items_key=None):
+        self.items_key = items_key
+        self.document = None
+        self.done = False
+        self._buf = ""
+        self._pos = 0
+        self._carry = ""
+        self._skip_line = False
+        self._start = None      # offset of the candidate document in _buf
+        self._chunks = []       # whole-document mode: text received after the candidate start
+        self._skipped = []      # rejected lines, for the inline fallback on close()
+        self._skipped_len = 0
+        self._reset_doc()
+
+    def _reset_doc(self):
+        self._start = None
+        self._state = None
+        self._key = None
+        self._seen_key = False
+        self._emitted = 0
+
+    def feed(self, chunk):
+        """Add output text; returns the items completed by it."""
+        if self.done:
+            return []
+        text = self._carry + chunk
+        self._carry = ""
+        m = _ANSI_PARTIAL_RE.search(text)
+        if m:
+            self._carry, text = text[m.start():], text[:m.start()]
+        text = _ansi_escape.sub("", text)
+        if self._start is not None and self.items_key is None:
+            self._chunks.append(text)
+            return []
+        self._buf = self._buf[self._pos:] + text
+        if self._start is not None:
+            self._start -= self._pos
+        self._pos = 0
+        items = []
+        self._scan(items, eof=False)
+        return items
+
+    def close(self):
+        """Flush at the end of the output; returns any remaining items."""
+        items = []
+        if not self.done:
+            self._buf += "".join(self._chunks) + self._carry
+            self._chunks, self._carry = [], ""
+            self._scan(items, eof=True)
+            if not self.done:
+                self._scan_inline(items)
+        self._buf, self._pos = "", 0
+        self._skipped = []
+        return items
+
+    def _skip(self, start, end):
+        """Remember skipped text (up to JSON_FALLBACK_CHARS) for _scan_inline."""
+        room = JSON_FALLBACK_CHARS - self._skipped_len
+        if room > 0 and end > start:
+            text = self._buf[start:min(end, start + room)]
+            self._skipped.append(text)
+            self._skipped_len += len(text)
+
+    def _scan_inline(self, items):
+        """The first value that decodes at any bracket of the skipped text."""
+        text = "".join(self._skipped)
+        for m in _JSON_OPEN_RE.finditer(text):
+            try:
+                value, _ = _json_decoder.raw_decode(text, m.start())
+            except ValueError:
+                continue
+            if self.items_key is None:
+                self.document = value
+            elif isinstance(value, dict) and isinstance(value.get(self.items_key), list):
+                items.extend(value[self.items_key])
+            else:
+                continue
+            self.done = True
+            return
+
+    def _scan(self, items, eof):
+        while not self.done:
+            if self._start is None:
+                if not self._find_start(eof):
+                    return
+            elif self.items_key is not None:
+                if not self._step(items, eof):
+                    return
+            elif not eof:
+                return
+            else:
+                try:
+                    self.document, _ = _json_decoder.raw_decode(self._buf, self._start)
+                    self.done = True
+                except ValueError:
+                    self._pos = self._start
+                    self._reset_doc()
+                    self._skip_line = True
+
+    def _find_start(self, eof):
+        buf, pos = self._buf, self._pos
+        while True:
+            nl = buf.find("\n", pos)
+            end = nl if nl >= 0 else len(buf)
+            if self._skip_line:
+                if nl < 0:
+                    self._skip(pos, len(buf))
+                    self._pos = len(buf)
+                    return False
+                self._skip(pos, nl + 1)
+                self._skip_line, pos = False, nl + 1
+                continue
+            if nl < 0 and (pos >= end or not eof and end - pos < JSON_PROBE_CHARS):
+                self._pos = pos
+                return False
+            probe_end = min(end, pos + JSON_PROBE_CHARS)
+            m = _JSON_LINE_RE.match(buf, pos, probe_end)
+            if m and (m.end() == probe_end or (probe_end < end and (buf[m.end()] == '"' or probe_end - m.end() < 32))):
+                self._start = self._pos = m.start(1)
+                if self.items_key is None and not eof:
+                    # Keep everything from here; it is decoded in one go on close().
+                    self._chunks.append(buf[self._pos:])
+                    self._buf, self._start, self._pos = "", 0, 0
+                return True
+            if nl < 0:
+                # Rejected line still being written: drop the rest of it as it arrives.
+                self._skip(pos, len(buf))
+                self._skip_line, self._pos = not eof, len(buf)
+                return False
+            self._skip(pos, nl + 1)
+            pos = nl + 1
+
+    def _decode(self, pos, eof):
+        """Decode the value at pos: (value, end), or None if it may continue in the next chunk."""
+        try:
+            value, end = _json_decoder.raw_decode(self._buf, pos)
+        except json.JSONDecodeError as e:
+            # Strings cannot span lines, so an error followed by a newline is not truncation.
+            if eof or self._buf.find("\n", e.pos) >= 0:
+                raise
+            return None
+        if end == len(self._buf) and not eof:
+            return None  # a number may continue
+        return value, end
+
+    def _abandon(self, reason):
+        """The candidate is not the document: resume scanning on the next line."""
+        if self._emitted:
+            raise ValueError(f"JSON output broke off after {self._emitted} items: {reason}")
+        self._reset_doc()
+        self._skip_line = True
+        return True
+
+    def _step(self, items, eof):
+        """Advance the items-mode state machine; False when more text is needed."""
+        buf = self._buf
+        while True:
+            pos = _JSON_WS_RE.match(buf, self._pos).end()
+            if pos >= len(buf):
+                self._pos = pos
+                return self._abandon("truncated") if eof else False
+            c, state = buf[pos], self._state
+            try:
+                if state is None:
+                    if c == "[":
+                        # A top-level array cannot hold items_key: decode it only to skip it.
+                        if self._decode(pos, eof) is None:
+                            return False
+                        self._pos = pos + 1
+                        return self._abandon("no items")
+                    state, pos = "key_or_end", pos + 1
+                elif state in ("key", "key_or_end") and c == '"':
+                    decoded = self._decode(pos, eof)
+                    if decoded is None:
+                        return False
+                    self._key, pos = decoded
+                    state = "colon"
+                elif state in ("comma", "key_or_end") and c == "}":
+                    if not self._seen_key:
+                        self._pos = pos + 1
+                        return self._abandon("no items")
+                    self._pos, self.done = pos + 1, True
+                    return True
+                elif state == "comma" and c == ",":
+                    state, pos = "key", pos + 1
+                elif state == "colon" and c == ":":
+                    state, pos = "value", pos + 1
+                elif state == "value" and c == "[" and self._key == self.items_key:
+                    self._seen_key = True
+                    state, pos = "item_or_end", pos + 1
+                elif state in ("item_comma", "item_or_end") and c == "]":
+                    state, pos = "comma", pos + 1
+                elif state == "item_comma" and c == ",":
+                    state, pos = "item", pos + 1
+                elif state in ("value", "item", "item_or_end"):
+                    decoded = self._decode(pos, eof)
+                    if decoded is None:
+                        return False
+                    value, pos = decoded
+                    if state == "value":
+                        state = "comma"
+                    else:
+                        items.append(value)
+                        self._emitted += 1
+                        state = "item_comma"
+                else:
+                    self._pos = pos
+                    return self._abandon(f"unexpected {c!r}")
+            except json.JSONDecodeError as e:
+                self._pos = pos
+                return self._abandon(str(e))
+            self._pos, self._state = pos, state
+
+
+def _parse_json_output(text):
+    """Extract JSON from subprocess output that may contain plugin log lines before or after."""
+    extractor = JSONStreamExtractor()
+    extractor.feed(text or "")
+    extractor.close()
+    return extractor.document
+
+
+def _openclaw_stream(args, extractor, timeout=10):
+    """Run an openclaw subcommand, feeding stdout to extractor as it arrives; yields extracted items.
+
+    Raises when the command times out or fails, or no JSON document was found.
+    """
+    proc = subprocess.Popen([OPENCLAW_BIN, *args], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, encoding="utf-8", errors="replace")
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
     try:
-        proc = subprocess.run(
-            [OPENCLAW_BIN, "sessions", "--all-agents", "--json"],
-            capture_output=True, text=True, timeout=10
-        )
-        if proc.returncode == 0:
-            data = _parse_json_output(proc.stdout)
-            if data:
-                return data.get("sessions", [])
-    except Exception:
+        while True:
+            chunk = proc.stdout.read(OPENCLAW_READ_CHUNK)
+            if not chunk:
+                break
+            yield from extractor.feed(chunk)
+        yield from extractor.close()
+        returncode = proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired([OPENCLAW_BIN, *args], timeout)
+    if returncode != 0:
+        raise RuntimeError(f"openclaw {' '.join(args)} exited with {returncode}")
+    if not extractor.done:
+        raise ValueError(f"openclaw {' '.join(args)} returned no JSON")
+
+
+def _openclaw_json(args, timeout=10):
+    """Run an openclaw subcommand and return its parsed JSON output; raises on failure."""
+    extractor = JSONStreamExtractor()
+    for _ in _openclaw_stream(args, extractor, timeout):
         pass
-    return []
+    return extractor.document
+
+
+OPENCLAW_HOME = pathlib.Path(os.getenv("OPENCLAW_STATE_DIR", "/home/rosebud0585/.openclaw"))
+GATEWAY_URL = os.getenv("HOMIE_GATEWAY_URL", "http://127.0.0.1:18789")
+OPENCLAW_BACKEND = os.getenv("HOMIE_OPENCLAW_BACKEND", "native")
+NATIVE_RETRY_SEC = 300
+# Fields the dashboard reads from `openclaw sessions --json`; a state file whose
+# entries lack any of them is not trusted, and the CLI is used instead.
+NATIVE_SESSION_FIELDS = {"sessionId": str, "model": str, "totalTokens": (int, float), "totalCost": (int, float)}
+# Everything /api/agents, the cost ledger and the agent cards use; other fields are dropped on load.
+SESSION_FIELDS = ("key", "sessionId", "id", "agentId", "kind", "model", "totalTokens", "totalCost",
+                  "createdAt", "updatedAt", "ageMs", "abortedLastRun")
+
+
+def _session_summary(session):
+    return {k: session[k] for k in SESSION_FIELDS if k in session}
+
+
+class GatewayError(RuntimeError):
+    pass
+
+
+class GatewayClient:
+    """JSON requests to the local openclaw gateway over one kept-alive HTTP/1.1 connection."""
+    def __init__(self, url, token=None, timeout=5):
+        parts = urllib.parse.urlsplit(url)
+        self.url = url
+        self.host, self.port = parts.hostname or "127.0.0.1", parts.port or 80
+        self.timeout = timeout
+        self._token = token
+        self._conn = None
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def token(self):
+        """Bearer token: HOMIE_GATEWAY_TOKEN, else gateway.auth.token from openclaw.json."""
+        if self._token is None:
+            self._token = os.getenv("HOMIE_GATEWAY_TOKEN", "")
+            if not self._token:
+                try:
+                    config = json.loads((OPENCLAW_HOME / "openclaw.json").read_text())
+                    self._token = str(config.get("gateway", {}).get("auth", {}).get("token") or "")
+                except (OSError, ValueError, AttributeError):
+                    pass
+        return self._token
+
+    def request(self, method, path, body=None):
+        """(status, decoded JSON body or None). A reused connection the gateway closed is retried once."""
+        headers = {"Accept": "application/json"}
+        if self.token():
+            headers["Authorization"] = f"Bearer {self.token()}"
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        with self._lock:
+            while True:
+                fresh = self._conn is None
+                if fresh:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                    self.connects += 1
+                try:
+                    self._conn.request(method, path, body=data, headers=headers)
+                    resp = self._conn.getresponse()
+                    raw = resp.read()
+                except (http.client.HTTPException, OSError):
+                    self.close_locked()
+                    if fresh:
+                        raise
+                    continue
+                if resp.will_close:
+                    self.close_locked()
+                break
+        try:
+            return resp.status, json.loads(raw) if raw else None
+        except ValueError:
+            return resp.status, None
+
+    def close_locked(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def invoke(self, tool, args=None):
+        """Run a gateway tool via POST /tools/invoke and return its result payload."""
+        status, payload = self.request("POST", "/tools/invoke", {"tool": tool, "args": args or {}})
+        if status != 200 or not isinstance(payload, dict) or not payload.get("ok"):
+            error = payload.get("error") if isinstance(payload, dict) else None
+            raise GatewayError(f"gateway tool {tool}: HTTP {status} {error or ''}".rstrip())
+        result = payload.get("result")
+        if isinstance(result, dict) and isinstance(result.get("details"), (dict, list)):
+            return result["details"]
+        if isinstance(result, dict) and isinstance(result.get("content"), list):
+            # Agent-tool shape: [{"type": "text", "text": "<json>"}]
+            for part in result["content"]:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    try:
+                        return json.loads(part.get("text", ""))
+                    except ValueError:
+                        break
+        return result
+
+    def ping(self):
+        """(HTTP status, latency ms) of a HEAD / on the kept-alive connection."""
+        t0 = time.perf_counter()
+        status, _ = self.request("HEAD", "/")
+        return status, round((time.perf_counter() - t0) * 1000, 2)
+
+
+class OpenClawBackend:
+    """openclaw data without forking the Node CLI, with the CLI as per-source fallback.
+
+    Sessions and cron jobs come from the gateway's state files under home
+    (each file is re-parsed only when its mtime or size changes); channel
+    usage and the health check go to the gateway through a GatewayClient.
+    A source whose native read fails is served by the CLI for NATIVE_RETRY_SEC.
+    """
+    def __init__(self, home, gateway, mode="native"):
+        self.home = pathlib.Path(home)
+        self.gateway = gateway
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._files = {}       # path -> (mtime_ns, size, parsed)
+        self._down_until = {}  # source -> when the native path is tried again
+        self._stats = {}       # source -> {"native": n, "cli": n, "error": str}
+
+    def fetch(self, source, native, cli):
+        with self._lock:
+            use_native = self.mode == "native" and time.time() >= self._down_until.get(source, 0)
+            stats = self._stats.setdefault(source, {"native": 0, "cli": 0, "error": None})
+        if use_native:
+            try:
+                value = native()
+            except Exception as e:
+                with self._lock:
+                    self._down_until[source] = time.time() + NATIVE_RETRY_SEC
+                    stats["error"] = str(e) or type(e).__name__
+            else:
+                with self._lock:
+                    stats["native"] += 1
+                    stats["error"] = None
+                return value
+        value = cli()
+        with self._lock:
+            stats["cli"] += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode, "home": str(self.home), "gateway": self.gateway.url,
+                    "connects": self.gateway.connects,
+                    "sources": {k: dict(v, native_retry_at=self._down_until.get(k)) for k, v in self._stats.items()}}
+
+    def _read_json(self, path):
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._files.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self._files[path] = (key, data)
+        return data
+
+    def _native_sessions(self):
+        stores = sorted(self.home.glob("agents/*/sessions/sessions.json"))
+        if not stores:
+            raise FileNotFoundError(f"no session stores under {self.home}/agents")
+        now_ms = time.time() * 1000
+        sessions = []
+        for path in stores:
+            store = self._read_json(path)
+            if not isinstance(store, dict):
+                raise ValueError(f"{path}: expected an object of sessions")
+            agent = path.parent.parent.name
+            for key, entry in store.items():
+                if not isinstance(entry, dict):
+                    raise ValueError(f"{path}: session {key} is not an object")
+                for field, types in NATIVE_SESSION_FIELDS.items():
+                    value = entry.get(field)
+                    if not isinstance(value, types) or isinstance(value, bool):
+                        raise ValueError(f"{path}: session {key} has no valid {field}")
+                session = _session_summary(entry)
+                session.update(key=key, agentId=entry.get("agentId") or agent)
+                updated = parse_timestamp(entry.get("updatedAt"))
+                if updated is not None:
+                    session["ageMs"] = max(0, int(now_ms - updated * 1000))
+                sessions.append(session)
+        sessions.sort(key=lambda s: s.get("ageMs", float("inf")))
+        return sessions
+
+    def sessions(self):
+        return self.fetch("sessions", self._native_sessions, self._cli_sessions)
+
+    def _cli_sessions(self):
+        """Sessions summarised one by one as the CLI streams them; full objects are never all held."""
+        return [_session_summary(s) for s in _openclaw_stream(["sessions", "--all-agents", "--json"],
+                                                              JSONStreamExtractor("sessions"))]
+
+    def crons(self):
+        """The `cron list --json` payload; the gateway's cron store has the same shape."""
+        return self.fetch("crons", lambda: self._read_json(self.home / "cron" / "jobs.json"),
+                          lambda: _openclaw_json(["cron", "list", "--json"]))
+
+    def channels(self):
+        return self.fetch("channels", lambda: self.gateway.invoke("channels_list"),
+                          lambda: _openclaw_json(["channels", "list", "--json"]))
+
+    def _native_health(self):
+        status, ms = self.gateway.ping()
+        if status >= 500:
+            raise GatewayError(f"gateway answered HTTP {status}")
+        return {"ok": True, "exit_code": 0, "stdout": f"Gateway {self.gateway.url} reachable: HTTP {status} in {ms} ms",
+                "stderr": ""}
+
+    def health_check(self, timeout):
+        """Result of the check_gateway_health action: a gateway ping, or `openclaw health`."""
+        def cli():
+            proc = subprocess.run([OPENCLAW_BIN, "health"], capture_output=True, text=True, timeout=timeout)
+            return {"ok": proc.returncode == 0, "exit_code": proc.returncode,
+                    "stdout": (proc.stdout or "").strip(), "stderr": (proc.stderr or "").strip()}
+        return self.fetch("health", self._native_health, cli)
+
+
+openclaw_backend = OpenClawBackend(OPENCLAW_HOME, GatewayClient(GATEWAY_URL), OPENCLAW_BACKEND)
+
+
+def _load_sessions():
+    return openclaw_backend.sessions()
+
+
+@cached(ttl_seconds=10, stale_seconds=120)
+def _fetch_sessions_direct():
+    try:
+        return _load_sessions()
+    except Exception:
+        return []
+
+
+def _fetch_all_sessions():
+    """Unified session fetcher - called once, used by costs and crons."""
+    return collected("sessions", _fetch_sessions_direct)
+
+
+COST_LEDGER_DB = os.getenv("HOMIE_COST_LEDGER", str(BASE_DIR / "cost-ledger.db"))
+COST_HISTORY_DAYS = 90
+
+
+def parse_timestamp(value):
+    """Epoch seconds from an epoch (s or ms) number or ISO-8601 string; naive strings are local time."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    text = str(value).strip()
+    if text.replace(".", "", 1).isdigit():
+        return parse_timestamp(float(text))
+    try:
+        dt = datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith("Z") else text)
+    except ValueError:
+        return None
+    return dt.timestamp()  # naive datetimes are interpreted in local time
+
+
+def _session_id(s):
+    return s.get("sessionId") or s.get("key") or s.get("id")
+
+
+def _local_day(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def _day_hour(ts):
+    """Epoch hour of the local midnight starting the day that contains ts."""
+    midnight = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(midnight.timestamp() // 3600)
+
+
+class SessionCostAggregator:
+    """Running cost/token totals per model and per local creation day.
+
+    update() applies only sessions that are new, changed (tokens, cost, model
+    or createdAt) or gone since the previous snapshot as deltas, and returns
+    immediately when handed the same snapshot object again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._sessions = {}  # key -> (model, day, tokens, cost, created_raw)
+        self._models = {}    # model -> [tokens, cost, sessions]
+        self._days = {}      # local YYYY-MM-DD -> [tokens, cost, sessions]
+
+    @staticmethod
+    def _apply(table, key, tokens, cost, sign):
+        row = table.setdefault(key, [0, 0.0, 0])
+        row[0] += sign * tokens
+        row[1] += sign * cost
+        row[2] += sign
+        if row[2] <= 0:
+            del table[key]
+
+    def _add(self, entry, sign):
+        model, day, tokens, cost, _ = entry
+        self._apply(self._models, model, tokens, cost, sign)
+        if day:
+            self._apply(self._days, day, tokens, cost, sign)
+
+    def update(self, sessions):
+        """Apply a sessions snapshot; returns the number of sessions added, changed or removed."""
+        with self._lock:
+            if sessions is self._snapshot:
+                return 0
+            changed, seen = 0, set()
+            for i, s in enumerate(sessions):
+                key = _session_id(s) or ("anon", i)
+                seen.add(key)
+                tokens = s.get("totalTokens", 0) or 0
+                cost = float(s.get("totalCost", 0) or 0)
+                model = s.get("model", "unknown")
+                created = s.get("createdAt")
+                prev = self._sessions.get(key)
+                if prev is not None and prev[0] == model and prev[2] == tokens and prev[3] == cost and prev[4] == created:
+                    continue
+                ts = parse_timestamp(created)
+                entry = (model, _local_day(ts) if ts is not None else None, tokens, cost, created)
+                if prev is not None:
+                    self._add(prev, -1)
+                self._add(entry, 1)
+                self._sessions[key] = entry
+                changed += 1
+            if len(seen) != len(self._sessions):
+                for key in [k for k in self._sessions if k not in seen]:
+                    self._add(self._sessions.pop(key), -1)
+                    changed += 1
+            self._snapshot = sessions
+            return changed
+
+    def summary(self, today=None):
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            models = [{"model": m, "tokens": t, "cost": c, "sessions": n} for m, (t, c, n) in self._models.items()]
+            today_tokens, today_cost, _ = self._days.get(today, (0, 0.0, 0))
+            count = len(self._sessions)
+        return models, today_tokens, today_cost, count
+
+
+session_costs = SessionCostAggregator()
 
 
-@cached(ttl_seconds=10)
 def get_session_costs():
     result = {
         "today_cost": 0.0, "alltime_cost": 0.0, "projected_monthly": 0.0,
         "today_tokens": 0, "alltime_tokens": 0,
         "models": [], "session_count": 0,
     }
-    sessions = _fetch_all_sessions()
-    if not sessions:
+    session_costs.update(_fetch_all_sessions() or [])
+    models, today_tokens, today_cost, count = session_costs.summary()
+    if not count:
         return result
-    model_agg = {}
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    for s in sessions:
-        model = s.get("model", "unknown")
-        tokens = s.get("totalTokens", 0) or 0
-        cost = float(s.get("totalCost", 0) or 0)
-        if model not in model_agg:
-            model_agg[model] = {"model": model, "tokens": 0, "cost": 0.0, "sessions": 0}
-        model_agg[model]["tokens"] += tokens
-        model_agg[model]["cost"] += cost
-        model_agg[model]["sessions"] += 1
-        result["alltime_cost"] += cost
-        result["alltime_tokens"] += tokens
-        result["session_count"] += 1
-        if today_str in str(s.get("createdAt", "")):
-            result["today_cost"] += cost
-            result["today_tokens"] += tokens
-    result["models"] = sorted(model_agg.values(), key=lambda x: x["tokens"], reverse=True)
+    for m in models:
+        m["cost"] = round(m["cost"], 6)
+        result["alltime_cost"] += m["cost"]
+        result["alltime_tokens"] += m["tokens"]
+    result["today_cost"], result["today_tokens"], result["session_count"] = today_cost, today_tokens, count
+    result["models"] = sorted(models, key=lambda x: x["tokens"], reverse=True)
     day = datetime.now().day
     if result["alltime_cost"] > 0 and day > 0:
         result["projected_monthly"] = round(result["alltime_cost"] / day * 30, 4)
@@ -458,48 +2354,182 @@ def get_session_costs():
     return result
 
 
-def load_cost_history():
-    try:
-        if COST_HISTORY_FILE.exists():
-            return json.loads(COST_HISTORY_FILE.read_text())
-    except Exception:
-        pass
-    return {"days": []}
+class CostLedger:
+    """SQLite cost store fed with cumulative per-session totals.
+
+    Only sessions whose totalTokens/totalCost changed are written, as deltas
+    added to per-(hour, session) and per-(hour, model) rows in one transaction,
+    so repeated polls with unchanged data cost no I/O. A session seen for the
+    first time is attributed to the hour it was created; later growth to the
+    hour it was observed. Hours are UTC epoch hours; days are bucketed in local
+    time when queried.
+
+    Legacy cost-history.json days were summed from the same sessions, so a
+    legacy day is dropped as soon as any session is attributed to it.
+    """
+    def __init__(self, path=COST_LEDGER_DB, legacy_json=COST_HISTORY_FILE):
+        self.path = path
+        self.legacy_json = legacy_json
+        self._lock = threading.Lock()
+        self._conn = None
+        self._totals = {}  # session id -> (tokens, cost)
+        self._legacy_hours = set()  # epoch hours of local midnights still holding "(history)" rows
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS session_totals (
+                    session_id TEXT PRIMARY KEY, model TEXT, agent TEXT,
+                    tokens INTEGER, cost REAL, first_seen REAL, last_seen REAL);
+                CREATE TABLE IF NOT EXISTS session_hours (
+                    hour INTEGER, session_id TEXT, model TEXT, tokens INTEGER, cost REAL,
+                    PRIMARY KEY (hour, session_id)) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS model_hours (
+                    hour INTEGER, model TEXT, tokens INTEGER, cost REAL,
+                    PRIMARY KEY (hour, model)) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+            self._totals = {sid: (tokens, cost) for sid, tokens, cost
+                            in conn.execute("SELECT session_id, tokens, cost FROM session_totals")}
+            self._import_legacy(conn)
+            self._legacy_hours = {hour for hour, in conn.execute(
+                "SELECT hour FROM model_hours WHERE model = '(history)'")}
+            self._conn = conn
+        return self._conn
+
+    def _import_legacy(self, conn):
+        """One-time import of cost-history.json day totals (as model "(history)").
+
+        Days that already have session rows are skipped; the rest are dropped
+        by observe() once a session lands on them.
+        """
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        try:
+            days = json.loads(pathlib.Path(self.legacy_json).read_text()).get("days", [])
+        except (OSError, ValueError):
+            days = []
+        covered = {_day_hour(hour * 3600) for hour, in conn.execute("SELECT DISTINCT hour FROM session_hours")}
+        with conn:
+            for d in days:
+                try:
+                    hour = int(datetime.strptime(d["date"], "%Y-%m-%d").timestamp() // 3600)
+                except (KeyError, ValueError):
+                    continue
+                if hour in covered:
+                    continue
+                conn.execute("INSERT OR IGNORE INTO model_hours VALUES (?, '(history)', ?, ?)",
+                             (hour, int(d.get("tokens", 0) or 0), float(d.get("cost", 0) or 0)))
+            conn.execute("INSERT INTO meta VALUES ('legacy_imported', ?)", (str(len(days)),))
+
+    def observe(self, sessions, now=None):
+        """Record sessions whose totals changed since the last call; returns how many were written."""
+        now = now or time.time()
+        with self._lock:
+            conn = self._connection()
+            changes = []
+            for s in sessions:
+                sid = _session_id(s)
+                if not sid:
+                    continue
+                tokens = int(s.get("totalTokens", 0) or 0)
+                cost = float(s.get("totalCost", 0) or 0)
+                prev = self._totals.get(sid)
+                if prev == (tokens, cost):
+                    continue
+                if prev is None:
+                    ts = parse_timestamp(s.get("createdAt")) or now
+                    d_tokens, d_cost = tokens, cost
+                elif tokens < prev[0] or cost < prev[1] - 1e-9:
+                    ts, d_tokens, d_cost = now, tokens, cost  # counters were reset
+                else:
+                    ts, d_tokens, d_cost = now, tokens - prev[0], cost - prev[1]
+                changes.append((sid, s, tokens, cost, int(min(ts, now) // 3600), d_tokens, d_cost))
+            if not changes:
+                return 0
+            superseded = {_day_hour(change[4] * 3600) for change in changes} & self._legacy_hours
+            with conn:
+                for hour in superseded:
+                    conn.execute("DELETE FROM model_hours WHERE hour = ? AND model = '(history)'", (hour,))
+                for sid, s, tokens, cost, hour, d_tokens, d_cost in changes:
+                    model = s.get("model", "unknown")
+                    conn.execute(
+                        "INSERT INTO session_totals VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE "
+                        "SET model = excluded.model, tokens = excluded.tokens, cost = excluded.cost, "
+                        "last_seen = excluded.last_seen",
+                        (sid, model, s.get("agentId", ""), tokens, cost, now, now))
+                    conn.execute(
+                        "INSERT INTO session_hours VALUES (?, ?, ?, ?, ?) ON CONFLICT(hour, session_id) DO UPDATE "
+                        "SET tokens = tokens + excluded.tokens, cost = cost + excluded.cost",
+                        (hour, sid, model, d_tokens, d_cost))
+                    conn.execute(
+                        "INSERT INTO model_hours VALUES (?, ?, ?, ?) ON CONFLICT(hour, model) DO UPDATE "
+                        "SET tokens = tokens + excluded.tokens, cost = cost + excluded.cost",
+                        (hour, model, d_tokens, d_cost))
+            for sid, _, tokens, cost, *_ in changes:
+                self._totals[sid] = (tokens, cost)
+            self._legacy_hours -= superseded
+            return len(changes)
 
+    def history(self, start, end, granularity="day", model=None):
+        """Cost, tokens and active sessions per local day (or hour) in [start, end) epoch seconds."""
+        h0, h1 = int(start // 3600), int(-(-end // 3600))
+        label = _local_day if granularity == "day" else (
+            lambda ts: datetime.fromtimestamp(ts).strftime("%Y-%m-%dT%H:00"))
+        model_sql = " AND model = ?" if model else ""
+        args = [h0, h1] + ([model] if model else [])
+        with self._lock:
+            conn = self._connection()
+            before = conn.execute(f"SELECT COALESCE(SUM(cost), 0) FROM model_hours WHERE hour < ?{model_sql}",
+                                  [h0] + ([model] if model else [])).fetchone()[0]
+            hours = conn.execute(f"SELECT hour, model, tokens, cost FROM model_hours "
+                                 f"WHERE hour >= ? AND hour < ?{model_sql}", args).fetchall()
+            active = conn.execute(f"SELECT hour, session_id FROM session_hours "
+                                  f"WHERE hour >= ? AND hour < ?{model_sql}", args).fetchall()
+        buckets, models, sessions = {}, {}, {}
+        for hour, m, tokens, cost in hours:
+            b = buckets.setdefault(label(hour * 3600), [0.0, 0])
+            b[0] += cost
+            b[1] += tokens
+            agg = models.setdefault(m, {"model": m, "cost": 0.0, "tokens": 0})
+            agg["cost"] += cost
+            agg["tokens"] += tokens
+        for hour, sid in active:
+            sessions.setdefault(label(hour * 3600), set()).add(sid)
+        points, running = [], before
+        for key in sorted(buckets):
+            cost, tokens = buckets[key]
+            running += cost
+            points.append({"date": key, "cost": round(cost, 4), "tokens": tokens,
+                           "sessions": len(sessions.get(key, ())), "alltime_cost": round(running, 4)})
+        for agg in models.values():
+            agg["cost"] = round(agg["cost"], 4)
+        return {"granularity": granularity, "from": _local_day(start), "to": _local_day(end - 1),
+                "days" if granularity == "day" else "hours": points,
+                "models": sorted(models.values(), key=lambda m: m["cost"], reverse=True)}
 
-def save_cost_history(hist):
+
+cost_ledger = CostLedger()
+
+
+def record_costs(sessions=None):
     try:
-        COST_HISTORY_FILE.write_text(json.dumps(hist, indent=2))
-    except Exception:
-        pass
+        cost_ledger.observe(_fetch_all_sessions() if sessions is None else sessions)
+    except Exception as e:
+        log(f"Cost ledger: {e}")
 
 
-def record_daily_snapshot(costs):
-    today = datetime.now().strftime("%Y-%m-%d")
-    hist = load_cost_history()
-    days = hist.get("days", [])
-    existing = next((d for d in days if d.get("date") == today), None)
-    entry = {
-        "date": today,
-        "cost": round(costs.get("today_cost", 0), 4),
-        "tokens": costs.get("today_tokens", 0),
-        "sessions": costs.get("session_count", 0),
-        "alltime_cost": round(costs.get("alltime_cost", 0), 4),
-    }
-    if existing:
-        idx = days.index(existing)
-        days[idx] = entry
-    else:
-        days.append(entry)
-    days.sort(key=lambda d: d.get("date", ""))
-    if len(days) > 90:
-        days = days[-90:]
-    hist["days"] = days
-    save_cost_history(hist)
-    return hist
+def get_cost_history(days=30, date_from="", date_to="", granularity="day", model=None):
+    """Range query over the cost ledger; dates are local YYYY-MM-DD, date_to inclusive."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = (datetime.strptime(date_to, "%Y-%m-%d") if date_to else today).timestamp() + 86400
+    start = datetime.strptime(date_from, "%Y-%m-%d").timestamp() if date_from else end - days * 86400
+    return cost_ledger.history(start, end, granularity, model)
 
 
-@cached(ttl_seconds=60)
+@cached(ttl_seconds=60, stale_seconds=300)
 def get_cron_sessions():
     """Get cron job status from cron config (authoritative last-run times)."""
     jobs = get_configured_crons()
@@ -526,110 +2556,1093 @@ def get_cron_sessions():
     return {"ok": True, "crons": crons}
 
 
-@cached(ttl_seconds=30)
 def get_configured_crons():
     """Get configured cron jobs from `openclaw cron list --json`."""
+    return collected("crons", _configured_crons_direct)
+
+
+@cached(ttl_seconds=30, stale_seconds=300)
+def _configured_crons_direct():
     try:
-        result = subprocess.run(
-            [OPENCLAW_BIN, "cron", "list", "--json"],
-            capture_output=True,
-            text=True,
-            timeout=10,
-        )
-        if result.returncode != 0:
-            return []
-        payload = _parse_json_output(result.stdout) or []
-        if isinstance(payload, dict):
-            jobs = payload.get("jobs", [])
-        elif isinstance(payload, list):
-            jobs = payload
-        else:
-            return []
-        if not isinstance(jobs, list):
-            return []
-        formatted = []
-        for job in jobs:
-            if not isinstance(job, dict):
-                continue
-            schedule = job.get("schedule") if isinstance(job.get("schedule"), dict) else {}
-            state = job.get("state") if isinstance(job.get("state"), dict) else {}
-            payload_cfg = job.get("payload") if isinstance(job.get("payload"), dict) else {}
-
-            schedule_expr = job.get("schedule_expr") or job.get("spec") or ""
-            if not schedule_expr:
-                if schedule.get("kind") == "cron":
-                    schedule_expr = schedule.get("expr", "")
-                elif schedule.get("kind") == "every":
-                    every_ms = schedule.get("everyMs")
-                    if isinstance(every_ms, (int, float)) and every_ms > 0:
-                        minutes = int(every_ms // 60000)
-                        hours = int(every_ms // 3600000)
-                        if every_ms % 3600000 == 0:
-                            schedule_expr = f"every {hours}h"
-                        elif every_ms % 60000 == 0:
-                            schedule_expr = f"every {minutes}m"
-                        else:
-                            schedule_expr = f"every {int(every_ms)}ms"
-
-            formatted.append({
-                "name": job.get("name", ""),
-                "schedule_expr": schedule_expr,
-                "agentId": job.get("agentId") or job.get("agent") or "",
-                "model": job.get("model") or payload_cfg.get("model", ""),
-                "lastStatus": job.get("lastStatus") or job.get("status") or state.get("lastStatus") or state.get("lastRunStatus") or "",
-                "lastRunAtMs": job.get("lastRunAtMs", job.get("lastRunMs", state.get("lastRunAtMs"))),
-                "nextRunAtMs": job.get("nextRunAtMs", job.get("nextRunMs", state.get("nextRunAtMs"))),
-                "consecutiveErrors": job.get("consecutiveErrors", state.get("consecutiveErrors", 0)),
-            })
-        return formatted
+        return _load_configured_crons()
     except Exception:
         return []
 
 
-MEMORY_DB = f"{WORKSPACE}/memory_system/openclaw_memory.db"
+def _load_configured_crons():
+    payload = openclaw_backend.crons()
+    if isinstance(payload, dict):
+        jobs = payload.get("jobs", [])
+    elif isinstance(payload, list):
+        jobs = payload
+    else:
+        return []
+    if not isinstance(jobs, list):
+        return []
+    formatted = []
+    for job in jobs:
+        if not isinstance(job, dict):
+            continue
+        schedule = job.get("schedule") if isinstance(job.get("schedule"), dict) else {}
+        state = job.get("state") if isinstance(job.get("state"), dict) else {}
+        payload_cfg = job.get("payload") if isinstance(job.get("payload"), dict) else {}
+
+        schedule_expr = job.get("schedule_expr") or job.get("spec") or ""
+        if not schedule_expr:
+            if schedule.get("kind") == "cron":
+                schedule_expr = schedule.get("expr", "")
+            elif schedule.get("kind") == "every":
+                every_ms = schedule.get("everyMs")
+                if isinstance(every_ms, (int, float)) and every_ms > 0:
+                    minutes = int(every_ms // 60000)
+                    hours = int(every_ms // 3600000)
+                    if every_ms % 3600000 == 0:
+                        schedule_expr = f"every {hours}h"
+                    elif every_ms % 60000 == 0:
+                        schedule_expr = f"every {minutes}m"
+                    else:
+                        schedule_expr = f"every {int(every_ms)}ms"
+
+        formatted.append({
+            "name": job.get("name", ""),
+            "schedule_expr": schedule_expr,
+            "agentId": job.get("agentId") or job.get("agent") or "",
+            "model": job.get("model") or payload_cfg.get("model", ""),
+            "lastStatus": job.get("lastStatus") or job.get("status") or state.get("lastStatus") or state.get("lastRunStatus") or "",
+            "lastRunAtMs": job.get("lastRunAtMs", job.get("lastRunMs", state.get("lastRunAtMs"))),
+            "nextRunAtMs": job.get("nextRunAtMs", job.get("nextRunMs", state.get("nextRunAtMs"))),
+            "consecutiveErrors": job.get("consecutiveErrors", state.get("consecutiveErrors", 0)),
+        })
+    return formatted
+
+
+MEMORY_DB = f"{WORKSPACE}/memory_system/openclaw_memory.db"
+
+MEMORY_DB_POOL_SIZE = 4
+MEMORY_DB_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16384",
+    "PRAGMA temp_store = MEMORY",
+)
+# Composite indexes that keep every /api/memory-db page an index range scan in
+# (created_at DESC, rowid DESC) order, whichever filters are set.
+MEMORY_DB_INDEXES = {
+    "idx_memories_agent_type_created": "memories(agent, type, created_at)",
+    "idx_memories_agent_created": "memories(agent, created_at)",
+    "idx_memories_type_created": "memories(type, created_at)",
+    "idx_memories_created": "memories(created_at)",
+}
+
+
+def _memory_rows_sql(agent, type_, keyset):
+    where = [c for c, on in (("agent = ?", agent), ("type = ?", type_)) if on]
+    if keyset:
+        # created_at <= ? is the index range; the OR only trims the boundary.
+        where.append("created_at <= ? AND (created_at < ? OR rowid < ?)")
+    return ("SELECT rowid AS _rowid, agent, type, importance, content, created_at FROM memories"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY created_at DESC, rowid DESC LIMIT ?")
+
+
+# One fixed SQL text per filter combination so each pooled connection's
+# statement cache reuses the prepared statement.
+_MEMORY_ROWS_SQL = {
+    (agent, type_, keyset): _memory_rows_sql(agent, type_, keyset)
+    for agent in (False, True) for type_ in (False, True) for keyset in (False, True)
+}
+_MEMORY_STATS_SQL = "SELECT agent, type, COUNT(*) as cnt, MAX(importance) as max_imp FROM memories GROUP BY agent, type ORDER BY agent, cnt DESC"
+
+
+class MemoryDB:
+    """Pooled read-only connections to the memory SQLite database.
+
+    Aggregate stats are cached and recomputed only when PRAGMA data_version
+    (checked on one dedicated connection) or the file's inode changes.
+    """
+    def __init__(self, path, size=MEMORY_DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._pool = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._inode = None
+        self._version_lock = threading.Lock()
+        self._version_conn = None
+        self._stats_version = None
+        self._stats = None
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5,
+                               check_same_thread=False, cached_statements=64)
+        conn.row_factory = sqlite3.Row
+        for pragma in MEMORY_DB_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _check_inode(self):
+        """Drop every pooled connection if the database file was replaced."""
+        inode = os.stat(self.path).st_ino
+        with self._lock:
+            if inode == self._inode:
+                return
+            self._inode = inode
+            while True:
+                try:
+                    self._pool.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+            self._stats_version = None
+
+    @contextlib.contextmanager
+    def connection(self):
+        self._check_inode()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._pool.get(timeout=10)
+        healthy = False
+        try:
+            yield conn
+            healthy = True
+        finally:
+            if healthy:
+                self._pool.put(conn)
+            else:
+                conn.close()
+                with self._lock:
+                    self._created = max(0, self._created - 1)
+
+    def _data_version_locked(self):
+        if self._version_conn is None:
+            self._version_conn = self._connect()
+        return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def data_version(self):
+        """(inode, PRAGMA data_version); changes whenever another connection commits."""
+        self._check_inode()
+        with self._version_lock:
+            return self._inode, self._data_version_locked()
+
+    def stats(self):
+        """(stats rows, total) for the whole table, cached per data_version."""
+        self._check_inode()
+        with self._version_lock:
+            version = self._data_version_locked()
+            conn = self._version_conn
+            if version != self._stats_version or self._stats is None:
+                stats = [dict(r) for r in conn.execute(_MEMORY_STATS_SQL).fetchall()]
+                total = conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+                self._stats, self._stats_version = (stats, total), version
+            return self._stats
+
+    def recent(self, limit=50, agent="", type_="", before=None):
+        """One page of memories, newest first.
+
+        before is a (created_at, rowid) cursor from a previous page's
+        next_before; returns (rows, next_before or None).
+        """
+        params = [p for p in (agent, type_) if p]
+        if before is not None:
+            params += [before[0], before[0], before[1]]
+        params.append(limit)
+        with self.connection() as conn:
+            rows = conn.execute(_MEMORY_ROWS_SQL[(bool(agent), bool(type_), before is not None)], params).fetchall()
+        page = [dict(r) for r in rows]
+        next_before = None
+        if len(page) == limit and page:
+            next_before = f"{page[-1]['created_at']},{page[-1]['_rowid']}"
+        for row in page:
+            del row["_rowid"]
+        return page, next_before
+
+    def ensure_indexes(self):
+        """Create any missing MEMORY_DB_INDEXES; returns the names created."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            created = []
+            for name, target in MEMORY_DB_INDEXES.items():
+                if name not in existing:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+                    created.append(name)
+            if created:
+                conn.execute("ANALYZE memories")
+            conn.commit()
+            return created
+        finally:
+            conn.close()
+
+    def query_plans(self):
+        """EXPLAIN QUERY PLAN for every page query variant.
+
+        Each entry reports the plan lines and ok=False if the query would scan
+        the table or sort through a temporary B-tree instead of walking an index.
+        """
+        plans = {}
+        with self.connection() as conn:
+            for (agent, type_, keyset), sql in _MEMORY_ROWS_SQL.items():
+                n_params = int(agent) + int(type_) + (3 if keyset else 0) + 1
+                detail = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, ["x"] * (n_params - 1) + [50])]
+                ok = (not any("TEMP B-TREE" in d for d in detail)
+                      and any("USING INDEX" in d or "USING COVERING INDEX" in d for d in detail))
+                name = "+".join(k for k, on in (("agent", agent), ("type", type_), ("before", keyset)) if on) or "all"
+                plans[name] = {"ok": ok, "plan": detail}
+        return plans
+
+
+def parse_memory_cursor(value):
+    """Parse a "created_at,rowid" cursor; raises ValueError when malformed."""
+    created_at, _, rowid = urllib.parse.unquote(value).rpartition(",")
+    if not created_at:
+        raise ValueError("before must look like <created_at>,<rowid>")
+    return created_at, int(rowid)
+
+
+def verify_memory_db_indexes(create=False):
+    """Warn about any page query plan that does not use an index; with create, add missing indexes first.
+
+    The memory database belongs to the memory system, so its schema is only changed on request.
+    """
+    try:
+        if create:
+            created = memory_db.ensure_indexes()
+            if created:
+                log(f"Memory DB: created indexes {', '.join(created)}")
+        slow = {name: info for name, info in memory_db.query_plans().items() if not info["ok"]}
+        for name, info in slow.items():
+            log(f"Memory DB: query '{name}' does not use an index: {' | '.join(info['plan'])}")
+        if slow and not create:
+            log("Memory DB: run with --memory-indexes to create the composite indexes")
+    except Exception as e:
+        log(f"Memory DB: index check skipped ({e})")
+
+
+memory_db = MemoryDB(MEMORY_DB)
+
+
+def get_memory_db(limit=50, agent="", type_="", before=None):
+    try:
+        memories, next_before = memory_db.recent(limit, agent, type_, before)
+        stats, total = memory_db.stats()
+        return {
+            "ok": True,
+            "memories": memories,
+            "stats": stats,
+            "total": total,
+            "next_before": next_before,
+        }
+    except Exception as e:
+        return {"ok": False, "error": str(e), "memories": [], "stats": [], "total": 0}
+
+MEMORY_OPS_DIR = f"{WORKSPACE}/memory_system"
+EMBEDDING_COLUMN = os.getenv("HOMIE_EMBEDDING_COLUMN", "embedding")
+# memory_ops functions that turn a query string into a vector, tried in order.
+EMBEDDER_NAMES = ("get_embedding", "embed_text", "generate_embedding", "embed")
+_memory_ops = None
+_memory_ops_lock = threading.Lock()
+
+
+def load_memory_ops():
+    """Import memory_ops from the workspace once (raises ImportError if absent)."""
+    global _memory_ops
+    with _memory_ops_lock:
+        if _memory_ops is None:
+            if MEMORY_OPS_DIR not in sys.path:
+                sys.path.insert(0, MEMORY_OPS_DIR)
+            import memory_ops
+            _memory_ops = memory_ops
+        return _memory_ops
+
+
+def _query_embedder():
+    ops = load_memory_ops()
+    for name in EMBEDDER_NAMES:
+        fn = getattr(ops, name, None)
+        if callable(fn):
+            return fn
+    return None
+
+
+def _decode_embedding(value):
+    """float32 BLOB or JSON array text -> 1-D float32 vector (None if unusable)."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, memoryview)):
+        if len(value) % 4:
+            return None
+        return np.frombuffer(value, dtype=np.float32)
+    try:
+        return np.asarray(json.loads(value), dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalise(vectors):
+    block = np.vstack(vectors).astype(np.float32, copy=False)
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return block / norms
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class EmbeddingIndex:
+    """Resident matrix of L2-normalised memory embeddings for exact cosine search.
+
+    Rows are appended incrementally (rowid > last seen) whenever the database's
+    data_version changes. The matrix is rebuilt if the file is replaced, or if
+    the count or importance total of embedded rows up to the last seen rowid
+    no longer matches what was loaded (a memory deleted or re-scored in place).
+    A query is one matrix-vector product plus argpartition; min_importance
+    filters use a cached boolean mask per level, NULL importance counting as 0.
+    """
+    engine = "exact"
+
+    def __init__(self, db, column=EMBEDDING_COLUMN):
+        self.db = db
+        self.column = column
+        self._lock = threading.Lock()
+        self._version = None
+        self._inode = None
+        self._reset()
+
+    def _reset(self):
+        self._n = 0
+        self._dim = None
+        self._matrix = None
+        self._rowids = None
+        self._importance = None
+        self._last_rowid = 0
+        self._skipped = 0
+        self._masks = {}
+        self._signature = (0, 0.0)  # (rows, importance total) with an embedding and rowid <= _last_rowid
+
+    def _append(self, rowids, importance, vectors):
+        if self._matrix is None:
+            cap = max(1024, len(rowids))
+            self._matrix = np.empty((cap, self._dim), dtype=np.float32)
+            self._rowids = np.empty(cap, dtype=np.int64)
+            self._importance = np.empty(cap, dtype=np.int32)
+        need = self._n + len(rowids)
+        if need > len(self._rowids):
+            cap = max(need, 2 * len(self._rowids))
+            self._matrix = np.resize(self._matrix, (cap, self._dim))
+            self._rowids = np.resize(self._rowids, cap)
+            self._importance = np.resize(self._importance, cap)
+        self._matrix[self._n:need] = _normalise(vectors)
+        self._rowids[self._n:need] = rowids
+        self._importance[self._n:need] = importance
+        self._n = need
+        self._masks = {}
+
+    def _loaded(self):
+        """Called after each refresh that read new rows."""
+
+    def refresh(self):
+        """Load rows added since the last refresh; no-op while data_version is unchanged."""
+        version = self.db.data_version()
+        with self._lock:
+            if version == self._version:
+                return
+            with self.db.connection() as conn:
+                columns = {r[1] for r in conn.execute("PRAGMA table_info(memories)")}
+                if self.column not in columns:
+                    raise LookupError(f"memories has no '{self.column}' column")
+                max_rowid = conn.execute("SELECT MAX(rowid) FROM memories").fetchone()[0] or 0
+                signature = self._signature
+                if self._last_rowid and max_rowid >= self._last_rowid:
+                    count, total = conn.execute(
+                        f"SELECT COUNT(*), TOTAL(COALESCE(importance, 0)) FROM memories "
+                        f"WHERE rowid <= ? AND {self.column} IS NOT NULL", (self._last_rowid,)).fetchone()
+                    signature = (count, round(total, 6))
+                    if self._signature is None:
+                        self._signature = signature  # persisted before signatures were kept
+                if version[0] != self._inode or max_rowid < self._last_rowid or signature != self._signature:
+                    self._reset()
+                    self._inode = version[0]
+                rows, total = self._signature or (0, 0.0)
+                cur = conn.execute(
+                    f"SELECT rowid, COALESCE(importance, 0), {self.column} FROM memories "
+                    f"WHERE rowid > ? AND {self.column} IS NOT NULL ORDER BY rowid", (self._last_rowid,))
+                while True:
+                    batch = cur.fetchmany(4096)
+                    if not batch:
+                        break
+                    rowids, importance, vectors = [], [], []
+                    rows += len(batch)
+                    for rowid, imp, raw in batch:
+                        total += imp
+                        vec = _decode_embedding(raw)
+                        if vec is not None and self._dim is None and vec.size:
+                            self._dim = vec.size
+                        if vec is None or vec.size != self._dim:
+                            self._skipped += 1
+                            continue
+                        rowids.append(rowid)
+                        importance.append(imp)
+                        vectors.append(vec)
+                    if rowids:
+                        self._append(rowids, importance, vectors)
+                    self._last_rowid = max(self._last_rowid, batch[-1][0])
+                self._signature = (rows, round(float(total), 6))
+            self._loaded()
+            self._version = version
+
+    def _store(self):
+        return self._matrix
+
+    def vector(self, rowid):
+        """Stored unit embedding for rowid, or None if it is not indexed."""
+        with self._lock:
+            if not self._n:
+                return None
+            pos = int(np.searchsorted(self._rowids[:self._n], rowid))
+            if pos < self._n and self._rowids[pos] == rowid:
+                return np.array(self._store()[pos])
+            return None
+
+    def _query(self, vector):
+        query = np.asarray(vector, dtype=np.float32).ravel()
+        if query.size != self._dim:
+            raise ValueError(f"query has {query.size} dimensions, index has {self._dim}")
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def _mask(self, min_importance):
+        """Rows with importance >= min_importance, or None if every row qualifies."""
+        if min_importance not in self._masks:
+            mask = self._importance[:self._n] >= min_importance
+            self._masks[min_importance] = None if mask.all() else mask
+        return self._masks[min_importance]
+
+    def search(self, vector, limit=10, min_importance=1, **_):
+        """[(rowid, cosine similarity)] best first among rows with importance >= min_importance."""
+        with self._lock:
+            if not self._n:
+                return []
+            scores = self._matrix[:self._n] @ self._query(vector)
+            mask = self._mask(min_importance)
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+                limit = min(limit, int(np.count_nonzero(mask)))
+            return [(int(self._rowids[i]), float(scores[i])) for i in _top_k(scores, limit)]
+
+    def rows(self, hits):
+        """Result dicts for search() hits; distance is Euclidean between unit vectors."""
+        if not hits:
+            return []
+        with self.db.connection() as conn:
+            found = {r["_rowid"]: dict(r) for r in conn.execute(
+                "SELECT rowid AS _rowid, agent, type, importance, content, created_at FROM memories "
+                f"WHERE rowid IN ({','.join('?' * len(hits))})", [rowid for rowid, _ in hits])}
+        results = []
+        for rowid, score in hits:
+            row = found.get(rowid)
+            if row is None:
+                continue
+            del row["_rowid"]
+            row["distance"] = round(max(0.0, 2.0 - 2.0 * score) ** 0.5, 6)
+            results.append(row)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {"engine": self.engine, "rows": self._n, "dim": self._dim, "skipped": self._skipped,
+                    "last_rowid": self._last_rowid,
+                    "bytes": int(self._matrix.nbytes) if self._matrix is not None else 0}
+
+
+ANN_DIR = os.getenv("HOMIE_ANN_DIR", str(BASE_DIR / "memory-ann"))
+ANN_NPROBE = int(os.getenv("HOMIE_ANN_NPROBE", "16"))
+ANN_TRAIN_MIN_ROWS = 10000  # below this an exact scan of the mapped vectors is used
+ANN_RETRAIN_FACTOR = 4      # re-cluster once the store has grown this much since training
+ANN_MERGE_FRACTION = 0.1    # fold unsorted inserts into the inverted lists past this share
+
+
+def _train_centroids(sample, nlist, iters=12, seed=0):
+    """Spherical k-means: nlist unit centroids for the unit-norm sample rows."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = _assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def _assign_lists(vectors, centroids, chunk=16384):
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        out[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return out
+
+
+_IVF_FILE_RE = re.compile(r'vectors\.f32|ids\.i64|centroids\.\d+\.f32|lists\.\d+\.i32|meta\.json(?:\.tmp)?')
+
+
+class IVFIndex(EmbeddingIndex):
+    """Inverted-file ANN index persisted in ANN_DIR (owned by the dashboard, not the memory system).
+
+    vectors.f32 (normalised rows) and ids.i64 ((rowid, importance) pairs) are
+    append-only and memory-mapped; centroids.<gen>.f32 and lists.<gen>.i32
+    hold the k-means clustering, and meta.json (replaced atomically, last)
+    records how many rows are valid, so a restart resumes from last_rowid
+    instead of re-reading every embedding. A query scores the nprobe nearest
+    centroids and then only the rows in those lists; higher nprobe trades
+    latency for recall. A reset deletes only those files (_IVF_FILE_RE), so
+    a path shared with other data is safe.
+    """
+    engine = "ivf"
+
+    def __init__(self, db, path=ANN_DIR, nprobe=ANN_NPROBE, column=EMBEDDING_COLUMN):
+        super().__init__(db, column)
+        self.path = pathlib.Path(path)
+        self.nprobe = nprobe
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _file(self, name):
+        return self.path / name
+
+    def _reset(self):
+        super()._reset()
+        self._gen = 0
+        self._trained_rows = 0
+        self._centroids = None
+        self._vectors = None
+        self._ids = np.empty((0, 2), dtype=np.int64)
+        self._lists = np.empty(0, dtype=np.int32)
+        self._order = self._offsets = None
+        self._sorted = 0
+        if hasattr(self, "path") and self.path.is_dir():
+            for f in self.path.iterdir():
+                if _IVF_FILE_RE.fullmatch(f.name) and f.is_file():
+                    f.unlink()
+
+    def _open(self):
+        """Load persisted state; anything inconsistent starts an empty index."""
+        try:
+            meta = json.loads(self._file("meta.json").read_text())
+        except (OSError, ValueError):
+            return
+        n, dim, gen = meta["rows"], meta["dim"], meta["gen"]
+        try:
+            ids = np.fromfile(self._file("ids.i64"), dtype=np.int64, count=n * 2).reshape(-1, 2)
+            if gen:
+                self._centroids = np.fromfile(self._file(f"centroids.{gen}.f32"), dtype=np.float32).reshape(-1, dim)
+                self._lists = np.fromfile(self._file(f"lists.{gen}.i32"), dtype=np.int32, count=n)
+            if len(ids) != n or (gen and len(self._lists) != n) or \
+                    os.path.getsize(self._file("vectors.f32")) < n * dim * 4:
+                raise ValueError("truncated")
+        except (OSError, ValueError):
+            self._reset()
+            return
+        # Drop rows appended after the last meta write (interrupted refresh).
+        for name, size in (("vectors.f32", n * dim * 4), ("ids.i64", n * 16), (f"lists.{gen}.i32", n * 4)):
+            if self._file(name).exists():
+                os.truncate(self._file(name), size)
+        self._n, self._dim, self._gen = n, dim, gen
+        self._ids = ids
+        self._importance = ids[:, 1]
+        self._rowids = ids[:, 0]
+        self._last_rowid, self._skipped = meta["last_rowid"], meta.get("skipped", 0)
+        self._trained_rows = meta.get("trained_rows", 0)
+        self._inode = meta.get("inode")
+        self._signature = tuple(meta["signature"]) if "signature" in meta else None
+        self._map()
+        self._sort_lists()
+
+    def _store(self):
+        return self._vectors
+
+    def _map(self):
+        self._vectors = (np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(self._n, self._dim))
+                         if self._n else None)
+
+    def _sort_lists(self):
+        if self._gen:
+            self._order = np.argsort(self._lists, kind="stable")
+            self._offsets = np.searchsorted(self._lists[self._order], np.arange(len(self._centroids) + 1))
+            self._sorted = self._n
+
+    def _append(self, rowids, importance, vectors):
+        block = _normalise(vectors)
+        ids = np.column_stack([rowids, importance]).astype(np.int64)
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(block.tobytes())
+        with open(self._file("ids.i64"), "ab") as f:
+            f.write(ids.tobytes())
+        self._ids = np.concatenate([self._ids, ids])
+        if self._gen:
+            lists = _assign_lists(block, self._centroids)
+            with open(self._file(f"lists.{self._gen}.i32"), "ab") as f:
+                f.write(lists.tobytes())
+            self._lists = np.concatenate([self._lists, lists])
+        self._n += len(rowids)
+        self._masks = {}
+
+    def _train(self):
+        vectors = self._vectors
+        nlist = int(min(4096, max(16, self._n ** 0.5)))
+        rng = np.random.default_rng(self._n)
+        sample = vectors[np.sort(rng.choice(self._n, min(self._n, nlist * 64, 200000), replace=False))]
+        centroids = _train_centroids(np.asarray(sample), nlist)
+        lists = _assign_lists(vectors, centroids)
+        gen = self._gen + 1
+        centroids.tofile(self._file(f"centroids.{gen}.f32"))
+        lists.tofile(self._file(f"lists.{gen}.i32"))
+        old = self._gen
+        self._gen, self._centroids, self._lists, self._trained_rows = gen, centroids, lists, self._n
+        self._write_meta()
+        for name in (f"centroids.{old}.f32", f"lists.{old}.i32"):
+            if old and self._file(name).exists():
+                self._file(name).unlink()
+
+    def _write_meta(self):
+        meta = {"rows": self._n, "dim": self._dim, "gen": self._gen, "last_rowid": self._last_rowid,
+                "skipped": self._skipped, "trained_rows": self._trained_rows, "inode": self._inode,
+                "signature": self._signature}
+        tmp = self._file("meta.json.tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self._file("meta.json"))
+
+    def _loaded(self):
+        if not self._n:
+            return
+        self._rowids, self._importance = self._ids[:, 0], self._ids[:, 1]
+        self._map()
+        if self._n >= ANN_TRAIN_MIN_ROWS and (not self._gen or self._n >= ANN_RETRAIN_FACTOR * self._trained_rows):
+            self._train()
+            self._sort_lists()
+        else:
+            if self._gen and self._n - self._sorted > ANN_MERGE_FRACTION * self._n:
+                self._sort_lists()
+            self._write_meta()
+
+    def _candidates(self, query, nprobe):
+        if not self._gen:
+            return np.arange(self._n)
+        probe = _top_k(self._centroids @ query, max(1, nprobe))
+        parts = [self._order[self._offsets[l]:self._offsets[l + 1]] for l in probe]
+        if self._sorted < self._n:
+            tail = np.arange(self._sorted, self._n)
+            parts.append(tail[np.isin(self._lists[self._sorted:], probe)])
+        return np.sort(np.concatenate(parts))  # ascending offsets read the mapping sequentially
+
+    def search(self, vector, limit=10, min_importance=1, nprobe=None):
+        with self._lock:
+            if not self._n:
+                return []
+            query = self._query(vector)
+            cand = self._candidates(query, nprobe or self.nprobe)
+            cand = cand[self._importance[cand] >= min_importance]
+            scores = self._vectors[cand] @ query
+            return [(int(self._rowids[cand[i]]), float(scores[i])) for i in _top_k(scores, limit)]
+
+    def stats(self):
+        with self._lock:
+            return {"engine": self.engine, "rows": self._n, "dim": self._dim, "skipped": self._skipped,
+                    "last_rowid": self._last_rowid, "lists": len(self._centroids) if self._gen else 0,
+                    "trained_rows": self._trained_rows, "unsorted": self._n - self._sorted,
+                    "nprobe": self.nprobe, "path": str(self.path)}
+
+
+def make_embedding_index(engine="exact"):
+    """EmbeddingIndex or IVFIndex for --memory-search; None when numpy is missing."""
+    if np is None:
+        return None
+    if engine == "ivf":
+        try:
+            return IVFIndex(memory_db)
+        except OSError as e:
+            log(f"Memory search: ANN index unavailable ({e}), using exact search")
+    return EmbeddingIndex(memory_db)
+
+
+embedding_index = make_embedding_index(os.getenv("HOMIE_MEMORY_SEARCH", "exact"))
+
+
+def warm_embedding_index():
+    if embedding_index is None:
+        return
+    try:
+        embedding_index.refresh()
+    except Exception as e:
+        log(f"Memory search: resident index unavailable ({e})")
+
+
+def search_memory_semantic(query: str, limit: int = 10, min_importance: int = 1, nprobe=None):
+    """Semantic search over memories using embeddings.
+
+    Uses the resident embedding_index (exact or IVF) when numpy, the embedding
+    column and a memory_ops embedder are available; otherwise delegates to
+    memory_ops.search_memories_semantic.
+    """
+    try:
+        embed = _query_embedder() if embedding_index is not None else None
+        if embed is not None:
+            try:
+                embedding_index.refresh()
+                hits = embedding_index.search(embed(query), limit, min_importance, nprobe=nprobe)
+                results = embedding_index.rows(hits)
+                return {"ok": True, "results": results, "count": len(results), "engine": embedding_index.engine}
+            except (LookupError, ValueError):
+                pass  # no embedding column / dimension mismatch: let memory_ops handle it
+        results = load_memory_ops().search_memories_semantic(query, limit=limit, min_importance=min_importance)
+        return {"ok": True, "results": results, "count": len(results), "engine": "memory_ops"}
+    except Exception as e:
+        return {"ok": False, "error": str(e), "results": [], "count": 0}
+
+
+DUPLICATE_THRESHOLD = 0.92         # cosine similarity, as in PRD V4 is_duplicate_task()
+DUPLICATE_JACCARD_THRESHOLD = 0.5  # estimated shingle Jaccard when no embedder is available
+DUPLICATE_MEMORY_ROWS = 20000      # most recent memories kept in the LSH index
+DUPLICATE_MAX_TASKS = 1000
+MINHASH_PERMS = 128
+LSH_BANDS = 32                     # 32 bands x 4 rows: pairs above ~0.4 Jaccard become candidates
+MINHASH_TEXT_CHARS = 1000          # only the head of long memories is shingled
+# Multiply-shift hashing: h(x) = ((a*x + b) mod 2**64) >> 32, a odd.
+_MASK64 = (1 << 64) - 1
+_minhash_rng = random.Random(1729)
+_MINHASH_A = [_minhash_rng.getrandbits(64) | 1 for _ in range(MINHASH_PERMS)]
+_MINHASH_B = [_minhash_rng.getrandbits(64) for _ in range(MINHASH_PERMS)]
+if np is not None:
+    _MINHASH_A_NP = np.array(_MINHASH_A, dtype=np.uint64)[:, None]
+    _MINHASH_B_NP = np.array(_MINHASH_B, dtype=np.uint64)[:, None]
+
+
+def _shingles(text, size=5):
+    norm = " ".join(re.findall(r"[a-z0-9]+", text[:MINHASH_TEXT_CHARS].lower()))
+    if len(norm) <= size:
+        return {norm} if norm else set()
+    return {norm[i:i + size] for i in range(len(norm) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature of text's character 5-gram shingles; None for empty text."""
+    hashes = [zlib.crc32(s.encode()) for s in _shingles(text)]
+    if not hashes:
+        return None
+    if np is not None:
+        return minhash_many([text])[0]
+    return tuple(min(((a * h + b) & _MASK64) >> 32 for h in hashes) for a, b in zip(_MINHASH_A, _MINHASH_B))
+
+
+def minhash_many(texts, budget=65536):
+    """[minhash(t) for t in texts], vectorised over chunks of ~budget shingles."""
+    if np is None:
+        return [minhash(t) for t in texts]
+    out = [None] * len(texts)
+    start = 0
+    while start < len(texts):
+        hashes, counts = [], []
+        end = start
+        while end < len(texts) and (not hashes or len(hashes) < budget):
+            hs = [zlib.crc32(s.encode()) for s in _shingles(texts[end])]
+            hashes.extend(hs)
+            counts.append(len(hs))
+            end += 1
+        if hashes:
+            mat = (_MINHASH_A_NP * np.array(hashes, dtype=np.uint64) + _MINHASH_B_NP) >> np.uint64(32)
+            counts = np.array(counts)
+            docs = np.flatnonzero(counts)
+            offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])[docs]
+            for doc, sig in zip(docs, np.minimum.reduceat(mat, offsets, axis=1).T.tolist()):
+                out[start + doc] = tuple(sig)
+        start = end
+    return out
+
+
+def minhash_similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class LSHIndex:
+    """MinHash LSH: keys whose signatures agree on every row of at least one band."""
+    def __init__(self, bands=LSH_BANDS):
+        self.bands = bands
+        self.rows = MINHASH_PERMS // bands
+        self._buckets = {}
+        self._sigs = {}
+
+    def _bands(self, sig):
+        r = self.rows
+        return [(b, sig[b * r:(b + 1) * r]) for b in range(self.bands)]
+
+    def add(self, key, sig):
+        if key in self._sigs:
+            self.remove(key)
+        self._sigs[key] = sig
+        for band in self._bands(sig):
+            self._buckets.setdefault(band, []).append(key)
+
+    def remove(self, key):
+        sig = self._sigs.pop(key, None)
+        if sig is None:
+            return
+        for band in self._bands(sig):
+            bucket = self._buckets.get(band)
+            if bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def query(self, sig):
+        found = set()
+        for band in self._bands(sig):
+            found.update(self._buckets.get(band, ()))
+        return found
+
+    def signature(self, key):
+        return self._sigs.get(key)
+
+    def __len__(self):
+        return len(self._sigs)
+
+
+class TaskDuplicateDetector:
+    """Near-duplicate check for a batch of task descriptions.
+
+    Recent memories (incrementally, by rowid) and open TODO items are kept in
+    an LSH index; each queued task only meets the corpus entries and other
+    queued tasks that share a band, and only those candidate pairs are scored
+    by embedding cosine (or by MinHash Jaccard without an embedder). Confirmed
+    pairs are merged into clusters with union-find.
+    """
+    def __init__(self, db, max_memories=DUPLICATE_MEMORY_ROWS):
+        self.db = db
+        self.max_memories = max_memories
+        self.lsh = LSHIndex()
+        self._docs = {}  # key -> member dict
+        self._memory_keys = deque()
+        self._last_rowid = 0
+        self._version = None
+        self._todo_keys = set()
+        self._embeddings = OrderedDict()  # text -> unit vector
+        self._lock = threading.Lock()
+
+    def _add(self, key, member, sig):
+        if sig is not None:
+            self._docs[key] = member
+            self.lsh.add(key, sig)
+
+    def _drop(self, key):
+        self._docs.pop(key, None)
+        self.lsh.remove(key)
+
+    def _sync_memories(self):
+        version = self.db.data_version()
+        if version == self._version:
+            return
+        if self._version is not None and version[0] != self._version[0]:
+            while self._memory_keys:
+                self._drop(self._memory_keys.popleft())
+            self._last_rowid = 0
+        with self.db.connection() as conn:
+            if self._last_rowid:
+                rows = conn.execute("SELECT rowid, agent, type, content FROM memories WHERE rowid > ? "
+                                    "ORDER BY rowid", (self._last_rowid,)).fetchall()
+            else:
+                rows = conn.execute("SELECT rowid, agent, type, content FROM memories ORDER BY rowid DESC LIMIT ?",
+                                    (self.max_memories,)).fetchall()[::-1]
+        texts = [(content or "")[:2000] for _, _, _, content in rows]
+        for (rowid, agent, type_, _), text, sig in zip(rows, texts, minhash_many(texts)):
+            key = ("memory", rowid)
+            self._add(key, {"kind": "memory", "id": rowid, "agent": agent, "type": type_, "text": text}, sig)
+            self._memory_keys.append(key)
+            self._last_rowid = max(self._last_rowid, rowid)
+        while len(self._memory_keys) > self.max_memories:
+            self._drop(self._memory_keys.popleft())
+        self._version = version
+
+    def _sync_todos(self):
+        current = {}
+        for project in parse_todos().get("projects", []):
+            for item in project.get("items", []):
+                if not item.get("done"):
+                    key = ("todo", project.get("path", ""), item["text"])
+                    current[key] = {"kind": "todo", "project": project.get("name", ""),
+                                    "path": project.get("path", ""), "text": item["text"]}
+        for key in self._todo_keys - current.keys():
+            self._drop(key)
+        added = list(current.keys() - self._todo_keys)
+        for key, sig in zip(added, minhash_many([current[k]["text"] for k in added])):
+            self._add(key, current[key], sig)
+        self._todo_keys = set(current)
+
+    def _embed(self, embed, text):
+        vec = self._embeddings.get(text)
+        if vec is None:
+            vec = np.asarray(embed(text), dtype=np.float32).ravel()
+            norm = np.linalg.norm(vec)
+            vec = vec / norm if norm else vec
+            self._embeddings[text] = vec
+            if len(self._embeddings) > 4096:
+                self._embeddings.popitem(last=False)
+        else:
+            self._embeddings.move_to_end(text)
+        return vec
+
+    def _vector(self, embed, member, dim=None):
+        if member["kind"] == "memory" and embedding_index is not None:
+            vec = embedding_index.vector(member["id"])
+            if vec is not None and (dim is None or vec.size == dim):
+                return vec
+        return self._embed(embed, member["text"])
+
+    def warm(self):
+        """Build the corpus index ahead of the first request."""
+        with self._lock:
+            for sync in (self._sync_memories, self._sync_todos):
+                try:
+                    sync()
+                except Exception as e:
+                    log(f"Duplicate check: {sync.__name__.strip('_')} skipped ({e})")
+
+    def _cosine_scores(self, embed, pairs, members):
+        scores = []
+        for a, b in pairs:
+            va = self._vector(embed, members.get(a) or self._docs[a])
+            vb = self._vector(embed, members.get(b) or self._docs[b], va.size)
+            if va.size == vb.size:
+                scores.append((a, b, float(va @ vb)))
+        return scores
+
+    def check(self, tasks, threshold=None):
+        """Clusters of near-duplicates among tasks, recent memories and open TODO items."""
+        t0 = time.perf_counter()
+        errors = {}
+        with self._lock:
+            try:
+                self._sync_memories()
+            except Exception as e:
+                errors["memories"] = str(e)
+            try:
+                self._sync_todos()
+            except Exception as e:
+                errors["todos"] = str(e)
+
+            members = {("queued", i): {"kind": "queued", "index": i, "text": t} for i, t in enumerate(tasks)}
+            sigs = {}
+            batch = LSHIndex(self.lsh.bands)
+            pairs = set()
+            for i, sig in enumerate(minhash_many(tasks)):
+                key = ("queued", i)
+                sigs[key] = sig
+                if sig is None:
+                    continue
+                pairs.update((key, other) for other in self.lsh.query(sig))
+                pairs.update((other, key) for other in batch.query(sig))
+                batch.add(key, sig)
+
+            confirmed = None
+            if np is not None and pairs:
+                try:
+                    embed = _query_embedder()
+                except ImportError:
+                    embed = None
+                if embed is not None:
+                    try:
+                        if embedding_index is not None:
+                            embedding_index.refresh()
+                    except Exception:
+                        pass  # memories without stored vectors get embedded from their text
+                    try:
+                        confirmed = self._cosine_scores(embed, pairs, members)
+                    except Exception as e:
+                        errors["embedding"] = str(e)
+            method = "embedding" if confirmed is not None else "minhash"
+            if confirmed is None:
+                confirmed = [(a, b, minhash_similarity(sigs.get(a) or self.lsh.signature(a),
+                                                       sigs.get(b) or self.lsh.signature(b)))
+                             for a, b in pairs]
+            if threshold is None:
+                threshold = DUPLICATE_THRESHOLD if method == "embedding" else DUPLICATE_JACCARD_THRESHOLD
+            confirmed = [(a, b, s) for a, b, s in confirmed if s >= threshold]
+            for a, b, _ in confirmed:
+                for key in (a, b):
+                    if key not in members:
+                        members[key] = self._docs[key]
+
+        parent = {}
+
+        def find(k):
+            parent.setdefault(k, k)
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
 
-def get_memory_db(limit=50, agent="", type_=""):
-    import sqlite3 as _sqlite3
-    try:
-        conn = _sqlite3.connect(MEMORY_DB)
-        conn.row_factory = _sqlite3.Row
-        cur = conn.cursor()
-        where, params = [], []
-        if agent:
-            where.append("agent = ?"); params.append(agent)
-        if type_:
-            where.append("type = ?"); params.append(type_)
-        wc = f"WHERE {' AND '.join(where)}" if where else ""
-        rows = cur.execute(
-            f"SELECT agent, type, importance, content, created_at FROM memories {wc} ORDER BY created_at DESC LIMIT ?",
-            params + [limit]
-        ).fetchall()
-        stats = cur.execute(
-            "SELECT agent, type, COUNT(*) as cnt, MAX(importance) as max_imp FROM memories GROUP BY agent, type ORDER BY agent, cnt DESC"
-        ).fetchall()
-        total = cur.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
-        conn.close()
+        for a, b, _ in confirmed:
+            parent[find(a)] = find(b)
+        groups = {}
+        for a, b, score in confirmed:
+            groups.setdefault(find(a), []).append((a, b, score))
+        best = {}
+        clusters = []
+        for edges in groups.values():
+            keys = sorted({k for a, b, _ in edges for k in (a, b)}, key=lambda k: (k[0] != "queued", str(k)))
+            index = {k: n for n, k in enumerate(keys)}
+            for a, b, score in edges:
+                for k in (a, b):
+                    if k[0] == "queued":
+                        best[k[1]] = max(best.get(k[1], 0.0), score)
+            clusters.append({
+                "score": round(max(s for _, _, s in edges), 4),
+                "members": [members[k] for k in keys],
+                "pairs": [{"a": index[a], "b": index[b], "score": round(s, 4)}
+                          for a, b, s in sorted(edges, key=lambda e: -e[2])],
+            })
+        clusters.sort(key=lambda c: -c["score"])
         return {
             "ok": True,
-            "memories": [dict(r) for r in rows],
-            "stats": [dict(r) for r in stats],
-            "total": total,
+            "method": method,
+            "threshold": threshold,
+            "results": [{"index": i, "is_duplicate": i in best, "score": round(best[i], 4) if i in best else None}
+                        for i in range(len(tasks))],
+            "clusters": clusters,
+            "candidates": len(pairs),
+            "corpus": len(self.lsh),
+            "errors": errors,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
         }
-    except Exception as e:
-        return {"ok": False, "error": str(e), "memories": [], "stats": [], "total": 0}
 
-def search_memory_semantic(query: str, limit: int = 10, min_importance: int = 1):
-    """Semantic search over memories using embeddings."""
-    import sys
-    sys.path.insert(0, f"{WORKSPACE}/memory_system")
-    try:
-        from memory_ops import search_memories_semantic
-        results = search_memories_semantic(query, limit=limit, min_importance=min_importance)
-        return {"ok": True, "results": results, "count": len(results)}
-    except Exception as e:
-        return {"ok": False, "error": str(e), "results": [], "count": 0}
 
-@cached(ttl_seconds=30)
+task_duplicates = TaskDuplicateDetector(memory_db)
+
+
+@cached(ttl_seconds=30, stale_seconds=120)
 def get_agent_tasks(limit=20):
     """Fetch recent session activity from OpenClaw sessions API.
     Shows most recent session per agent as 'last task' indicator."""
@@ -689,33 +3702,37 @@ def get_agent_tasks(limit=20):
     except Exception as e:
         return {"ok": True, "tasks": [], "error": str(e)}
 
-@cached(ttl_seconds=30)
-def get_rate_limits():
+def _load_channel_limits():
+    data = openclaw_backend.channels()
     limits = []
+    for ch in data if isinstance(data, list) else data.get("channels", data.get("providers", [])):
+        name = ch.get("name", ch.get("provider", "unknown"))
+        usage = ch.get("usage", ch.get("rateLimit", {}))
+        if not isinstance(usage, dict):
+            continue
+        limit_val = usage.get("limit", usage.get("max", 0))
+        used_val = usage.get("used", usage.get("current", 0))
+        window = usage.get("window", usage.get("resetIn", "unknown"))
+        pct = round((used_val / limit_val * 100) if limit_val > 0 else 0, 1)
+        limits.append({
+            "provider": name, "used": used_val, "limit": limit_val,
+            "percent": pct, "window": str(window),
+        })
+    return limits
+
+
+@cached(ttl_seconds=30, stale_seconds=300)
+def _channel_limits_direct():
     try:
-        proc = subprocess.run(
-            [OPENCLAW_BIN, "channels", "list", "--json"],
-            capture_output=True, text=True, timeout=10
-        )
-        if proc.returncode == 0:
-            data = json.loads(proc.stdout)
-            for ch in data.get("channels", data.get("providers", [])):
-                name = ch.get("name", ch.get("provider", "unknown"))
-                usage = ch.get("usage", ch.get("rateLimit", {}))
-                if not isinstance(usage, dict):
-                    continue
-                limit_val = usage.get("limit", usage.get("max", 0))
-                used_val = usage.get("used", usage.get("current", 0))
-                window = usage.get("window", usage.get("resetIn", "unknown"))
-                pct = round((used_val / limit_val * 100) if limit_val > 0 else 0, 1)
-                limits.append({
-                    "provider": name, "used": used_val, "limit": limit_val,
-                    "percent": pct, "window": str(window),
-                })
-            if limits:
-                return {"ok": True, "limits": limits}
+        return _load_channel_limits()
     except Exception:
-        pass
+        return []
+
+
+def get_rate_limits():
+    limits = list(collected("rate_limits", _channel_limits_direct))
+    if limits:
+        return {"ok": True, "limits": limits}
     try:
         with open(f"{WORKSPACE}/memory/monitor-state.json") as f:
             mon = json.load(f)
@@ -727,16 +3744,896 @@ def get_rate_limits():
     return {"ok": True, "limits": limits}
 
 
+GATEWAY_UNIT = "openclaw-gateway.service"
+GATEWAY_PROPERTIES = ("ActiveState", "SubState", "NRestarts", "ActiveEnterTimestamp")
+GATEWAY_HISTORY_LEN = 2048
+
+
+class GatewayHealthHistory:
+    """Ring buffer of gateway state transitions and NRestarts deltas.
+
+    observe() is fed every probe but only appends when the state changes or
+    the restart counter grows, so a day of probes is usually a few entries.
+    Each entry's state is assumed to hold until the next one.
+    """
+    def __init__(self, maxlen=GATEWAY_HISTORY_LEN):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=maxlen)  # (ts, status, restarts, restart_delta)
+        self._last = None                    # (status, restarts) of the latest probe
+        self.probes = 0
+
+    def observe(self, status, restarts, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self.probes += 1
+            if self._last is None:
+                self._events.append((ts, status, restarts, 0))
+            else:
+                prev_status, prev_restarts = self._last
+                # NRestarts starts over when the unit is reloaded or the user manager restarts.
+                delta = restarts - prev_restarts if restarts >= prev_restarts else restarts
+                if status != prev_status or delta:
+                    self._events.append((ts, status, restarts, delta))
+            self._last = (status, restarts)
+
+    def summary(self, window, now=None):
+        """Uptime, flaps (leaving active, or restarted between probes) and restarts over the last window seconds."""
+        now = time.time() if now is None else now
+        start = now - window
+        with self._lock:
+            events = list(self._events)
+            probes = self.probes
+        state_sec, transitions = {}, []
+        flaps = restarts = 0
+        for i, (ts, status, count, delta) in enumerate(events):
+            end = events[i + 1][0] if i + 1 < len(events) else now
+            held = min(end, now) - max(ts, start)
+            if held > 0:
+                state_sec[status] = state_sec.get(status, 0) + held
+            if i == 0 or ts < start:
+                continue
+            restarts += delta
+            prev = events[i - 1][1]
+            # A restart between two probes shows up only as a restart delta.
+            flaps += (prev == "active" and status != "active") or (status == prev and delta > 0)
+            transitions.append({"at": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+                                "from": prev, "to": status, "restarts": count, "restart_delta": delta})
+        observed = sum(state_sec.values())
+        return {
+            "window_sec": window,
+            "observed_sec": round(observed),
+            "uptime_percent": round(100 * state_sec.get("active", 0) / observed, 2) if observed else None,
+            "state_seconds": {k: round(v) for k, v in state_sec.items()},
+            "flaps": flaps,
+            "restarts": restarts,
+            "probes": probes,
+            "transitions": transitions[-100:],
+        }
+
+
+gateway_health_history = GatewayHealthHistory()
+
+
+def probe_gateway_health():
+    """One batched `systemctl show` of the gateway unit; raises if systemctl cannot run."""
+    result = {"status": "unknown", "restarts": 0, "last_probe": datetime.now().isoformat()}
+    proc = subprocess.run(
+        ["systemctl", "--user", "show", GATEWAY_UNIT, "-p", ",".join(GATEWAY_PROPERTIES)],
+        capture_output=True, text=True, timeout=5
+    )
+    props = dict(line.split("=", 1) for line in proc.stdout.splitlines() if "=" in line)
+    if proc.returncode == 0:
+        result["status"] = props.get("ActiveState") or "unknown"
+        result["sub_state"] = props.get("SubState", "")
+        try:
+            result["restarts"] = int(props.get("NRestarts") or 0)
+        except ValueError:
+            pass
+        if props.get("ActiveEnterTimestamp", "").strip():
+            result["active_since"] = props["ActiveEnterTimestamp"].strip()
+        gateway_health_history.observe(result["status"], result["restarts"])
+    return result
+
+
+@cached(ttl_seconds=10, stale_seconds=60)
+def _gateway_health_direct():
+    try:
+        return probe_gateway_health()
+    except Exception:
+        return {"status": "unknown", "restarts": 0, "last_probe": datetime.now().isoformat()}
+
+
+def ollama_running():
+    return subprocess.run(["pgrep", "-x", "ollama"], capture_output=True, timeout=2).returncode == 0
+
+
+COLLECTOR_SOURCES = {
+    "sessions": _load_sessions,
+    "crons": _load_configured_crons,
+    "rate_limits": _load_channel_limits,
+    "gateway_health": probe_gateway_health,
+    "ollama": ollama_running,
+}
+
+
+def get_status():
+    latest = metrics_sampler.latest()
+    if latest is not None:
+        return latest
+    ram, ramt = get_mem()
+    dsk, dskt = get_disk()
+    return {"cpu_percent": get_cpu(), "ram_gb": ram, "ram_total_gb": ramt, "disk_gb": dsk, "disk_total_gb": dskt, "uptime": get_uptime()}
+
+
+def get_monitor_state():
+    try:
+        with open(f"{WORKSPACE}/memory/monitor-state.json") as f:
+            return json.load(f)
+    except:
+        return {"lastCheckAt": None, "lastRateLimitCount": 0, "lastAlertAt": None}
+
+
+def get_active_agents():
+    # Use shared session cache, filter for active sessions
+    sessions = _fetch_all_sessions()
+    # Filter to sessions active in last 24 hours (1440 mins)
+    active_sessions = [s for s in sessions if s.get("ageMs", 999999) < 1440 * 60 * 1000]
+    return {"ok": True, "sessions": active_sessions}
+
+
+def get_gateway_health():
+    return collected("gateway_health", _gateway_health_direct)
+
+
+def get_providers():
+    """Dynamic provider detection from openclaw.json."""
+    providers = []
+    config_path = pathlib.Path("/home/rosebud0585/.openclaw/openclaw.json")
+
+    if config_path.exists():
+        try:
+            config = json.loads(config_path.read_text())
+            configured = config.get("models", {}).get("providers", {})
+
+            for provider_id, provider_cfg in configured.items():
+                models = provider_cfg.get("models", [])
+                if not models:
+                    continue
+
+                # Build display name
+                display_name = provider_id.title()
+                model_names = [m.get("name") or m.get("id") for m in models[:2]]
+                if model_names:
+                    display_name = f"{provider_id.title()} ({', '.join(model_names)})"
+
+                # Health check per provider type
+                status = "ok"
+                message = "Configured"
+
+                if provider_id == "ollama":
+                    # Check if ollama process is running
+                    try:
+                        running = collected("ollama", ollama_running)
+                        status = "ok" if running else "missing"
+                        message = "Running" if running else "Not running"
+                    except:
+                        status = "missing"
+                        message = "Check failed"
+
+                elif provider_id == "nvidia":
+                    # NVIDIA NIM — check API key presence
+                    has_key = bool(provider_cfg.get("apiKey") and provider_cfg["apiKey"] != "__OPENCLAW_REDACTED__")
+                    status = "ok" if has_key else "missing"
+                    message = "API key set" if has_key else "No API key"
+
+                elif provider_id == "modal":
+                    # Modal — check API key
+                    has_key = bool(provider_cfg.get("apiKey") and provider_cfg["apiKey"] != "__OPENCLAW_REDACTED__")
+                    status = "ok" if has_key else "missing"
+                    message = "API key set" if has_key else "No API key"
+
+                elif provider_id == "openai-codex":
+                    # Codex — OAuth managed by OpenClaw
+                    status = "ok"
+                    message = "OAuth managed"
+
+                providers.append({
+                    "name": display_name,
+                    "status": status,
+                    "message": message
+                })
+
+            # Also check auth.profiles for OAuth providers (e.g., openai-codex)
+            auth_profiles = config.get("auth", {}).get("profiles", {})
+            for profile_key, profile_cfg in auth_profiles.items():
+                provider = profile_cfg.get("provider", "")
+                if provider == "openai-codex":
+                    # Get model aliases to show which Codex model
+                    model_aliases = config.get("agents", {}).get("defaults", {}).get("models", {})
+                    codex_model = "GPT-5.4"
+                    for model_id, alias_cfg in model_aliases.items():
+                        if "gpt-5.4" in model_id.lower() or alias_cfg.get("alias") == "codex54":
+                            codex_model = alias_cfg.get("alias", "GPT-5.4").upper()
+
+                    providers.append({
+                        "name": f"OpenAI Codex ({codex_model})",
+                        "status": "ok",
+                        "message": "OAuth managed"
+                    })
+
+        except Exception as e:
+            providers.append({"name": "Config Error", "status": "error", "message": str(e)})
+    else:
+        providers.append({"name": "No Config", "status": "missing", "message": "openclaw.json not found"})
+
+    return {"providers": providers}
+
+
+def get_skills():
+    skills = []
+    for name in discover_skills():
+        sf = pathlib.Path(f"{SKILLS_DIR}/{name}/SKILL.md")
+        exists = sf.exists()
+        desc = ""
+        if exists:
+            try:
+                for ln in sf.read_text().split("\n"):
+                    if ln.strip().startswith("description:"):
+                        desc = ln.split(":",1)[1].strip().strip('"').strip("'")
+                        break
+            except:
+                pass
+        skills.append({"name": name, "installed": exists, "description": desc})
+    return {"skills": skills}
+
+
+
+def get_issues():
+    issues = memory_corpus.issues()
+    return {"issues": issues, "nominal": len(issues)==0}
+
+
+def get_actions():
+    actions = []
+    now = time.time()
+    with _action_lock:
+        last_runs = dict(_action_last_run)
+    for aid, cfg in ACTION_MAP.items():
+        last = last_runs.get(aid, 0)
+        cooldown_left = max(0, ACTION_COOLDOWN_SEC - int(now - last)) if last else 0
+        actions.append({
+            "id": aid,
+            "label": cfg.get("label", aid),
+            "cooldown_left": cooldown_left,
+        })
+    return {"actions": actions, "cooldown_sec": ACTION_COOLDOWN_SEC}
+
+
+def get_costs():
+    record_costs()
+    return get_session_costs()
+
+
+# Resources available to /api/bundle, keyed by their /api/<name> path.
+BUNDLE_RESOURCES = {
+    "status": get_status,
+    "monitor": get_monitor_state,
+    "agents": get_active_agents,
+    "agent-tasks": get_agent_tasks,
+    "gateway-health": get_gateway_health,
+    "providers": get_providers,
+    "skills": get_skills,
+    "activity": lambda: {"activities": parse_activities()},
+    "issues": get_issues,
+    "todos": parse_todos,
+    "actions": get_actions,
+    "costs": get_costs,
+    "cost-history": get_cost_history,
+    "crons": get_cron_sessions,
+    "cron-config": get_configured_crons,
+    "rate-limits": get_rate_limits,
+    "feed": lambda: {"ok": True, "entries": parse_activities(limit=100)},
+}
+# Resources derived from _fetch_all_sessions; a bundle fetches sessions once up front.
+SESSION_RESOURCES = {"agents", "agent-tasks", "costs"}
+BUNDLE_WORKERS = 6
+_bundle_pool = ThreadPoolExecutor(max_workers=BUNDLE_WORKERS, thread_name_prefix="homie-bundle")
+
+
+def _timed_call(fn):
+    started = time.perf_counter()
+    try:
+        return fn(), None, round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        return None, str(e), round((time.perf_counter() - started) * 1000, 1)
+
+
+def get_bundle(names):
+    """Compute several resources concurrently and return them in one document."""
+    started = time.perf_counter()
+    unknown = [n for n in names if n not in BUNDLE_RESOURCES]
+    names = [n for n in dict.fromkeys(names) if n in BUNDLE_RESOURCES]
+    result = {"ok": True, "resources": {}, "errors": {}, "timings_ms": {}}
+    for n in unknown:
+        result["errors"][n] = "Unknown resource"
+    if SESSION_RESOURCES.intersection(names):
+        _, _, ms = _timed_call(_fetch_all_sessions)
+        result["timings_ms"]["_sessions"] = ms
+    futures = {n: _bundle_pool.submit(_timed_call, BUNDLE_RESOURCES[n]) for n in names}
+    for n, fut in futures.items():
+        value, err, ms = fut.result()
+        result["timings_ms"][n] = ms
+        if err is None:
+            result["resources"][n] = value
+        else:
+            result["errors"][n] = err
+    result["ok"] = not result["errors"]
+    result["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+# Server-Sent Events: a publisher thread recomputes the streamed resources
+# (cheap, they read collector snapshots) whenever a collector finishes or the
+# poll interval passes, and publishes only those whose JSON changed.
+STREAM_RESOURCES = {
+    "status": get_status,
+    "agents": get_active_agents,
+    "crons": get_cron_sessions,
+    "cron-config": get_configured_crons,
+    "costs": get_session_costs,
+    "rate-limits": get_rate_limits,
+    "todos": parse_todos,
+}
+STREAM_MIN_INTERVAL = {"status": 10}
+STREAM_POLL_SEC = 5
+STREAM_HEARTBEAT_SEC = 15
+STREAM_MAX_SEC = 1800  # connection lifetime; clients reconnect with Last-Event-ID
+STREAM_MAX_CLIENTS = 64
+STREAM_SEND_TIMEOUT_SEC = 5  # a client that cannot take an event this fast is dropped
+
+
+class EventHub:
+    """Latest event per resource, with process-unique, increasing event ids.
+
+    Ids look like "<epoch>-<seq>". A client resuming with Last-Event-ID gets
+    the latest event of every resource that changed after that id; an id
+    from another server process gets the full current snapshot.
+    """
+    def __init__(self):
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._latest = {}  # name -> (seq, data_json)
+
+    def publish(self, name, payload):
+        data = json.dumps(payload, sort_keys=True, default=str)
+        with self._cond:
+            current = self._latest.get(name)
+            if current is not None and current[1] == data:
+                return False
+            self._seq += 1
+            self._latest[name] = (self._seq, data)
+            self._cond.notify_all()
+            return True
+
+    def parse_id(self, event_id):
+        """Sequence number encoded in event_id, or 0 if it is missing or from another epoch."""
+        epoch, _, seq = (event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return 0
+        return int(seq)
+
+    def since(self, seq):
+        """[(event_id, name, data_json)] for every resource changed after seq, oldest first."""
+        with self._cond:
+            events = sorted((s, name, data) for name, (s, data) in self._latest.items() if s > seq)
+        return [(f"{self.epoch}-{s}", name, data) for s, name, data in events]
+
+    def wait(self, seq, timeout, wake=None):
+        """Block until an event newer than seq exists (or wake() is true after notify()); False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq > seq or (wake is not None and wake()), timeout)
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def seq(self):
+        with self._cond:
+            return self._seq
+
+
+stream_hub = EventHub()
+_stream_wake = threading.Event()
+
+
+class StreamSubscribers:
+    """/api/stream connections, all fed by one thread instead of each holding a request worker.
+
+    The handler sends the response headers and hands over the socket; this
+    thread then writes every event after the client's Last-Event-ID, pings
+    idle clients every STREAM_HEARTBEAT_SEC and closes a connection after
+    STREAM_MAX_SEC or as soon as a write fails or times out.
+    """
+    def __init__(self, hub, max_clients=STREAM_MAX_CLIENTS):
+        self.hub = hub
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = []  # [socket, last sequence sent, close deadline, last write time]
+        self._added = False
+        self._thread = None
+
+    def count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def add(self, sock, seq):
+        """Take over sock (response headers already sent); False if max_clients are connected."""
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return False
+            sock.settimeout(STREAM_SEND_TIMEOUT_SEC)
+            now = time.time()
+            self._clients.append([sock, seq, now + STREAM_MAX_SEC, now])
+            self._added = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stream-subscribers", daemon=True)
+                self._thread.start()
+        self.hub.notify()
+        return True
+
+    def _send(self, client, now):
+        sock, seq, deadline, last_write = client
+        if now >= deadline:
+            return False
+        events = self.hub.since(seq)
+        if events:
+            data = "".join(f"id: {event_id}\nevent: {name}\ndata: {payload}\n\n"
+                           for event_id, name, payload in events)
+            client[1] = self.hub.parse_id(events[-1][0])
+        elif now - last_write >= STREAM_HEARTBEAT_SEC:
+            data = ": ping\n\n"
+        else:
+            return True
+        try:
+            sock.sendall(data.encode())
+        except OSError:
+            return False
+        client[3] = now
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._added = False
+                clients = list(self._clients)
+            now = time.time()
+            dropped = [c for c in clients if not self._send(c, now)]
+            with self._lock:
+                for client in dropped:
+                    self._clients.remove(client)
+            for sock, *_ in dropped:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+            seq = self.hub.seq
+            self.hub.wait(seq, STREAM_HEARTBEAT_SEC / 3, lambda: self._added)
+
+
+stream_subscribers = StreamSubscribers(stream_hub)
+
+
+def _stream_publisher():
+    last_run = {}
+    while True:
+        _stream_wake.wait(STREAM_POLL_SEC)
+        _stream_wake.clear()
+        now = time.time()
+        for name, fn in STREAM_RESOURCES.items():
+            if now - last_run.get(name, 0) < STREAM_MIN_INTERVAL.get(name, 0):
+                continue
+            last_run[name] = now
+            try:
+                stream_hub.publish(name, fn())
+            except Exception as e:
+                log(f"Stream: failed to compute {name}: {e}")
+
+
+def start_cost_ledger():
+    _collector_listeners.append(lambda name: name == "sessions" and record_costs())
+    threading.Thread(target=record_costs, name="cost-ledger-init", daemon=True).start()
+
+
+def start_stream_publisher():
+    _collector_listeners.append(lambda name: _stream_wake.set())
+    threading.Thread(target=_stream_publisher, name="stream-publisher", daemon=True).start()
+    _stream_wake.set()
+
+
+# Per-endpoint concurrency limits. Slow, subprocess-backed endpoints get a small
+# number of slots so they cannot occupy the whole worker pool; requests that
+# cannot get a slot within ENDPOINT_WAIT_SEC are answered with 503.
+DEFAULT_WORKERS = 24
+ENDPOINT_WAIT_SEC = 15
+ENDPOINT_LIMITS = {
+    "/api/agents": 2,
+    "/api/agent-tasks": 2,
+    "/api/costs": 2,
+    "/api/crons": 2,
+    "/api/cron-config": 2,
+    "/api/rate-limits": 2,
+    "/api/gateway-health": 2,
+    "/api/providers": 2,
+    "/api/memory-search": 2,
+    "/api/tasks/duplicates": 2,
+    "/api/actions/run": 2,
+    "/api/actions/stream": 8,
+    "/api/bundle": 4,
+}
+_endpoint_semaphores = {p: threading.BoundedSemaphore(n) for p, n in ENDPOINT_LIMITS.items()}
+
+
+@contextlib.contextmanager
+def endpoint_slot(path):
+    """Hold one concurrency slot for path; yields False if none freed up in time."""
+    sem = _endpoint_semaphores.get(path)
+    if sem is None:
+        yield True
+        return
+    if not sem.acquire(timeout=ENDPOINT_WAIT_SEC):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        sem.release()
+
+
+KEEPALIVE_IDLE_SEC = 5
+POOL_BACKLOG = 32  # accepted connections allowed to wait for a worker before new ones get 503
+_POOL_BUSY_BODY = json.dumps({"error": "Server busy"}).encode()
+POOL_BUSY_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: %d\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n\r\n" % len(_POOL_BUSY_BODY)
+) + _POOL_BUSY_BODY
+
+
+class DetachingHTTPServer(http.server.HTTPServer):
+    """HTTPServer whose handlers can keep their socket open past the request (see detach)."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+
+    def detach(self, request):
+        """The handler passed request on to another owner; do not close it when the handler returns."""
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
+class PooledHTTPServer(DetachingHTTPServer):
+    """HTTPServer that hands each accepted connection to a bounded thread pool.
+
+    At most workers + backlog connections are in flight (running or queued);
+    beyond that the accept loop answers 503 itself instead of queueing.
+    """
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_cls, workers=DEFAULT_WORKERS, backlog=POOL_BACKLOG):
+        super().__init__(server_address, handler_cls)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="homie-http")
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.settimeout(1)
+                request.sendall(POOL_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            self._pool.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:  # pool shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+# Content versions for JSON resources. Every 200 GET response carries an ETag
+# (its content hash) and honours If-None-Match. Resources listed in
+# DELTA_RESOURCES also accept ?since=<version> and return only added, changed
+# and removed items relative to that version, if it is still remembered.
+DELTA_RESOURCES = {
+    "/api/agents": ("sessions", lambda s: s.get("key") or s.get("sessionId")),
+    "/api/agent-tasks": ("tasks", lambda t: t.get("session_id") or t.get("agent")),
+    "/api/crons": ("crons", lambda c: c.get("name")),
+    "/api/todos": ("projects", lambda p: p.get("path")),
+}
+DELTA_KEEP_VERSIONS = 16
+
+
+def _digest(raw):
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+class ResourceVersions:
+    """Remembers item digests of the last few versions of each delta resource."""
+    def __init__(self, keep=DELTA_KEEP_VERSIONS):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._history = {}  # path -> OrderedDict(version -> {item_key: digest})
+
+    @staticmethod
+    def item_digests(items, key_fn):
+        """(key, digest) per item, in item order; the key is None for items without one."""
+        pairs = []
+        for it in items:
+            key = key_fn(it)
+            pairs.append((None if key is None or key == "" else str(key),
+                          _digest(json.dumps(it, sort_keys=True, default=str).encode())))
+        return pairs
+
+    def record(self, path, version, digests):
+        with self._lock:
+            hist = self._history.setdefault(path, OrderedDict())
+            hist[version] = digests
+            hist.move_to_end(version)
+            while len(hist) > self.keep:
+                hist.popitem(last=False)
+
+    def get(self, path, version):
+        with self._lock:
+            return self._history.get(path, {}).get(version)
+
+
+resource_versions = ResourceVersions()
+
+
+def build_delta(path, data, version, since):
+    """Delta document for data relative to version since, or None if since is unknown.
+
+    Also records data as version so later requests can diff against it.
+    Versions whose item keys are missing or repeated (e.g. two crons with the
+    same name) are not recorded and always get the full document.
+    """
+    list_key, key_fn = DELTA_RESOURCES[path]
+    items = data.get(list_key) if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return None
+    pairs = resource_versions.item_digests(items, key_fn)
+    digests = dict(pairs)
+    if len(digests) != len(pairs) or None in digests:
+        return None
+    resource_versions.record(path, version, digests)
+    if not since:
+        return None
+    old = resource_versions.get(path, since)
+    if old is None:
+        return None
+    added, changed = [], []
+    for it, (k, d) in zip(items, pairs):
+        if k not in old:
+            added.append(it)
+        elif old[k] != d:
+            changed.append(it)
+    delta = {k: v for k, v in data.items() if k != list_key}
+    delta.update({
+        "delta": True, "since": since, "version": version, "key": list_key,
+        "added": added, "changed": changed,
+        "removed": [k for k in old if k not in digests],
+    })
+    return delta
+
+
+def _parse_accept_encoding(value):
+    """[(coding, q)] from an Accept-Encoding header; an unparsable q counts as 0."""
+    codings = []
+    for part in (value or "").split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, val = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(val.strip())
+                except ValueError:
+                    q = 0.0
+        codings.append((coding, q))
+    return codings
+
+
+class StaticAsset:
+    """A static file held in memory with precompressed variants.
+
+    The file is re-read (and recompressed) only when its mtime or size
+    changes; the ETag is a content hash so conditional requests get a 304.
+    """
+    def __init__(self, path, content_type):
+        self.path = pathlib.Path(path)
+        self.content_type = content_type
+        self._lock = threading.Lock()
+        self._stat = None
+        self.etag = None
+        self.last_modified = None
+        self.variants = {}  # content-encoding ("identity", "gzip", "br") -> bytes
+
+    def current(self):
+        """Reload if the file changed on disk; returns self."""
+        st = os.stat(self.path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key != self._stat:
+                data = self.path.read_bytes()
+                variants = {"identity": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants["br"] = brotli.compress(data)
+                self.variants = variants
+                self.etag = '"%s"' % hashlib.sha1(data).hexdigest()[:20]
+                self.last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+                self._stat = key
+        return self
+
+    def negotiate(self, accept_encoding):
+        """Best available encoding for an Accept-Encoding header value (codings with q=0 are refused)."""
+        qvalues = dict(_parse_accept_encoding(accept_encoding))
+        for enc in ("br", "gzip"):
+            if qvalues.get(enc, qvalues.get("*", 0)) > 0 and enc in self.variants:
+                return enc
+        return "identity"
+
+
+STATIC_ASSETS = {
+    "/": StaticAsset(BASE_DIR / "index.html", "text/html; charset=utf-8"),
+}
+
+
 class Handler(http.server.BaseHTTPRequestHandler):
+    timeout = KEEPALIVE_IDLE_SEC  # bounds how long an idle keep-alive connection holds a worker
+    disable_nagle_algorithm = True  # headers and body are separate writes on a kept-alive socket
+
     def log_message(self, fmt, *args):
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {fmt % args}")
+        log(f"[{datetime.now().strftime('%H:%M:%S')}] {fmt % args}")
 
     def send_json(self, data, code=200):
+        body = json.dumps(data).encode()
+        headers = {}
+        if code == 200 and self.command == "GET":
+            version = _digest(body)
+            route = getattr(self, "route", None)
+            if route in DELTA_RESOURCES:
+                since = self.params.get("since", "")
+                delta = build_delta(route, data, version, since)
+                if delta is not None:
+                    body = json.dumps(delta).encode()
+            etag = f'"{version}"'
+            if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("X-Resource-Version", version)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.send_header("Access-Control-Expose-Headers", "ETag, X-Resource-Version")
+                self.end_headers()
+                return
+            headers = {"ETag": etag, "X-Resource-Version": version, "Cache-Control": "no-cache"}
         self.send_response(code)
         self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag, X-Resource-Version")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_asset(self, asset):
+        """Serve a StaticAsset from memory, honouring If-None-Match and Accept-Encoding."""
+        try:
+            asset = asset.current()
+        except OSError:
+            self.send_json({"error": "Not found"}, 404)
+            return
+        if_none_match = self.headers.get("If-None-Match", "")
+        if asset.etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+        encoding = asset.negotiate(self.headers.get("Accept-Encoding"))
+        body = asset.variants[encoding]
+        self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", asset.etag)
+        self.send_header("Last-Modified", asset.last_modified)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, params):
+        """Answer /api/stream and hand the connection to stream_subscribers, freeing this worker."""
+        self.close_connection = True
+        if stream_subscribers.count() >= stream_subscribers.max_clients:
+            self.send_json({"error": "Too many event streams, try again"}, 503)
+            return
+        seq = stream_hub.parse_id(self.headers.get("Last-Event-ID") or params.get("lastEventId"))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
         self.send_header("Access-Control-Allow-Origin", "*")
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        try:
+            self.wfile.write(b"retry: 5000\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            return
+        if stream_subscribers.add(self.connection, seq):
+            self.server.detach(self.connection)
+
+    def send_job_stream(self, job, params):
+        """Serve an action job's output as text/event-stream until the job is done."""
+        self.close_connection = True
+        after = self.headers.get("Last-Event-ID") or params.get("after") or "0"
+        after = int(after) if after.isdigit() else 0
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        try:
+            self.wfile.write(b"retry: 2000\n\n")
+            while True:
+                done = job.done
+                for seq, stream, text in job.output(after):
+                    data = json.dumps({"stream": stream, "text": text})
+                    self.wfile.write(f"id: {seq}\nevent: output\ndata: {data}\n\n".encode())
+                    after = seq
+                if done:
+                    self.wfile.write(f"event: done\ndata: {json.dumps(job.to_dict())}\n\n".encode())
+                    self.wfile.flush()
+                    return
+                self.wfile.flush()
+                if not job.wait(after, STREAM_HEARTBEAT_SEC):
+                    self.wfile.write(b": ping\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            pass
 
     def do_POST(self):
         try:
@@ -747,31 +4644,53 @@ class Handler(http.server.BaseHTTPRequestHandler):
             body = self.rfile.read(length).decode() if length else "{}"
             payload = json.loads(body or "{}")
 
-            if path == "/api/todos/toggle":
-                p = payload.get("path", "")
-                line_no = int(payload.get("line_no", -1))
-                new_done = bool(payload.get("done", False))
-                ok, msg = toggle_todo_item(p, line_no, new_done)
-                if ok:
-                    self.send_json({"ok": True, "message": msg})
-                else:
-                    self.send_json({"ok": False, "error": msg}, 400)
-                return
+            with endpoint_slot(path) as acquired:
+                if not acquired:
+                    self.send_json({"ok": False, "error": "Server busy, try again"}, 503)
+                    return
+                self._dispatch_post(path, payload)
+        except Exception as e:
+            self.send_json({"ok": False, "error": str(e)}, 500)
+
+    def _dispatch_post(self, path, payload):
+        if path == "/api/todos/toggle":
+            p = payload.get("path", "")
+            line_no = int(payload.get("line_no", -1))
+            new_done = bool(payload.get("done", False))
+            ok, msg = toggle_todo_item(p, line_no, new_done)
+            if ok:
+                self.send_json({"ok": True, "message": msg})
+            else:
+                self.send_json({"ok": False, "error": msg}, 400)
+            return
 
-            if path == "/api/actions/run":
-                action_id = str(payload.get("action", "")).strip()
-                result, code = run_allowed_action(action_id)
-                self.send_json(result, code)
+        if path == "/api/tasks/duplicates":
+            tasks = payload.get("tasks")
+            if tasks is None and payload.get("task"):
+                tasks = [payload["task"]]
+            if not isinstance(tasks, list) or not tasks or len(tasks) > DUPLICATE_MAX_TASKS:
+                self.send_json({"ok": False, "error": f"tasks must be a list of 1..{DUPLICATE_MAX_TASKS} strings"}, 400)
                 return
+            threshold = payload.get("threshold")
+            self.send_json(task_duplicates.check([str(t) for t in tasks],
+                                                 float(threshold) if threshold is not None else None))
+            return
 
-            self.send_json({"error": "Not found"}, 404)
-        except Exception as e:
-            self.send_json({"ok": False, "error": str(e)}, 500)
+        if path == "/api/actions/run":
+            action_id = str(payload.get("action", "")).strip()
+            job, error = action_jobs.submit(action_id)
+            if error:
+                self.send_json(*error)
+            elif payload.get("async"):
+                self.send_json({"ok": True, "job": job.to_dict()}, 202)
+            else:
+                job.wait_done(None)
+                self.send_json(*job.result())
+            return
+
+        self.send_json({"error": "Not found"}, 404)
 
     def do_GET(self):
-        # Periodic cache cleanup (every ~100 requests)
-        if len(_cache) > 50:
-            _cleanup_cache()
         try:
             path = self.path.split("?")[0]
             if path.startswith("/dashboard"):
@@ -785,251 +4704,188 @@ class Handler(http.server.BaseHTTPRequestHandler):
                         k, v = p.split("=", 1)
                         params[k] = v
             
-            if path == "/":
-                with open(BASE_DIR / "index.html") as f:
-                    html = f.read()
-                self.send_response(200)
-                self.send_header("Content-type", "text/html")
-                self.end_headers()
-                self.wfile.write(html.encode())
-            elif path == "/api/status":
-                ram, ramt = get_mem()
-                dsk, dskt = get_disk()
-                self.send_json({"cpu_percent": get_cpu(), "ram_gb": ram, "ram_total_gb": ramt, "disk_gb": dsk, "disk_total_gb": dskt, "uptime": get_uptime()})
-            elif path == "/api/monitor":
-                try:
-                    with open(f"{WORKSPACE}/memory/monitor-state.json") as f:
-                        self.send_json(json.load(f))
-                except:
-                    self.send_json({"lastCheckAt": None, "lastRateLimitCount": 0, "lastAlertAt": None})
-            elif path == "/api/agents":
-                # Use shared session cache, filter for active sessions
-                sessions = _fetch_all_sessions()
-                # Filter to sessions active in last 24 hours (1440 mins)
-                active_sessions = [s for s in sessions if s.get("ageMs", 999999) < 1440 * 60 * 1000]
-                self.send_json({"ok": True, "sessions": active_sessions})
-            elif path == "/api/agent-tasks":
-                self.send_json(get_agent_tasks())
-            elif path == "/api/gateway-health":
-                result = {"status": "unknown", "restarts": 0, "last_probe": datetime.now().isoformat()}
-                try:
-                    proc = subprocess.run(
-                        ["systemctl", "--user", "is-active", "openclaw-gateway.service"],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    result["status"] = proc.stdout.strip() or "unknown"
-                except Exception:
-                    pass
-                try:
-                    proc2 = subprocess.run(
-                        ["systemctl", "--user", "show", "openclaw-gateway.service", "-p", "NRestarts"],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    if proc2.returncode == 0:
-                        parts = proc2.stdout.strip().split("=", 1)
-                        if len(parts) == 2:
-                            result["restarts"] = int(parts[1])
-                except Exception:
-                    pass
-                try:
-                    proc3 = subprocess.run(
-                        ["systemctl", "--user", "show", "openclaw-gateway.service", "-p", "ActiveEnterTimestamp"],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    if proc3.returncode == 0:
-                        parts = proc3.stdout.strip().split("=", 1)
-                        if len(parts) == 2 and parts[1].strip():
-                            result["active_since"] = parts[1].strip()
-                except Exception:
-                    pass
-                self.send_json(result)
-            elif path == "/api/providers":
-                # Dynamic provider detection from openclaw.json
-                providers = []
-                config_path = pathlib.Path("/home/rosebud0585/.openclaw/openclaw.json")
-                
-                if config_path.exists():
-                    try:
-                        config = json.loads(config_path.read_text())
-                        configured = config.get("models", {}).get("providers", {})
-                        
-                        for provider_id, provider_cfg in configured.items():
-                            models = provider_cfg.get("models", [])
-                            if not models:
-                                continue
-                            
-                            # Build display name
-                            display_name = provider_id.title()
-                            model_names = [m.get("name") or m.get("id") for m in models[:2]]
-                            if model_names:
-                                display_name = f"{provider_id.title()} ({', '.join(model_names)})"
-                            
-                            # Health check per provider type
-                            status = "ok"
-                            message = "Configured"
-                            
-                            if provider_id == "ollama":
-                                # Check if ollama process is running
-                                try:
-                                    running = subprocess.run(
-                                        ["pgrep", "-x", "ollama"],
-                                        capture_output=True, timeout=2
-                                    ).returncode == 0
-                                    status = "ok" if running else "missing"
-                                    message = "Running" if running else "Not running"
-                                except:
-                                    status = "missing"
-                                    message = "Check failed"
-                            
-                            elif provider_id == "nvidia":
-                                # NVIDIA NIM — check API key presence
-                                has_key = bool(provider_cfg.get("apiKey") and provider_cfg["apiKey"] != "__OPENCLAW_REDACTED__")
-                                status = "ok" if has_key else "missing"
-                                message = "API key set" if has_key else "No API key"
-                            
-                            elif provider_id == "modal":
-                                # Modal — check API key
-                                has_key = bool(provider_cfg.get("apiKey") and provider_cfg["apiKey"] != "__OPENCLAW_REDACTED__")
-                                status = "ok" if has_key else "missing"
-                                message = "API key set" if has_key else "No API key"
-                            
-                            elif provider_id == "openai-codex":
-                                # Codex — OAuth managed by OpenClaw
-                                status = "ok"
-                                message = "OAuth managed"
-                            
-                            providers.append({
-                                "name": display_name,
-                                "status": status,
-                                "message": message
-                            })
-                        
-                        # Also check auth.profiles for OAuth providers (e.g., openai-codex)
-                        auth_profiles = config.get("auth", {}).get("profiles", {})
-                        for profile_key, profile_cfg in auth_profiles.items():
-                            provider = profile_cfg.get("provider", "")
-                            if provider == "openai-codex":
-                                # Get model aliases to show which Codex model
-                                model_aliases = config.get("agents", {}).get("defaults", {}).get("models", {})
-                                codex_model = "GPT-5.4"
-                                for model_id, alias_cfg in model_aliases.items():
-                                    if "gpt-5.4" in model_id.lower() or alias_cfg.get("alias") == "codex54":
-                                        codex_model = alias_cfg.get("alias", "GPT-5.4").upper()
-                                
-                                providers.append({
-                                    "name": f"OpenAI Codex ({codex_model})",
-                                    "status": "ok",
-                                    "message": "OAuth managed"
-                                })
-                    
-                    except Exception as e:
-                        providers.append({"name": "Config Error", "status": "error", "message": str(e)})
-                else:
-                    providers.append({"name": "No Config", "status": "missing", "message": "openclaw.json not found"})
-                
-                self.send_json({"providers": providers})
-            elif path == "/api/skills":
-                skills = []
-                for name in discover_skills():
-                    sf = pathlib.Path(f"{SKILLS_DIR}/{name}/SKILL.md")
-                    exists = sf.exists()
-                    desc = ""
-                    if exists:
-                        try:
-                            for ln in sf.read_text().split("\n"):
-                                if ln.strip().startswith("description:"):
-                                    desc = ln.split(":",1)[1].strip().strip('"').strip("'")
-                                    break
-                        except:
-                            pass
-                    skills.append({"name": name, "installed": exists, "description": desc})
-                self.send_json({"skills": skills})
-            elif path == "/api/activity":
-                self.send_json({"activities": parse_activities()})
-            elif path == "/api/memory":
-                date = params.get("date")
-                files = sorted([f for f in os.listdir(MEMORY_DIR) if re.match(r"\d{4}-\d{2}-\d{2}\.md", f)], reverse=True)
-                all_dates = [f.replace(".md", "") for f in files]
-                if date and f"{date}.md" in files:
-                    content = pathlib.Path(f"{MEMORY_DIR}/{date}.md").read_text()
-                elif files:
-                    date = files[0].replace(".md", "")
-                    content = pathlib.Path(f"{MEMORY_DIR}/{files[0]}").read_text()
-                else:
-                    date, content = None, "No memory files"
-                self.send_json({"date": date, "content": content, "all_dates": all_dates})
-            elif path == "/api/issues":
-                issues = []
-                files = sorted([f for f in os.listdir(MEMORY_DIR) if re.match(r"\d{4}-\d{2}-\d{2}\.md", f)], reverse=True)
-                if files:
-                    with open(f"{MEMORY_DIR}/{files[0]}") as f:
-                        txt = f.read()
-                    for line in txt.split("\n"):
-                        lo = line.lower()
-                        if any(k in lo for k in ["error", "fail", "warning", "missing", "blocked", "rate limit", "timeout", "429"]):
-                            lvl = "error" if any(x in lo for x in ["error","fail","429","blocked"]) else "warning"
-                            issues.append({"message": line.strip()[:120], "level": lvl})
-                self.send_json({"issues": issues, "nominal": len(issues)==0})
-            elif path == "/api/todos":
-                self.send_json(parse_todos())
-            elif path == "/api/actions":
-                actions = []
-                now = time.time()
-                for aid, cfg in ACTION_MAP.items():
-                    last = _action_last_run.get(aid, 0)
-                    cooldown_left = max(0, ACTION_COOLDOWN_SEC - int(now - last)) if last else 0
-                    actions.append({
-                        "id": aid,
-                        "label": cfg.get("label", aid),
-                        "cooldown_left": cooldown_left,
-                    })
-                self.send_json({"actions": actions, "cooldown_sec": ACTION_COOLDOWN_SEC})
-            elif path == "/api/costs":
-                costs = get_session_costs()
-                record_daily_snapshot(costs)
-                self.send_json(costs)
-            elif path == "/api/cost-history":
-                self.send_json(load_cost_history())
-            elif path == "/api/crons":
-                self.send_json(get_cron_sessions())
-            elif path == "/api/cron-config":
-                self.send_json(get_configured_crons())
-            elif path == "/api/rate-limits":
-                self.send_json(get_rate_limits())
-            elif path == "/api/agent-tasks":
-                self.send_json(get_agent_tasks())
-            elif path == "/api/memory-db":
-                limit = int(params.get("limit", 50))
-                agent = params.get("agent", "")
-                type_ = params.get("type", "")
-                self.send_json(get_memory_db(limit, agent, type_))
-            elif path == "/api/memory-search":
-                query = params.get("q", "")
-                limit = int(params.get("limit", 10))
-                min_importance = int(params.get("importance", 1))
-                if not query:
-                    self.send_json({"ok": False, "error": "Missing query parameter 'q'", "results": []}, 400)
-                else:
-                    self.send_json(search_memory_semantic(query, limit, min_importance))
-            elif path == "/api/feed":
-                self.send_json({"ok": True, "entries": parse_activities(limit=100)})
-            else:
-                self.send_json({"error": "Not found"}, 404)
+            self.route, self.params = path, params
+            with endpoint_slot(path) as acquired:
+                if not acquired:
+                    self.send_json({"error": "Server busy, try again"}, 503)
+                    return
+                self._dispatch_get(path, params)
         except Exception as e:
-            print(f"Error: {e}")
+            log(f"Error: {e}")
             self.send_json({"error": str(e)}, 500)
 
+    def _dispatch_get(self, path, params):
+        if path in STATIC_ASSETS:
+            self.send_asset(STATIC_ASSETS[path])
+        elif path == "/api/status":
+            self.send_json(get_status())
+        elif path == "/api/monitor":
+            self.send_json(get_monitor_state())
+        elif path == "/api/agents":
+            self.send_json(get_active_agents())
+        elif path == "/api/agent-tasks":
+            self.send_json(get_agent_tasks())
+        elif path == "/api/gateway-health":
+            health = get_gateway_health()
+            if params.get("history") == "1":
+                window = max(60, min(int(params.get("window", 86400)), 30 * 86400))
+                health = dict(health, history=gateway_health_history.summary(window))
+            self.send_json(health)
+        elif path == "/api/cache-stats":
+            self.send_json({"ok": True, **_cache_store.stats()})
+        elif path == "/api/status/history":
+            window = max(60, min(int(params.get("window", 3600)), METRICS_HISTORY_SEC))
+            step = int(params["step"]) if params.get("step") else max(1, window // 120)
+            self.send_json(metrics_sampler.history(window, step, cores=params.get("cores") == "1"))
+        elif path == "/api/collectors":
+            self.send_json({"ok": True, "collectors": [c.status() for c in _collectors.values()],
+                            "backend": openclaw_backend.stats()})
+        elif path == "/api/providers":
+            self.send_json(get_providers())
+        elif path == "/api/skills":
+            self.send_json(get_skills())
+        elif path == "/api/activity":
+            self.send_json({"activities": parse_activities()})
+        elif path == "/api/memory":
+            date = params.get("date")
+            all_dates = memory_corpus.dates()
+            content = memory_corpus.content(date) if date and date in all_dates else None
+            if content is None and all_dates:
+                date = all_dates[0]
+                content = memory_corpus.content(date)
+            if content is None:
+                date, content = None, "No memory files"
+            self.send_json({"date": date, "content": content, "all_dates": all_dates})
+        elif path == "/api/memory/fts":
+            query = urllib.parse.unquote_plus(params.get("q", "")).strip()
+            if not query:
+                self.send_json({"ok": False, "error": "Missing query parameter 'q'", "results": []}, 400)
+                return
+            limit = max(1, min(int(params.get("limit", 20)), 100))
+            offset = max(0, int(params.get("offset", 0)))
+            result = memory_fts.search(query, params.get("from", ""), params.get("to", ""), limit, offset)
+            self.send_json(result, 200 if result["ok"] else 400)
+        elif path == "/api/issues":
+            self.send_json(get_issues())
+        elif path == "/api/todos":
+            self.send_json(parse_todos())
+        elif path == "/api/actions":
+            self.send_json(get_actions())
+        elif path == "/api/actions/jobs":
+            self.send_json({"ok": True, "jobs": action_jobs.jobs()})
+        elif path.startswith("/api/actions/jobs/"):
+            job = action_jobs.get(path[len("/api/actions/jobs/"):])
+            if job is None:
+                self.send_json({"ok": False, "error": "Unknown job"}, 404)
+            else:
+                self.send_json({"ok": True, "job": job.to_dict(after=int(params.get("after", 0)))})
+        elif path == "/api/actions/stream":
+            job = action_jobs.get(params.get("job", ""))
+            if job is None:
+                self.send_json({"ok": False, "error": "Unknown job"}, 404)
+            else:
+                self.send_job_stream(job, params)
+        elif path == "/api/costs":
+            self.send_json(get_costs())
+        elif path == "/api/cost-history":
+            granularity = params.get("granularity", "day")
+            days = max(1, min(int(params.get("days", 30)), 3660))
+            try:
+                self.send_json(get_cost_history(days, params.get("from", ""), params.get("to", ""),
+                                                "hour" if granularity == "hour" else "day",
+                                                urllib.parse.unquote(params["model"]) if params.get("model") else None))
+            except ValueError as e:
+                self.send_json({"ok": False, "error": str(e)}, 400)
+        elif path == "/api/crons":
+            self.send_json(get_cron_sessions())
+        elif path == "/api/cron-config":
+            self.send_json(get_configured_crons())
+        elif path == "/api/rate-limits":
+            self.send_json(get_rate_limits())
+        elif path == "/api/agent-tasks":
+            self.send_json(get_agent_tasks())
+        elif path == "/api/memory-db":
+            limit = max(1, min(int(params.get("limit", 50)), 500))
+            agent = urllib.parse.unquote(params.get("agent", ""))
+            type_ = urllib.parse.unquote(params.get("type", ""))
+            try:
+                before = parse_memory_cursor(params["before"]) if params.get("before") else None
+            except ValueError as e:
+                self.send_json({"ok": False, "error": str(e), "memories": []}, 400)
+                return
+            self.send_json(get_memory_db(limit, agent, type_, before))
+        elif path == "/api/memory-search":
+            query = params.get("q", "")
+            limit = int(params.get("limit", 10))
+            min_importance = int(params.get("importance", 1))
+            nprobe = int(params["nprobe"]) if params.get("nprobe") else None
+            if not query:
+                self.send_json({"ok": False, "error": "Missing query parameter 'q'", "results": []}, 400)
+            else:
+                self.send_json(search_memory_semantic(query, limit, min_importance, nprobe))
+        elif path == "/api/feed":
+            self.send_json(BUNDLE_RESOURCES["feed"]())
+        elif path == "/api/stream":
+            self.send_stream(params)
+        elif path == "/api/bundle":
+            names = [n for n in urllib.parse.unquote(params.get("resources", "")).split(",") if n]
+            if not names:
+                self.send_json({"ok": False, "error": "Missing query parameter 'resources'"}, 400)
+            else:
+                self.send_json(get_bundle(names))
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
 def main():
+    global embedding_index
     parser = argparse.ArgumentParser(description="Homie Dashboard server")
     parser.add_argument("--host", default=os.getenv("HOMIE_DASHBOARD_HOST", ""))
     parser.add_argument("--port", type=int, default=int(os.getenv("HOMIE_DASHBOARD_PORT", PORT)))
+    parser.add_argument("--mode", choices=["pool", "single"], default=os.getenv("HOMIE_DASHBOARD_MODE", "pool"),
+                        help="pool: bounded worker pool (default); single: legacy one-request-at-a-time")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HOMIE_DASHBOARD_WORKERS", DEFAULT_WORKERS)))
+    parser.add_argument("--collectors", default=os.getenv("HOMIE_DASHBOARD_COLLECTORS", ""),
+                        help='override collector intervals in seconds, e.g. "sessions=15,crons=60" (0 disables)')
+    parser.add_argument("--memory-indexes", action="store_true",
+                        help="create missing composite indexes in the memory database at startup")
+    parser.add_argument("--memory-search", choices=["exact", "ivf"], default=os.getenv("HOMIE_MEMORY_SEARCH", "exact"),
+                        help="exact: resident matrix (default); ivf: disk-persisted ANN index in HOMIE_ANN_DIR")
+    parser.add_argument("--sample-interval", type=float, default=METRICS_INTERVAL_SEC,
+                        help="seconds between system metric samples for /api/status and its history")
+    parser.add_argument("--openclaw-backend", choices=["native", "cli"], default=OPENCLAW_BACKEND,
+                        help="native: gateway state files and API with CLI fallback (default); cli: always fork openclaw")
+    parser.add_argument("--no-collectors", action="store_true",
+                        help="fetch data lazily in the request path instead of in background collectors")
     args = parser.parse_args()
 
+    openclaw_backend.mode = args.openclaw_backend
+    threading.Thread(target=metrics_sampler.start, args=(max(0.5, args.sample_interval),),
+                     name="metrics-sampler-init", daemon=True).start()
+    if not args.no_collectors:
+        start_collectors(parse_collector_intervals(args.collectors))
+    threading.Thread(target=task_index.start, name="task-index-init", daemon=True).start()
+    start_stream_publisher()
+    start_cost_ledger()
+    threading.Thread(target=verify_memory_db_indexes, args=(args.memory_indexes,),
+                     name="memory-db-indexes", daemon=True).start()
+    if embedding_index is not None and embedding_index.engine != args.memory_search:
+        embedding_index = make_embedding_index(args.memory_search)
+    threading.Thread(target=warm_embedding_index, name="embedding-index", daemon=True).start()
+    threading.Thread(target=warm_memory_fts, name="memory-fts", daemon=True).start()
+    threading.Thread(target=task_duplicates.warm, name="task-duplicates", daemon=True).start()
+
     host = args.host
     port = args.port
     bind_label = host if host else "0.0.0.0"
-    print(f"Dashboard: http://{bind_label}:{port}")
-    http.server.HTTPServer((host, port), Handler).serve_forever()
+    if args.mode == "single":
+        httpd = DetachingHTTPServer((host, port), Handler)
+        log(f"Dashboard: http://{bind_label}:{port} (single-threaded)")
+    else:
+        # Keep-alive only with a worker pool; one idle connection would block single mode.
+        Handler.protocol_version = "HTTP/1.1"
+        httpd = PooledHTTPServer((host, port), Handler, workers=max(1, args.workers))
+        log(f"Dashboard: http://{bind_label}:{port} ({max(1, args.workers)} workers)")
+    httpd.serve_forever()
 
 
 if __name__ == "__main__":